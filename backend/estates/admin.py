@@ -1,15 +1,17 @@
 from django.contrib import admin
-from .models import House, Tenant, Contract, Payment
+from search.admin import VectorSearchMixin
+from .models import House, Tenant, Contract, Payment, TenantMonthlyLedger
 
 @admin.register(House)
-class HouseAdmin(admin.ModelAdmin):
+class HouseAdmin(VectorSearchMixin, admin.ModelAdmin):
     list_display = ['house_number', 'house_type', 'status', 'rent_amount', 'created_at']
     list_filter = ['status', 'house_type']
     search_fields = ['house_number', 'location']
     ordering = ['house_number']
 
 @admin.register(Tenant)
-class TenantAdmin(admin.ModelAdmin):
+class TenantAdmin(VectorSearchMixin, admin.ModelAdmin):
+    search_vector = 'user__search_vector'
     list_display = ['user', 'house', 'status', 'move_in_date', 'contract_end']
     list_filter = ['status']
     search_fields = ['user__username', 'user__email', 'house__house_number']
@@ -27,4 +29,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ['tenant', 'amount', 'payment_date', 'payment_method', 'reference_number']
     list_filter = ['payment_method', 'payment_date']
     search_fields = ['tenant__user__username', 'reference_number']
-    date_hierarchy = 'payment_date'
\ No newline at end of file
+    date_hierarchy = 'payment_date'
+
+@admin.register(TenantMonthlyLedger)
+class TenantMonthlyLedgerAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'period', 'rent_due', 'bills_due', 'paid_amount', 'balance']
+    list_filter = ['period']
+    readonly_fields = ['rent_due', 'bills_due', 'paid_amount', 'balance', 'updated_at']
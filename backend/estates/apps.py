@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EstatesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'estates'
+
+    def ready(self):
+        from . import report_cache  # noqa: F401  (connects the invalidation receivers)
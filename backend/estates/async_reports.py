@@ -0,0 +1,89 @@
+"""
+Async versions of the aggregate reports, served to requests that come in
+through seams_project/asgi.py (see seams_project/asgi_urls.py).
+
+ReportsViewSet runs a report's aggregates one after another, so its latency
+is the sum of theirs. Here each aggregate runs in a worker thread with its
+own database connection and the results are gathered, so latency is close to
+the slowest one. A request uses at most REPORT_QUERY_CONCURRENCY connections
+at a time, and a process at most REPORT_QUERY_WORKERS.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from seams_project.authentication import check_access
+from seams_project.db_routing import read_from, replica_for, statement_timeout, is_statement_timeout
+from .report_cache import acached_report
+from .reports import REPORT_TIMEOUT_DETAIL, DASHBOARD_SUMMARY, MONTHLY_TRENDS, OCCUPANCY_STATS, IsEstateAdmin
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'REPORT_QUERY_WORKERS', 8), thread_name_prefix='report-query'
+)
+
+
+def _run_part(part):
+    try:
+        with statement_timeout(settings.REPORT_STATEMENT_TIMEOUT_MS):
+            return part()
+    finally:
+        # Worker threads outlive the request; honour CONN_MAX_AGE like request threads do
+        close_old_connections()
+
+
+async def gather_parts(report, now):
+    """
+    Runs every part of `report` concurrently, bounded per request, and
+    combines the results. Routing context (replica or primary) is copied
+    into each worker thread.
+    """
+    budget = asyncio.Semaphore(getattr(settings, 'REPORT_QUERY_CONCURRENCY', 4))
+    run = sync_to_async(_run_part, thread_sensitive=False, executor=_executor)
+
+    async def bounded(part):
+        async with budget:
+            return await run(part)
+
+    parts = report.parts(now)
+    results = await asyncio.gather(*(bounded(part) for part in parts.values()))
+    return report.combine(dict(zip(parts, results)))
+
+
+def _json(data, status=200):
+    # DRF's encoder, so responses match the ReportsViewSet ones byte for byte
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def report_view(report):
+    async def view(request):
+        if request.method != 'GET':
+            return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+        # The same credentials and checks as ReportsViewSet
+        _, denied = await sync_to_async(check_access)(request, [IsEstateAdmin])
+        if denied is not None:
+            return denied
+
+        now = timezone.now()
+        try:
+            with read_from(replica_for(request)):
+                data = await acached_report(
+                    report.name, report.params(now), report.depends_on, lambda: gather_parts(report, now)
+                )
+        except OperationalError as exc:
+            if not is_statement_timeout(exc):
+                raise
+            return _json({'detail': REPORT_TIMEOUT_DETAIL}, status=503)
+        return _json(data)
+
+    view.__name__ = view.__qualname__ = report.name
+    return view
+
+
+dashboard_summary = report_view(DASHBOARD_SUMMARY)
+monthly_trends = report_view(MONTHLY_TRENDS)
+occupancy_stats = report_view(OCCUPANCY_STATS)
@@ -0,0 +1,78 @@
+from decimal import Decimal
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, Greatest, Least
+from .models import Contract, Tenant, TenantMonthlyLedger
+from .periods import month_bounds, MonthStart
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _ledger_value(ledger, field):
+    """
+    Single-row lookup into TenantMonthlyLedger (unique on tenant + period), or 0 when missing.
+    """
+    return Coalesce(Subquery(ledger.values(field)[:1], output_field=MONEY), Value(Decimal('0')), output_field=MONEY)
+
+
+def rent_in_force(month=None):
+    """
+    Expression for a Tenant queryset: the rent of a month without a ledger
+    row, by the rule TenantMonthlyLedger fixes rent_due with (the contract in
+    force, else the house's rent).
+    """
+    start, end = month_bounds(month)
+    contract = Contract.objects.filter(tenant=OuterRef('pk'), start_date__lt=end, end_date__gte=start) \
+        .order_by('-start_date', '-id').values('monthly_rent')[:1]
+    return Coalesce(Subquery(contract, output_field=MONEY), F('house__rent_amount'), Value(Decimal('0')),
+                    output_field=MONEY)
+
+
+def tenant_balances(month=None, tenants=None):
+    """
+    Annotates every tenant with rent_due, bills_due, paid_amount and balance
+    for the given month in a single query, from the materialized
+    TenantMonthlyLedger; a month without a row owes the rent in force.
+    """
+    start, _ = month_bounds(month)
+
+    if tenants is None:
+        tenants = Tenant.objects.filter(status='active', house__isnull=False)
+
+    ledger = TenantMonthlyLedger.objects.filter(tenant=OuterRef('pk'), period=start)
+
+    return tenants.select_related('user', 'house').annotate(
+        rent_due=Coalesce(Subquery(ledger.values('rent_due')[:1], output_field=MONEY), rent_in_force(start),
+                          output_field=MONEY),
+        bills_due=_ledger_value(ledger, 'bills_due'),
+        paid_amount=_ledger_value(ledger, 'paid_amount'),
+    ).annotate(
+        balance=F('rent_due') + F('bills_due') - F('paid_amount')
+    )
+
+
+def _month_index(expression):
+    return ExtractYear(expression) * 12 + ExtractMonth(expression)
+
+
+def months_in_arrears(month=None):
+    """
+    Expression for a tenant_balances() queryset: earlier months of the
+    tenancy (from the move-in month to the contract end) that closed owing,
+    plus the given month when it is still owed.
+
+    Ledger rows only exist for months with a bill or payment, so a month
+    without one owes its whole rent and counts; only rows that closed at or
+    below zero are subtracted.
+    """
+    start, _ = month_bounds(month)
+    months = Greatest(
+        Least(Value(start.year * 12 + start.month), _month_index('contract_end') + 1) - _month_index('move_in_date'),
+        Value(0),
+    )
+    settled = TenantMonthlyLedger.objects.filter(
+        tenant=OuterRef('pk'), period__gte=MonthStart(OuterRef('move_in_date')),
+        period__lte=OuterRef('contract_end'), period__lt=start, balance__lte=0,
+    ).values('tenant').annotate(months=Count('id')).values('months')
+    return months - Coalesce(Subquery(settled, output_field=IntegerField()), Value(0)) + Case(
+        When(balance__gt=0, then=Value(1)), default=Value(0), output_field=IntegerField()
+    )
@@ -0,0 +1,166 @@
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from estates.models import House, Tenant, Payment, Bill
+from maintenance.models import MaintenanceRequest
+from users.models import Notification
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Times every GET route of the API router (lists, details and actions) and stores the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to call the API as (default: the first estate admin)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed calls per endpoint after the first one')
+        parser.add_argument('--page-size', type=int, default=50,
+                            help='page_size sent to list endpoints; 0 requests unpaginated lists like the frontend')
+        parser.add_argument('--filter', help='Only endpoints whose name contains this text')
+        parser.add_argument('--output-dir', default=os.path.join(settings.BASE_DIR, 'benchmarks'),
+                            help='Where result files are written')
+        parser.add_argument('--compare', help='Result file to compare against (default: the latest in --output-dir)')
+
+    def handle(self, *args, **options):
+        from seams_project.urls import router
+
+        user = self.get_user(options['user'])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.options = options
+
+        results = []
+        # Requests go through the test client in-process, as the test runner does
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for prefix, viewset, basename in router.registry:
+                for name, url, params in self.endpoints(prefix, viewset, basename):
+                    if options['filter'] and options['filter'] not in name:
+                        continue
+                    results.append(self.measure(name, url, params))
+                    self.stdout.write(self.format_row(results[-1]))
+
+        previous = self.previous_run(options)
+        run = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'user': user.username,
+            'options': {key: options[key] for key in ('repeat', 'page_size', 'filter')},
+            'dataset': {
+                'houses': House.objects.count(),
+                'tenants': Tenant.objects.count(),
+                'payments': Payment.objects.count(),
+                'bills': Bill.objects.count(),
+                'maintenance_requests': MaintenanceRequest.objects.count(),
+                'notifications': Notification.objects.count(),
+            },
+            'results': results,
+        }
+        os.makedirs(options['output_dir'], exist_ok=True)
+        path = os.path.join(options['output_dir'], f"endpoints-{datetime.now():%Y%m%d-%H%M%S}.json")
+        with open(path, 'w') as handle:
+            json.dump(run, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Saved {len(results)} results to {path}'))
+
+        if previous:
+            self.compare(previous, results)
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.filter(role='estate_admin', is_active=True).order_by('-is_staff', 'id').first()
+        if user is None:
+            raise CommandError('No user to benchmark as; create an estate admin or pass --user')
+        return user
+
+    def endpoints(self, prefix, viewset, basename):
+        """
+        Yields (name, url, params) for every GET route of one viewset. Detail
+        routes use the first object returned by the list endpoint.
+        """
+        base = f'/api/{prefix}/'
+        list_params = {'page_size': self.options['page_size']} if self.options['page_size'] else {}
+        actions = [a for a in viewset.get_extra_actions() if 'get' in a.mapping]
+
+        sample_pk = None
+        if hasattr(viewset, 'list'):
+            yield f'{basename}-list', base, list_params
+            data = getattr(self.client.get(base, {'page_size': 1}), 'data', None)
+            rows = data.get('results', []) if isinstance(data, dict) else (data or [])
+            sample_pk = rows[0].get('id') if rows and isinstance(rows[0], dict) else None
+
+        for action in actions:
+            if not action.detail:
+                yield f'{basename}-{action.url_name}', f'{base}{action.url_path}/', list_params
+
+        if sample_pk is None:
+            return
+        if hasattr(viewset, 'retrieve'):
+            yield f'{basename}-detail', f'{base}{sample_pk}/', {}
+        for action in actions:
+            if action.detail:
+                yield f'{basename}-{action.url_name}', f'{base}{sample_pk}/{action.url_path}/', {}
+
+    def measure(self, name, url, params):
+        # The first call runs cold (empty report cache entries, cold DB pages) and
+        # is reported separately from the warm timings
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = self.client.get(url, params)
+            first = (time.perf_counter() - started) * 1000
+        # Read now: the next request's request_started signal resets the query log
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(self.options['repeat']):
+            started = time.perf_counter()
+            self.client.get(url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        return {
+            'name': name,
+            'url': url,
+            'status': response.status_code,
+            'queries': query_count,
+            'bytes': len(response.content),
+            'first_ms': round(first, 2),
+            'median_ms': round(statistics.median(timings), 2) if timings else None,
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2) if timings else None,
+        }
+
+    @staticmethod
+    def format_row(result):
+        return (f"{result['name']:<40} {result['status']:>3} {result['queries']:>4}q {result['bytes']:>10}B "
+                f"first {result['first_ms']:>9.2f} ms  median {result['median_ms'] or 0:>9.2f} ms")
+
+    @staticmethod
+    def previous_run(options):
+        path = options['compare']
+        if not path and os.path.isdir(options['output_dir']):
+            runs = sorted(f for f in os.listdir(options['output_dir']) if f.startswith('endpoints-'))
+            path = os.path.join(options['output_dir'], runs[-1]) if runs else None
+        if not path:
+            return None
+        with open(path) as handle:
+            return json.load(handle)
+
+    def compare(self, previous, results):
+        self.stdout.write(f"\nCompared with run of {previous['started_at']}:")
+        before = {r['name']: r for r in previous['results']}
+        for result in results:
+            old = before.get(result['name'])
+            if not old or not old['median_ms'] or result['median_ms'] is None:
+                continue
+            change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100
+            line = (f"{result['name']:<40} median {old['median_ms']:>9.2f} -> {result['median_ms']:>9.2f} ms "
+                    f"({change:+.0f}%)  queries {old['queries']} -> {result['queries']}")
+            style = self.style.ERROR if change > 20 else self.style.SUCCESS if change < -20 else str
+            self.stdout.write(style(line))
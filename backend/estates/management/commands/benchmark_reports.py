@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+REPORTS = ['dashboard_summary', 'monthly_trends', 'occupancy_stats']
+
+
+class Command(BaseCommand):
+    help = ('Compares report latency under concurrent load between the WSGI handler (ReportsViewSet, '
+            'aggregates in sequence) and the ASGI handler (async views, aggregates in parallel)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report', choices=REPORTS, default='dashboard_summary')
+        parser.add_argument('--user', help='Username to call the API as (default: the first estate admin)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=40, help='Requests per handler')
+        parser.add_argument('--cached', action='store_true',
+                            help='Keep the report cache on (by default every request computes the report)')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        self.url = f"/api/reports/{options['report']}/"
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        self.options = options
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['cached']:
+            overrides['CACHES'] = {**settings.CACHES, 'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            overrides['REPORT_CACHE_ALIAS'] = 'benchmark'
+
+        budget = settings.REPORT_QUERY_CONCURRENCY
+        rows = []
+        with override_settings(**overrides):
+            rows.append(('wsgi', self.summarize(self.run_wsgi())))
+            with override_settings(REPORT_QUERY_CONCURRENCY=1):
+                rows.append(('asgi, 1 connection', self.summarize(asyncio.run(self.run_asgi()))))
+            rows.append((f'asgi, {budget} connections', self.summarize(asyncio.run(self.run_asgi()))))
+
+        self.stdout.write(f"{self.url}  {options['requests']} requests, {options['concurrency']} concurrent")
+        self.stdout.write(f"{'handler':<22} {'ok':>4} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9} {'req/s':>8}")
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<22} {row['ok']:>4} {row['mean_ms']:>9.2f} {row['p50_ms']:>9.2f} "
+                f"{row['p95_ms']:>9.2f} {row['max_ms']:>9.2f} {row['throughput']:>8.1f}"
+            )
+        baseline, best = rows[0][1], rows[-1][1]
+        if best['p50_ms']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Median WSGI / ASGI: {baseline['p50_ms']:.2f} / {best['p50_ms']:.2f} ms "
+                f"({baseline['p50_ms'] / best['p50_ms']:.2f}x)"
+            ))
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.filter(role='estate_admin', is_active=True).order_by('-is_staff', 'id').first()
+        if user is None:
+            raise CommandError('No user to benchmark as; create an estate admin or pass --user')
+        return user
+
+    # The test clients keep connections open after a response; close them
+    # like a server does at the end of each request (CONN_MAX_AGE = 0)
+
+    def run_wsgi(self):
+        def call(_):
+            started = time.perf_counter()
+            try:
+                response = Client().get(self.url, headers=self.headers)
+            finally:
+                connections.close_all()
+            return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.options['concurrency']) as pool:
+            results = list(pool.map(call, range(self.options['requests'])))
+        return results, time.perf_counter() - started
+
+    async def run_asgi(self):
+        slots = asyncio.Semaphore(self.options['concurrency'])
+        client = AsyncClient()
+
+        async def call():
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(self.url, headers=self.headers)
+                finally:
+                    await sync_to_async(connections.close_all)()
+                return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call() for _ in range(self.options['requests'])))
+        return results, time.perf_counter() - started
+
+    @staticmethod
+    def summarize(run):
+        results, wall = run
+        timings = sorted(elapsed * 1000 for status, elapsed in results if status == 200)
+        if not timings:
+            return {'ok': 0, 'mean_ms': 0, 'p50_ms': 0, 'p95_ms': 0, 'max_ms': 0, 'throughput': 0}
+        return {
+            'ok': len(timings),
+            'mean_ms': statistics.mean(timings),
+            'p50_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            'max_ms': timings[-1],
+            'throughput': len(timings) / wall,
+        }
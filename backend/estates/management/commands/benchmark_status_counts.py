@@ -0,0 +1,69 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from estates.models import House
+from maintenance.models import MaintenanceRequest
+from seams_project.aggregates import status_breakdown
+
+
+class Command(BaseCommand):
+    help = 'Compares per-status COUNT queries with the single-query status breakdown'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Temporarily insert this many houses and maintenance requests (rolled back)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per approach')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+
+            self.report('houses', *self.compare(
+                lambda: {s: House.objects.filter(status=s).count() for s, _ in House.STATUS_CHOICES},
+                lambda: status_breakdown(House.objects.all(), House.STATUS_CHOICES),
+                options['repeat']
+            ))
+            self.report('maintenance', *self.compare(
+                lambda: {s: MaintenanceRequest.objects.filter(status=s).count()
+                         for s, _ in MaintenanceRequest.STATUS_CHOICES},
+                lambda: status_breakdown(MaintenanceRequest.objects.all(), MaintenanceRequest.STATUS_CHOICES),
+                options['repeat']
+            ))
+
+            # Seeded rows are benchmark scaffolding only
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        statuses = [s for s, _ in House.STATUS_CHOICES]
+        houses = House.objects.bulk_create([
+            House(house_number=f'B{i:07d}', house_type='1_bedroom', status=random.choice(statuses),
+                  rent_amount=10000)
+            for i in range(count)
+        ], batch_size=5000)
+        request_statuses = [s for s, _ in MaintenanceRequest.STATUS_CHOICES]
+        MaintenanceRequest.objects.bulk_create([
+            MaintenanceRequest(request_id=f'BENCH-{i}', house=random.choice(houses),
+                               issue_description='Benchmark', status=random.choice(request_statuses))
+            for i in range(count)
+        ], batch_size=5000)
+        self.stdout.write(f'Seeded {count} houses and {count} maintenance requests')
+
+    def compare(self, legacy, breakdown, repeat):
+        results = []
+        for approach in (legacy, breakdown):
+            with CaptureQueriesContext(connection) as queries:
+                approach()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                approach()
+            results.append((len(queries), (time.perf_counter() - started) * 1000 / repeat))
+        return results
+
+    def report(self, label, legacy, breakdown):
+        self.stdout.write(
+            f'{label}: per-status counts {legacy[0]} queries / {legacy[1]:.2f} ms, '
+            f'breakdown {breakdown[0]} query / {breakdown[1]:.2f} ms'
+        )
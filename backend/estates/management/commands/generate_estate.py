@@ -0,0 +1,388 @@
+import json
+import random
+import time
+from datetime import date, datetime, time as day_time, timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from estates.models import House, Tenant, Contract, Payment, Bill, TenantMonthlyLedger
+from estates.periods import month_bounds
+from estates.report_cache import invalidate_reports
+from maintenance.models import IdCounter, MaintenanceRequest, MaintenanceImage
+from users.models import Notification
+from search.terms import TERM_SOURCES, rebuild_terms
+
+User = get_user_model()
+
+RENT_BY_TYPE = {
+    'bedsitter': (6000, 9000),
+    '1_bedroom': (10000, 16000),
+    '2_bedroom': (18000, 28000),
+    '3_bedroom': (30000, 45000),
+    '4_bedroom': (48000, 70000),
+}
+BILL_AMOUNTS = {
+    'water': (300, 1500),
+    'electricity': (500, 3500),
+    'garbage': (200, 200),
+}
+FIRST_NAMES = ['Amina', 'Brian', 'Caro', 'David', 'Esther', 'Felix', 'Grace', 'Hassan', 'Irene', 'James',
+               'Kevin', 'Lilian', 'Mercy', 'Njeri', 'Otieno', 'Purity', 'Rashid', 'Sharon', 'Tom', 'Wanjiru']
+LAST_NAMES = ['Achieng', 'Barasa', 'Chebet', 'Kamau', 'Kariuki', 'Kiptoo', 'Mutua', 'Njoroge', 'Odhiambo',
+              'Omondi', 'Ouma', 'Wafula', 'Wambui', 'Wanjiku']
+ISSUES = {
+    'plumbing': 'Leaking pipe under the kitchen sink',
+    'electrical': 'Sockets in the living room have no power',
+    'structural': 'Crack along the bedroom wall',
+    'pest_control': 'Cockroaches in the kitchen cabinets',
+    'general': 'Door hinge broken',
+}
+
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_formatter(field):
+    """
+    Text-format COPY encoder for one column, picked once per column rather
+    than per value; str() already gives PostgreSQL-readable dates, datetimes
+    and decimals.
+    """
+    if field.get_internal_type() == 'BooleanField':
+        encode = {True: 't', False: 'f'}.__getitem__
+    elif field.get_internal_type() in ('CharField', 'TextField', 'FileField', 'ImageField'):
+        encode = lambda value: str(value).translate(COPY_ESCAPES)
+    elif field.get_internal_type() == 'JSONField':
+        encode = lambda value: json.dumps(value).translate(COPY_ESCAPES)
+    else:
+        encode = str
+    if not field.null:
+        return encode
+    return lambda value: '\\N' if value is None else encode(value)
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic estate with payment, bill, maintenance and notification history for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--houses', type=int, default=2000, help='Houses to create')
+        parser.add_argument('--months', type=int, default=24, help='Months of history')
+        parser.add_argument('--turnover', type=float, default=0.3,
+                            help='Share of houses that had a previous tenant during the history')
+        parser.add_argument('--requests-per-house', type=int, default=3, help='Maintenance requests per house')
+        parser.add_argument('--notifications-per-user', type=int, default=25, help='Notification backlog per user')
+        parser.add_argument('--technicians', type=int, default=25, help='Technician accounts to create')
+        parser.add_argument('--prefix', default='SYN', help='Prefix for house numbers, usernames and references')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible datasets')
+        parser.add_argument('--batch-size', type=int, default=20000, help='Rows per COPY / bulk insert')
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix'].upper()
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        if len(self.prefix) > 4:
+            raise CommandError('--prefix must be at most 4 characters (house numbers are limited to 10)')
+        if House.objects.filter(house_number__startswith=self.prefix).exists():
+            raise CommandError(f'Houses prefixed {self.prefix!r} already exist; use another --prefix')
+
+        self.tz = timezone.get_current_timezone()
+        self.today = timezone.localdate()
+        self.current_month = month_bounds(self.today)[0]
+        self.first_month = self.add_months(self.current_month, 1 - options['months'])
+        self.counts = {}
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            houses = self.create_houses(options['houses'])
+            technicians = self.create_users('technician', options['technicians'])
+            # Staff estate admin for benchmark_endpoints to call the API as
+            admin = self.create_users('estate_admin', 1)[0]
+            User.objects.filter(pk=admin.pk).update(is_staff=True)
+            residencies = self.create_tenants(houses, options['turnover'])
+            self.create_contracts(residencies)
+            self.create_payments_and_bills(residencies)
+            self.create_maintenance(houses, residencies, technicians, options['requests_per_house'])
+            self.create_notifications([r['user_id'] for r in residencies] + [t.id for t in technicians],
+                                      options['notifications_per_user'])
+        invalidate_reports('estates.Payment', 'estates.Bill', 'estates.House', 'maintenance.MaintenanceRequest')
+        # COPY skips the receivers that collect the spelling vocabulary
+        for label, _ in TERM_SOURCES:
+            rebuild_terms(label, batch_size=self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        total = sum(self.counts.values())
+        for table, count in self.counts.items():
+            self.stdout.write(f'  {table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)'
+        ))
+
+    # --- helpers ---
+
+    def add_months(self, month, count):
+        index = month.year * 12 + month.month - 1 + count
+        return date(index // 12, index % 12 + 1, 1)
+
+    def months_between(self, start, end):
+        month = start
+        while month <= end:
+            yield month
+            month = self.add_months(month, 1)
+
+    def moment(self, day):
+        """
+        Aware datetime at a random time of `day`.
+        """
+        seconds = self.random.randint(7 * 3600, 20 * 3600)
+        return datetime.combine(day, day_time(), tzinfo=self.tz) + timedelta(seconds=seconds)
+
+    def copy(self, model, fields, rows):
+        """
+        Streams rows into the table with COPY in batches (bulk_create off
+        PostgreSQL). Bypasses save() and auto_now_add, so callers pass every
+        column, timestamps included.
+        """
+        model_fields = [model._meta.get_field(f) for f in fields]
+        formatters = [_copy_formatter(f) for f in model_fields]
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in model_fields)
+        sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN'
+        rows = iter(rows)
+        count = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            count += len(batch)
+            if connection.vendor != 'postgresql':
+                model.objects.bulk_create([model(**dict(zip(fields, row))) for row in batch])
+                continue
+            data = ''.join('\t'.join([encode(value) for encode, value in zip(formatters, row)]) + '\n' for row in batch)
+            with connection.cursor() as cursor:
+                raw = cursor.cursor
+                if hasattr(raw, 'copy_expert'):
+                    raw.copy_expert(sql, StringIO(data))
+                else:
+                    with raw.copy(sql) as copy:
+                        copy.write(data)
+        self.counts[model._meta.db_table] = self.counts.get(model._meta.db_table, 0) + count
+        return count
+
+    # --- generators ---
+
+    def create_houses(self, count):
+        statuses = ['occupied'] * 88 + ['vacant'] * 7 + ['under_repair'] * 3 + ['reserved'] * 2
+        locations = ['Block A', 'Block B', 'Block C', 'Block D', 'Annex']
+        houses = []
+        for i in range(count):
+            house_type = self.random.choice(list(RENT_BY_TYPE))
+            low, high = RENT_BY_TYPE[house_type]
+            houses.append(House(
+                house_number=f'{self.prefix}{i:05d}',
+                house_type=house_type,
+                status=self.random.choice(statuses),
+                location=self.random.choice(locations),
+                rent_amount=Decimal(self.random.randrange(low, high + 1, 500)),
+                bedrooms={'bedsitter': 1, '1_bedroom': 1, '2_bedroom': 2, '3_bedroom': 3, '4_bedroom': 4}[house_type],
+            ))
+        houses = House.objects.bulk_create(houses, batch_size=self.batch_size)
+        self.counts['houses'] = len(houses)
+        return houses
+
+    def create_users(self, role, count, offset=0):
+        users = User.objects.bulk_create([
+            User(
+                username=f'{self.prefix.lower()}_{role}_{offset + i}',
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                email=f'{self.prefix.lower()}_{role}_{offset + i}@example.com',
+                phone=f'07{self.random.randrange(10 ** 8):08d}',
+                role=role,
+                password='!',  # Unusable: synthetic accounts cannot log in
+                approval_status='approved',
+                profile_completed=True,
+                email_verified=True,
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        self.counts['users'] = self.counts.get('users', 0) + len(users)
+        return users
+
+    def create_tenants(self, houses, turnover):
+        """
+        Current tenants for occupied houses, plus earlier (inactive) tenants
+        for a share of houses. Returns one dict per residency.
+        """
+        plans = []
+        for house in houses:
+            move_in = self.add_months(self.first_month, self.random.randrange(0, 12))
+            if house.status == 'occupied' and self.random.random() < turnover:
+                move_in = self.add_months(self.first_month, self.random.randrange(6, 18))
+                move_out = self.add_months(move_in, -1)
+                plans.append((house, self.first_month, min(move_out, self.current_month), 'inactive'))
+            if house.status == 'occupied':
+                plans.append((house, min(move_in, self.current_month), self.current_month, 'active'))
+
+        users = self.create_users('tenant', len(plans))
+        tenants = Tenant.objects.bulk_create([
+            Tenant(
+                user=user,
+                house=house,
+                move_in_date=start,
+                contract_start=start,
+                contract_end=self.add_months(start, 12 * self.random.randint(1, 3)),
+                emergency_contact=self.random.choice(FIRST_NAMES),
+                emergency_phone=f'07{self.random.randrange(10 ** 8):08d}',
+                status=status,
+            )
+            for user, (house, start, end, status) in zip(users, plans)
+        ], batch_size=self.batch_size)
+        self.counts['tenants'] = len(tenants)
+
+        return [
+            {'tenant': tenant, 'user_id': user.id, 'name': f'{user.first_name} {user.last_name}',
+             'house': house, 'start': start, 'end': end}
+            for tenant, user, (house, start, end, status) in zip(tenants, users, plans)
+        ]
+
+    def create_contracts(self, residencies):
+        contracts = Contract.objects.bulk_create([
+            Contract(
+                tenant=r['tenant'],
+                archived_tenant_name=r['name'],
+                house=r['house'],
+                archived_house_number=r['house'].house_number,
+                start_date=r['start'],
+                end_date=r['tenant'].contract_end,
+                monthly_rent=r['house'].rent_amount,
+                deposit_paid=r['house'].rent_amount,
+            )
+            for r in residencies
+        ], batch_size=self.batch_size)
+        self.counts['contracts'] = len(contracts)
+
+    def create_payments_and_bills(self, residencies):
+        """
+        COPY skips the signals that maintain TenantMonthlyLedger, so its rows
+        are totalled here as the payments and bills are generated.
+        """
+        payments, bills, ledger = [], [], []
+        updated_at = timezone.now()
+        references = iter(range(10 ** 9))
+
+        def reference():
+            return f'{self.prefix}{next(references):09d}'
+
+        def generate():
+            for r in residencies:
+                tenant_id, name, rent = r['tenant'].id, r['name'], r['house'].rent_amount
+                for month in self.months_between(r['start'], r['end']):
+                    current = month == self.current_month
+                    created = self.moment(month)
+                    month_payments = []
+                    bills_due = Decimal('0')
+                    for bill_type, (low, high) in BILL_AMOUNTS.items():
+                        amount = Decimal(self.random.randint(low, high))
+                        paid = not current and self.random.random() < 0.85
+                        bills.append((tenant_id, name, bill_type, amount, month, None, paid, created))
+                        bills_due += amount
+                        if paid:
+                            month_payments.append(self.payment_row(tenant_id, name, amount, month, bill_type, reference()))
+                    if self.random.random() < (0.6 if current else 0.93):
+                        amount = rent if self.random.random() < 0.9 else (rent / 2).quantize(Decimal('1'))
+                        month_payments.append(self.payment_row(tenant_id, name, amount, month, 'rent', reference()))
+                    payments.extend(month_payments)
+
+                    paid_amount = sum((p[2] for p in month_payments if p[8]), Decimal('0'))
+                    ledger.append((tenant_id, month, rent, bills_due, paid_amount,
+                                   rent + bills_due - paid_amount, updated_at))
+                    if len(payments) >= self.batch_size:
+                        yield
+
+        bill_fields = ['tenant_id', 'archived_tenant_name', 'bill_type', 'amount', 'month_for', 'description',
+                       'is_paid', 'created_at']
+        payment_fields = ['tenant_id', 'archived_tenant_name', 'amount', 'payment_date', 'payment_method',
+                          'payment_type', 'reference_number', 'month_for', 'is_verified', 'created_at']
+        ledger_fields = ['tenant_id', 'period', 'rent_due', 'bills_due', 'paid_amount', 'balance', 'updated_at']
+        for _ in generate():
+            self.copy(Bill, bill_fields, bills)
+            self.copy(Payment, payment_fields, payments)
+            self.copy(TenantMonthlyLedger, ledger_fields, ledger)
+            bills.clear()
+            payments.clear()
+            ledger.clear()
+        self.copy(Bill, bill_fields, bills)
+        self.copy(Payment, payment_fields, payments)
+        self.copy(TenantMonthlyLedger, ledger_fields, ledger)
+
+    def payment_row(self, tenant_id, name, amount, month, payment_type, reference):
+        paid_on = min(month + timedelta(days=self.random.randint(0, 12)), self.today)
+        method = self.random.choices(['mpesa', 'bank', 'cash', 'cheque'], weights=[70, 20, 7, 3])[0]
+        verified = paid_on < self.current_month or self.random.random() < 0.7
+        return (tenant_id, name, amount, paid_on, method, payment_type, reference, month, verified,
+                self.moment(paid_on))
+
+    def create_maintenance(self, houses, residencies, technicians, per_house):
+        reporters = {r['house'].id: (r['user_id'], r['name']) for r in residencies}
+        count = len(houses) * per_house
+        numbers = iter(IdCounter.allocate(MaintenanceRequest.REQUEST_ID_COUNTER, count))
+        span = (self.today - self.first_month).days
+        statuses = ['new'] * 2 + ['pending'] + ['assigned'] * 2 + ['in_progress'] * 2 + ['completed'] * 12 + ['cancelled']
+
+        def rows():
+            for house in houses:
+                reporter_id, reporter_name = reporters.get(house.id, (None, ''))
+                for _ in range(per_house):
+                    status = self.random.choice(statuses)
+                    category = self.random.choice(list(ISSUES))
+                    created = self.moment(self.first_month + timedelta(days=self.random.randint(0, span)))
+                    technician = self.random.choice(technicians) if technicians and status != 'new' else None
+                    assigned_at = created + timedelta(hours=self.random.randint(1, 48)) if technician else None
+                    completed_at = assigned_at + timedelta(days=self.random.randint(1, 10)) \
+                        if status == 'completed' and assigned_at else None
+                    estimate = Decimal(self.random.randrange(500, 20000, 250))
+                    yield (
+                        MaintenanceRequest.format_request_id(next(numbers)), house.id, house.house_number,
+                        reporter_id, reporter_name, technician.id if technician else None,
+                        ISSUES[category], category, self.random.choice(['low', 'medium', 'high', 'urgent']),
+                        status, created, assigned_at, completed_at, '', estimate,
+                        estimate + self.random.randint(-250, 1000) if completed_at else None,
+                    )
+
+        self.copy(MaintenanceRequest, [
+            'request_id', 'house_id', 'archived_house_number', 'reported_by_id', 'archived_reported_by',
+            'assigned_to_id', 'issue_description', 'category', 'priority', 'status', 'created_at',
+            'assigned_at', 'completed_at', 'notes', 'estimated_cost', 'actual_cost',
+        ], rows())
+
+        # Image metadata only: the files themselves (and so their derivatives) are not generated
+        requests = MaintenanceRequest.objects.filter(house__in=houses).values_list('id', 'created_at')
+        self.copy(MaintenanceImage, ['maintenance_request_id', 'image', 'derivatives', 'uploaded_at'], (
+            (request_id, f'maintenance/{self.prefix.lower()}/{request_id}-{n}.jpg', {}, created)
+            for request_id, created in requests.iterator(chunk_size=self.batch_size)
+            if self.random.random() < 0.4
+            for n in range(self.random.randint(1, 3))
+        ))
+
+    def create_notifications(self, user_ids, per_user):
+        span = (self.today - self.first_month).days
+        messages = [
+            ('general', 'Your maintenance request has been updated', '/maintenance'),
+            ('general', 'A new bill has been posted to your account', '/payments'),
+            ('payment_reminder', 'PAYMENT REMINDER: you have an outstanding balance. Please pay immediately.',
+             '/tenant-dashboard'),
+        ]
+
+        def rows():
+            for user_id in user_ids:
+                for _ in range(per_user):
+                    kind, message, link = self.random.choice(messages)
+                    age = self.random.randint(0, span)
+                    # Older notifications are almost always read
+                    is_read = self.random.random() < min(0.98, 0.3 + age / 60)
+                    yield user_id, message, is_read, self.moment(self.today - timedelta(days=age)), link, kind
+
+        self.copy(Notification, ['recipient_id', 'message', 'is_read', 'created_at', 'link', 'kind'], rows())
@@ -0,0 +1,45 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from estates.payment_import import PaymentImporter
+
+
+class Command(BaseCommand):
+    help = 'Imports payments from a CSV bank or M-Pesa statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV statement file')
+        parser.add_argument('--method', default='mpesa', help='Payment method for rows without one')
+        parser.add_argument('--type', default='rent', help='Payment type for rows without one')
+        parser.add_argument('--unverified', action='store_true', help='Import as pending instead of verified')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows validated and inserted per batch')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file')
+
+    def handle(self, *args, **options):
+        importer = PaymentImporter(
+            payment_method=options['method'],
+            payment_type=options['type'],
+            verified=not options['unverified'],
+            chunk_size=options['chunk_size'],
+        )
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                summary = importer.run(stream)
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}')
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['row', 'error'])
+                for failure in summary['errors']:
+                    writer.writerow([failure['row'], '; '.join(failure['errors'])])
+        else:
+            for failure in summary['errors']:
+                self.stdout.write(f"Row {failure['row']}: {'; '.join(failure['errors'])}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {summary['imported']} payments, {summary['failed']} rows failed, "
+                f"{summary['bills_cleared']} bills cleared"
+            )
+        )
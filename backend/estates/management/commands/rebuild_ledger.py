@@ -0,0 +1,65 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from estates.models import Tenant, Payment, Bill, TenantMonthlyLedger
+from estates.periods import month_bounds
+
+
+class Command(BaseCommand):
+    help = 'Regenerates the tenant monthly ledger from Payments and Bills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        rows = defaultdict(lambda: {'bills_due': Decimal('0'), 'paid_amount': Decimal('0')})
+
+        bills = Bill.objects.filter(tenant__isnull=False) \
+            .values('tenant', 'period') \
+            .annotate(total=Sum('amount')) \
+            .order_by()
+        for item in bills:
+            rows[(item['tenant'], item['period'])]['bills_due'] = item['total']
+
+        payments = Payment.objects.filter(tenant__isnull=False, is_verified=True) \
+            .values('tenant', 'period') \
+            .annotate(total=Sum('amount')) \
+            .order_by()
+        for item in payments:
+            rows[(item['tenant'], item['period'])]['paid_amount'] = item['total']
+
+        # Every active tenant gets a row for the current month, even without activity
+        current_period = month_bounds()[0]
+        for tenant_id in Tenant.objects.filter(status='active').values_list('id', flat=True):
+            rows[(tenant_id, current_period)]
+
+        # Rent is fixed per month when its row is first created: keep those
+        # snapshots, and give new months the rent in force for them
+        rent_dues = {
+            (tenant_id, period): rent_due
+            for tenant_id, period, rent_due in TenantMonthlyLedger.objects.values_list('tenant_id', 'period', 'rent_due')
+        }
+        house_rents = dict(Tenant.objects.values_list('id', 'house__rent_amount'))
+        rent_dues.update(TenantMonthlyLedger.rents_in_force(set(rows) - set(rent_dues), house_rents))
+
+        entries = []
+        for (tenant_id, period), totals in rows.items():
+            rent_due = rent_dues[(tenant_id, period)]
+            entries.append(TenantMonthlyLedger(
+                tenant_id=tenant_id,
+                period=period,
+                rent_due=rent_due,
+                bills_due=totals['bills_due'],
+                paid_amount=totals['paid_amount'],
+                balance=rent_due + totals['bills_due'] - totals['paid_amount'],
+            ))
+
+        with transaction.atomic():
+            TenantMonthlyLedger.objects.all().delete()
+            TenantMonthlyLedger.objects.bulk_create(entries, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {len(entries)} ledger rows')
+        )
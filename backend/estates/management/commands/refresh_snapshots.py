@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from estates.snapshots import refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Refreshes archived tenant names, house numbers and reporter names from the live records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows updated per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the stale snapshots')
+
+    def handle(self, *args, **options):
+        counts = refresh_snapshots(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for column, count in counts.items():
+            self.stdout.write(f'{column}: {count}')
+
+        verb = 'Found' if options['dry_run'] else 'Refreshed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {sum(counts.values())} stale snapshots'))
@@ -1,29 +1,56 @@
-from django.core.management.base import BaseCommand
-from estates.models import House, Tenant
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from estates.models import House
+
 
 class Command(BaseCommand):
     help = 'Synchronizes house statuses based on current tenant assignments'
 
-    def handle(self, *args, **kwargs):
-        updated_count = 0
-        
-        all_houses = House.objects.all()
-        
-        for house in all_houses:
-            has_tenant = Tenant.objects.filter(house=house, status='active').exists()
-            
-            if has_tenant and house.status == 'vacant':
-                house.status = 'occupied'
-                house.save()
-                updated_count += 1
-                self.stdout.write(f"Updated {house.house_number} to occupied")
-            
-            elif not has_tenant and house.status == 'occupied':
-                house.status = 'vacant'
-                house.save()
-                updated_count += 1
-                self.stdout.write(f"Updated {house.house_number} to vacant")
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'Successfully synchronized {updated_count} houses')
-        )
\ No newline at end of file
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without applying them')
+        parser.add_argument('--since', help='Only houses whose row or tenants changed since this date/time (ISO format)')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running, syncing houses changed since the previous pass (catches bulk writes)')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between passes with --watch')
+
+    def handle(self, *args, **options):
+        since = self.parse_since(options['since']) if options['since'] else None
+
+        if not options['watch']:
+            self.sync(since, options['dry_run'])
+            return
+
+        self.stdout.write('Watching tenant changes')
+        try:
+            while True:
+                started = timezone.now()
+                self.sync(since, options['dry_run'], quiet=True)
+                # Overlap passes slightly so writes committed mid-pass are not missed
+                since = started - timedelta(seconds=5)
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def parse_since(self, value):
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError('--since must be an ISO date or datetime')
+            moment = datetime.combine(day, datetime.min.time())
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    def sync(self, since, dry_run, quiet=False):
+        changes = House.sync_status(since=since, dry_run=dry_run)
+        if quiet and not changes:
+            return
+        for house_number, old, new in changes:
+            self.stdout.write(f"{house_number}: {old} -> {new}")
+
+        verb = 'Would update' if dry_run else 'Successfully synchronized'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(changes)} houses'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0008_contract_archived_house_number_alter_contract_house'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tenant',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tenant_profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='TenantMonthlyLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month this row covers')),
+                ('rent_due', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bills_due', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='estates.tenant')),
+            ],
+            options={
+                'db_table': 'tenant_monthly_ledger',
+                'ordering': ['-period'],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'period'), name='unique_ledger_tenant_period')],
+            },
+        ),
+    ]
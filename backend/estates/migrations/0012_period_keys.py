@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:04
+
+import estates.periods
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0011_payment_reference_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='period',
+            field=models.GeneratedField(db_persist=True, expression=estates.periods.MonthStart('month_for'), output_field=models.DateField()),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='period',
+            field=models.GeneratedField(db_persist=True, expression=estates.periods.MonthStart('month_for'), output_field=models.DateField()),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['tenant', 'bill_type', 'is_paid', 'period'], name='bill_tenant_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['tenant', 'period', 'is_verified'], name='payment_tenant_period_idx'),
+        ),
+    ]
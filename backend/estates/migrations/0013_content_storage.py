@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:52
+
+import uploads.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0012_period_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='contract_document',
+            field=models.FileField(blank=True, null=True, storage=uploads.storage.ContentAddressedStorage(), upload_to='contracts/'),
+        ),
+    ]
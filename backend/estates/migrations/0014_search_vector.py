@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:59
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0013_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector(models.F('house_number'), config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(models.Func(models.F('house_number'), models.Value('[^[:alnum:]]+'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE', output_field=models.CharField()), config='simple', weight='A'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(models.F('location'), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(models.F('description'), config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='house',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='house_search_idx'),
+        ),
+    ]
@@ -1,7 +1,19 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.conf import settings
-from django.db.models.signals import pre_delete
+from django.db.models import Sum
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .periods import month_bounds, MonthStart
+from .snapshots import fill_snapshots
+from .report_cache import invalidate_reports
+from uploads.storage import content_storage
+from search.vectors import compact, document
 
 class House(models.Model):
     STATUS_CHOICES = [
@@ -29,14 +41,61 @@ class House(models.Model):
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Full-text document for /api/search/, kept current by Postgres
+    search_vector = models.GeneratedField(
+        expression=document(('house_number', 'A'), (compact('house_number'), 'A'),
+                            ('location', 'B'), ('description', 'C')),
+        output_field=SearchVectorField(), db_persist=True,
+    )
     
     class Meta:
         db_table = 'houses'
         ordering = ['house_number']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='house_search_idx'),
+        ]
     
     def __str__(self):
         return f"House {self.house_number} - {self.get_house_type_display()}"
 
+    @classmethod
+    def sync_status(cls, house_ids=None, since=None, dry_run=False, report=True):
+        """
+        Derives status from active tenants with two set-based UPDATEs: vacant or
+        reserved houses with an active tenant become occupied, occupied houses
+        without one become vacant (under_repair is left alone). Optionally
+        limited to `house_ids`, or to houses whose row or tenants changed since
+        `since`. Returns [(house_number, old_status, new_status)] when `report`.
+        """
+        houses = cls.objects.all()
+        if house_ids is not None:
+            houses = houses.filter(pk__in=house_ids)
+        if since is not None:
+            houses = houses.filter(
+                models.Q(updated_at__gte=since)
+                | models.Exists(Tenant.objects.filter(house=models.OuterRef('pk'), updated_at__gte=since))
+            )
+
+        has_tenant = models.Exists(Tenant.objects.filter(house=models.OuterRef('pk'), status='active'))
+        transitions = [
+            (houses.filter(has_tenant, status__in=['vacant', 'reserved']), 'occupied'),
+            (houses.filter(~has_tenant, status='occupied'), 'vacant'),
+        ]
+
+        changes, updated = [], 0
+        with transaction.atomic():
+            for queryset, new_status in transitions:
+                if report or dry_run:
+                    changes += [(number, old, new_status) for number, old
+                                in queryset.select_for_update().values_list('house_number', 'status')]
+                if not dry_run:
+                    updated += queryset.update(status=new_status, updated_at=timezone.now())
+
+        if updated:
+            # update() skips the post_save receivers that version cached reports
+            invalidate_reports('estates.House')
+        return sorted(changes) if report or dry_run else updated
+
 
 class Tenant(models.Model):
     STATUS_CHOICES = [
@@ -85,7 +144,8 @@ class Contract(models.Model):
     end_date = models.DateField()
     monthly_rent = models.DecimalField(max_digits=10, decimal_places=2)
     deposit_paid = models.DecimalField(max_digits=10, decimal_places=2)
-    contract_document = models.FileField(upload_to='contracts/', blank=True, null=True)
+    # Stored once per content; see uploads.refs for when the file is deleted
+    contract_document = models.FileField(upload_to='contracts/', storage=content_storage, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -93,14 +153,7 @@ class Contract(models.Model):
         ordering = ['-start_date']
     
     def save(self, *args, **kwargs):
-        # Snapshot Tenant Name
-        if self.tenant and self.tenant.user:
-            self.archived_tenant_name = self.tenant.user.get_full_name()
-        
-        # Snapshot House Number
-        if self.house:
-            self.archived_house_number = self.house.house_number
-            
+        fill_snapshots(self)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -143,16 +196,24 @@ class Payment(models.Model):
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPE_CHOICES, default='rent')
     reference_number = models.CharField(max_length=50, blank=True)
     month_for = models.DateField(help_text="Month this payment covers")
+    # Month key derived by the database from month_for, so every write path
+    # (save, bulk_create, update, COPY) keeps it right
+    period = models.GeneratedField(expression=MonthStart('month_for'), output_field=models.DateField(), db_persist=True)
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'payments'
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['-payment_date', '-id'], name='payment_keyset_idx'),
+            models.Index(fields=['tenant', '-payment_date', '-id'], name='payment_tenant_keyset_idx'),
+            models.Index(fields=['reference_number'], name='payment_reference_idx'),
+            models.Index(fields=['tenant', 'period', 'is_verified'], name='payment_tenant_period_idx'),
+        ]
     
     def save(self, *args, **kwargs):
-        if self.tenant and self.tenant.user:
-            self.archived_tenant_name = self.tenant.user.get_full_name()
+        fill_snapshots(self)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -180,6 +241,7 @@ class Bill(models.Model):
     bill_type = models.CharField(max_length=20, choices=BILL_TYPE_CHOICES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     month_for = models.DateField(help_text="Month this bill applies to")
+    period = models.GeneratedField(expression=MonthStart('month_for'), output_field=models.DateField(), db_persist=True)
     description = models.TextField(blank=True, null=True)
     is_paid = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -187,10 +249,14 @@ class Bill(models.Model):
     class Meta:
         db_table = 'bills'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='bill_keyset_idx'),
+            models.Index(fields=['tenant', '-created_at', '-id'], name='bill_tenant_keyset_idx'),
+            models.Index(fields=['tenant', 'bill_type', 'is_paid', 'period'], name='bill_tenant_period_idx'),
+        ]
         
     def save(self, *args, **kwargs):
-        if self.tenant and self.tenant.user:
-            self.archived_tenant_name = self.tenant.user.get_full_name()
+        fill_snapshots(self)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -200,15 +266,206 @@ class Bill(models.Model):
             name = self.archived_tenant_name or "Unknown"
         return f"Bill: {self.get_bill_type_display()} - {name} ({self.amount})"
 
+# --- MONTHLY LEDGER (materialized balances) ---
+class TenantMonthlyLedger(models.Model):
+    """
+    One row per tenant per month, kept in sync with Payment and Bill writes
+    so finance screens read balances instead of re-aggregating raw rows.
+
+    rent_due is fixed when a month's row is created: the monthly_rent of the
+    contract in force that month, else the house's rent at the time. Later
+    refreshes and rebuilds keep it, so a rent change never rewrites past
+    balances. Months without a row follow the same rule live
+    (balances.rent_in_force(), the statement SQL).
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='ledger_entries')
+    period = models.DateField(help_text="First day of the month this row covers")
+    rent_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bills_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'tenant_monthly_ledger'
+        ordering = ['-period']
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'period'], name='unique_ledger_tenant_period'),
+        ]
+
+    @classmethod
+    def refresh(cls, tenant_id, month_for):
+        """
+        Recomputes the row for one tenant and month from Bills and verified Payments.
+        The tenant row is locked first so concurrent writers for the same tenant
+        serialize and the last one to commit sees every committed amount.
+        """
+        start = month_bounds(month_for)[0]
+
+        with transaction.atomic():
+            tenant = Tenant.objects.select_for_update(of=('self',)).filter(pk=tenant_id) \
+                .values_list('pk', 'house__rent_amount').first()
+            if tenant is None:
+                return None
+            rent_due = cls.objects.filter(tenant_id=tenant_id, period=start).values_list('rent_due', flat=True).first()
+            if rent_due is None:
+                rent_due = cls.rents_in_force({(tenant_id, start)}, {tenant_id: tenant[1]})[(tenant_id, start)]
+
+            bills_due = Bill.objects.filter(
+                tenant_id=tenant_id, period=start
+            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+            paid_amount = Payment.objects.filter(
+                tenant_id=tenant_id, period=start, is_verified=True
+            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+            entry, _ = cls.objects.update_or_create(
+                tenant_id=tenant_id,
+                period=start,
+                defaults={
+                    'rent_due': rent_due,
+                    'bills_due': bills_due,
+                    'paid_amount': paid_amount,
+                    'balance': rent_due + bills_due - paid_amount,
+                }
+            )
+        return entry
+
+    @classmethod
+    def refresh_many(cls, keys):
+        """
+        Set-based refresh for many (tenant_id, month) pairs, for writes that
+        bypass signals (bulk_create, queryset.update). One grouped aggregate per
+        source table and a single upsert, instead of refresh() per pair.
+        """
+        keys = {(tenant_id, month_bounds(month)[0]) for tenant_id, month in keys if tenant_id and month}
+        if not keys:
+            return
+        tenant_ids = sorted({tenant_id for tenant_id, _ in keys})
+        first = min(period for _, period in keys)
+        last = max(period for _, period in keys)
+
+        with transaction.atomic():
+            # Lock in pk order so concurrent bulk refreshes cannot deadlock
+            rents = dict(
+                Tenant.objects.select_for_update(of=('self',)).filter(pk__in=tenant_ids)
+                .order_by('pk').values_list('pk', 'house__rent_amount')
+            )
+
+            # Existing rows keep their rent; new ones take the rent in force
+            rent_dues = {
+                (tenant_id, period): rent_due for tenant_id, period, rent_due in cls.objects.filter(
+                    tenant_id__in=tenant_ids, period__gte=first, period__lte=last
+                ).values_list('tenant_id', 'period', 'rent_due')
+            }
+            rent_dues.update(cls.rents_in_force(
+                {key for key in keys if key not in rent_dues and key[0] in rents}, rents
+            ))
+
+            totals = {}
+            for model, extra, field in [(Bill, {}, 'bills_due'), (Payment, {'is_verified': True}, 'paid_amount')]:
+                grouped = model.objects.filter(
+                    tenant_id__in=tenant_ids, period__gte=first, period__lte=last, **extra
+                ).values('tenant_id', 'period') \
+                    .annotate(total=Sum('amount')).order_by()
+                for item in grouped:
+                    totals[(item['tenant_id'], item['period'], field)] = item['total']
+
+            entries = []
+            for tenant_id, period in keys:
+                if tenant_id not in rents:
+                    continue
+                rent_due = rent_dues[(tenant_id, period)]
+                bills_due = totals.get((tenant_id, period, 'bills_due'), Decimal('0'))
+                paid_amount = totals.get((tenant_id, period, 'paid_amount'), Decimal('0'))
+                entries.append(cls(
+                    tenant_id=tenant_id, period=period, rent_due=rent_due, bills_due=bills_due,
+                    paid_amount=paid_amount, balance=rent_due + bills_due - paid_amount
+                ))
+
+            cls.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=['tenant', 'period'],
+                update_fields=['bills_due', 'paid_amount', 'balance', 'updated_at'],
+            )
+
+    @staticmethod
+    def rents_in_force(keys, house_rents):
+        """
+        {(tenant_id, period): rent} for new ledger rows: the monthly_rent of the
+        contract in force that month (the latest started if several overlap),
+        else the rent in `house_rents` ({tenant_id: rent}). One query.
+        """
+        if not keys:
+            return {}
+        first = min(period for _, period in keys)
+        last_end = month_bounds(max(period for _, period in keys))[1]
+        contracts = defaultdict(list)
+        for tenant_id, start_date, end_date, monthly_rent in Contract.objects.filter(
+            tenant_id__in={tenant_id for tenant_id, _ in keys}, start_date__lt=last_end, end_date__gte=first
+        ).order_by('start_date', 'id').values_list('tenant_id', 'start_date', 'end_date', 'monthly_rent'):
+            contracts[tenant_id].append((start_date, end_date, monthly_rent))
+
+        rents = {}
+        for tenant_id, period in keys:
+            period_end = month_bounds(period)[1]
+            in_force = [rent for start_date, end_date, rent in contracts[tenant_id]
+                        if start_date < period_end and end_date >= period]
+            rents[(tenant_id, period)] = in_force[-1] if in_force else (house_rents.get(tenant_id) or Decimal('0'))
+        return rents
+
+    def __str__(self):
+        return f"Ledger {self.tenant_id} {self.period:%Y-%m}: {self.balance}"
+
+
 # --- SIGNALS ---
-@receiver(pre_delete, sender=Tenant)
-def release_house_on_tenant_delete(sender, instance, **kwargs):
+def _ledger_key(tenant_id, month_for):
+    if isinstance(month_for, str):
+        month_for = parse_date(month_for)
+    return (tenant_id, month_bounds(month_for)[0]) if tenant_id and month_for else None
+
+
+@receiver(post_init, sender=Payment)
+@receiver(post_init, sender=Bill)
+def remember_ledger_key(sender, instance, **kwargs):
+    # Raw attribute values only: touching a deferred field here would cost a query per row
+    instance._ledger_origin = (instance.__dict__.get('tenant_id'), instance.__dict__.get('month_for'))
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Bill)
+def refresh_ledger_on_change(sender, instance, **kwargs):
+    """
+    Keep TenantMonthlyLedger in step with the Payment/Bill that just changed.
+    If the row was moved to another tenant or month, the old entry is refreshed too.
+    """
+    keys = {
+        _ledger_key(*instance._ledger_origin),
+        _ledger_key(instance.tenant_id, instance.month_for),
+    }
+    for key in keys - {None}:
+        TenantMonthlyLedger.refresh(*key)
+
+    instance._ledger_origin = (instance.tenant_id, instance.month_for)
+
+@receiver(post_init, sender=Tenant)
+def remember_tenant_house(sender, instance, **kwargs):
+    instance._house_origin = instance.__dict__.get('house_id')
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def sync_house_on_tenant_change(sender, instance, **kwargs):
     """
-    If a Tenant profile is explicitly deleted, mark their house as vacant.
-    Note: Since Tenant.user is now SET_NULL, deleting a User account 
-    will NOT trigger this signal (which is good, it preserves the tenant record).
+    Keeps House.status in step with tenant moves, status changes and deletes,
+    for both the house the tenant left and the one they are in now.
+    Note: Since Tenant.user is SET_NULL, deleting a User account keeps the
+    tenant record and therefore the house occupied.
     """
-    if instance.house:
-        house = instance.house
-        house.status = 'vacant'
-        house.save()
\ No newline at end of file
+    house_ids = {instance._house_origin, instance.house_id} - {None}
+    if house_ids:
+        House.sync_status(house_ids=house_ids, report=False)
+    instance._house_origin = instance.house_id
\ No newline at end of file
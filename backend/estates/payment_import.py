@@ -0,0 +1,268 @@
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from .models import Tenant, Payment, TenantMonthlyLedger
+from .reconciliation import reconcile_bills
+from .report_cache import invalidate_reports
+
+# Statement column headers (lower-cased) mapped to import fields
+COLUMN_ALIASES = {
+    'amount': 'amount',
+    'paid in': 'amount',
+    'credit': 'amount',
+    'payment_date': 'payment_date',
+    'date': 'payment_date',
+    'completion time': 'payment_date',
+    'transaction date': 'payment_date',
+    'month_for': 'month_for',
+    'reference_number': 'reference_number',
+    'reference': 'reference_number',
+    'receipt no.': 'reference_number',
+    'receipt no': 'reference_number',
+    'phone': 'phone',
+    'msisdn': 'phone',
+    'house_number': 'house_number',
+    'house': 'house_number',
+    'account': 'account',
+    'a/c no.': 'account',
+    'account number': 'account',
+    'payment_method': 'payment_method',
+    'payment_type': 'payment_type',
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y']
+
+# Payment.amount is DecimalField(max_digits=10, decimal_places=2)
+AMOUNT_PLACES = Payment._meta.get_field('amount').decimal_places
+MAX_AMOUNT = Decimal(10) ** (Payment._meta.get_field('amount').max_digits - AMOUNT_PLACES)
+
+PAYMENT_METHODS = dict(Payment.PAYMENT_METHOD_CHOICES)
+PAYMENT_TYPES = dict(Payment.PAYMENT_TYPE_CHOICES)
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def phone_variants(value):
+    """
+    Kenyan numbers arrive as 07..., 2547..., +2547... or 7...; match on the
+    last nine digits in every spelling users may have stored.
+    """
+    digits = re.sub(r'\D', '', value or '')
+    if len(digits) < 9:
+        return []
+    local = digits[-9:]
+    return [f'0{local}', f'254{local}', f'+254{local}', local]
+
+
+class PaymentImporter:
+    """
+    Streams a CSV bank/M-Pesa statement into Payment rows.
+
+    Rows are read and validated in chunks; each chunk resolves its tenants with
+    a fixed number of queries (house number, account reference, phone), skips
+    references already imported, bulk-inserts the payments and settles bills,
+    and, once the file is done, ledger rows and report caches set-based.
+    Memory is bounded by the chunk size.
+    """
+
+    def __init__(self, payment_method='mpesa', payment_type='rent', verified=True, chunk_size=2000):
+        self.payment_method = payment_method
+        self.payment_type = payment_type
+        self.verified = verified
+        self.chunk_size = chunk_size
+        self.imported = 0
+        self.bills_cleared = 0
+        self.errors = []
+        self.ledger_keys = set()
+        self.unreadable = False
+
+    def run(self, stream):
+        reader = csv.DictReader(stream)
+        try:
+            fieldnames = reader.fieldnames
+        except (UnicodeDecodeError, csv.Error) as error:
+            self.unreadable_at(1, error)
+            return self.summary()
+        if not fieldnames:
+            self.errors.append({'row': 0, 'errors': ['File is empty or has no header row']})
+            return self.summary()
+
+        columns = {name: COLUMN_ALIASES.get(name.strip().lower()) for name in fieldnames}
+        if 'amount' not in columns.values() or 'payment_date' not in columns.values():
+            self.errors.append({'row': 0, 'errors': ['Columns "amount" and "payment_date" are required']})
+            return self.summary()
+
+        rows = self.read_rows(reader, columns)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            reported = len(self.errors)
+            self.import_chunk(chunk)
+            self.errors[reported:] = sorted(self.errors[reported:], key=lambda e: e['row'])
+
+        # One set-based ledger pass for the whole file: refreshing per chunk would
+        # re-aggregate the same tenant-months over and over on large statements
+        TenantMonthlyLedger.refresh_many(self.ledger_keys)
+        invalidate_reports('estates.Payment', 'estates.Bill')
+        return self.summary()
+
+    def read_rows(self, reader, columns):
+        """
+        Yields (row number, import fields) pairs. Reading stops where the file
+        cannot be decoded (the stream decodes a block at a time) or a line is
+        malformed; the rows read before it are still imported.
+        """
+        rows, number = iter(reader), 1
+        while True:
+            try:
+                raw = next(rows)
+            except StopIteration:
+                return
+            except (UnicodeDecodeError, csv.Error) as error:
+                self.unreadable_at(number + 1, error)
+                return
+            number += 1
+            yield number, {columns[key]: (value or '').strip() for key, value in raw.items() if columns.get(key)}
+
+    def unreadable_at(self, number, error):
+        self.unreadable = True
+        if isinstance(error, UnicodeDecodeError):
+            message = 'File is not UTF-8 encoded text; nothing from here on was read'
+        else:
+            message = f'Malformed CSV ({error}); nothing from here on was read'
+        self.errors.append({'row': number, 'errors': [message]})
+
+    def summary(self):
+        return {
+            'imported': self.imported,
+            'failed': len(self.errors),
+            'bills_cleared': self.bills_cleared,
+            'errors': self.errors,
+        }
+
+    def import_chunk(self, chunk):
+        parsed = []
+        for number, row in chunk:
+            data, errors = self.validate(row)
+            if errors:
+                self.errors.append({'row': number, 'errors': errors})
+            else:
+                parsed.append((number, data))
+
+        houses, phones = self.lookup_tenants(parsed)
+        existing = set(Payment.objects.filter(
+            reference_number__in=[d['reference_number'] for _, d in parsed if d['reference_number']]
+        ).values_list('reference_number', flat=True))
+
+        payments, seen = [], set()
+        for number, data in parsed:
+            reference = data['reference_number']
+            if reference and (reference in existing or reference in seen):
+                self.errors.append({'row': number, 'errors': [f'Reference {reference} was already imported']})
+                continue
+
+            tenant = (houses.get(data['house_number']) or houses.get(data['account'])
+                      or next((phones[p] for p in phone_variants(data['phone']) if p in phones), None))
+            if tenant is None:
+                self.errors.append({'row': number, 'errors': ['No tenant matches this house number, account or phone']})
+                continue
+
+            seen.add(reference)
+            payments.append(Payment(
+                tenant=tenant,
+                archived_tenant_name=tenant.user.get_full_name() if tenant.user else '',
+                amount=data['amount'],
+                payment_date=data['payment_date'],
+                payment_method=data['payment_method'],
+                payment_type=data['payment_type'],
+                reference_number=reference,
+                month_for=data['month_for'],
+                is_verified=self.verified,
+            ))
+
+        if not payments:
+            return
+
+        with transaction.atomic():
+            Payment.objects.bulk_create(payments)
+            if self.verified:
+                cleared = reconcile_bills(payments)
+                self.bills_cleared += sum(len(ids) for ids in cleared.values())
+        self.ledger_keys.update((p.tenant_id, p.month_for.replace(day=1)) for p in payments)
+        self.imported += len(payments)
+
+    def validate(self, row):
+        errors = []
+        data = {
+            'reference_number': row.get('reference_number', '')[:50],
+            'house_number': row.get('house_number', ''),
+            'account': row.get('account', ''),
+            'phone': row.get('phone', ''),
+        }
+
+        try:
+            data['amount'] = Decimal(row.get('amount', '').replace(',', ''))
+        except InvalidOperation:
+            data['amount'] = None
+        if data['amount'] is None or not data['amount'].is_finite():
+            errors.append(f"Invalid amount: {row.get('amount')!r}")
+        elif data['amount'] <= 0:
+            errors.append('Amount must be positive')
+        elif data['amount'].as_tuple().exponent < -AMOUNT_PLACES:
+            errors.append(f'Amount has more than {AMOUNT_PLACES} decimal places: {row.get("amount")!r}')
+        elif data['amount'] >= MAX_AMOUNT:
+            errors.append(f'Amount must be less than {MAX_AMOUNT:,}')
+
+        data['payment_date'] = parse_date(row.get('payment_date'))
+        if data['payment_date'] is None:
+            errors.append(f"Invalid payment date: {row.get('payment_date')!r}")
+
+        month_for = row.get('month_for')
+        data['month_for'] = parse_date(month_for) if month_for else data['payment_date']
+        if month_for and data['month_for'] is None:
+            errors.append(f'Invalid month_for: {month_for!r}')
+
+        data['payment_method'] = (row.get('payment_method') or self.payment_method).lower()
+        if data['payment_method'] not in PAYMENT_METHODS:
+            errors.append(f"Unknown payment method: {data['payment_method']!r}")
+
+        data['payment_type'] = (row.get('payment_type') or self.payment_type).lower()
+        if data['payment_type'] not in PAYMENT_TYPES:
+            errors.append(f"Unknown payment type: {data['payment_type']!r}")
+
+        if not (data['house_number'] or data['account'] or data['phone']):
+            errors.append('A house number, account reference or phone is required to match the tenant')
+
+        return data, errors
+
+    def lookup_tenants(self, parsed):
+        """
+        Resolves every tenant referenced in the chunk with two queries.
+        """
+        house_numbers = {d['house_number'] for _, d in parsed} | {d['account'] for _, d in parsed}
+        house_numbers.discard('')
+        phones = {variant for _, d in parsed for variant in phone_variants(d['phone'])}
+
+        # Oldest first so the newest active tenant of a house wins
+        tenants = Tenant.objects.filter(status='active').select_related('user', 'house').order_by('move_in_date', 'id')
+        by_house = {
+            t.house.house_number: t
+            for t in tenants.filter(house__house_number__in=house_numbers)
+        } if house_numbers else {}
+        by_phone = {
+            t.user.phone: t
+            for t in tenants.filter(user__phone__in=phones)
+        } if phones else {}
+        return by_house, by_phone
@@ -0,0 +1,27 @@
+from datetime import date
+from django.db.models import DateField, Func
+
+
+def month_bounds(day=None):
+    """
+    Returns the [start, end) date range of the month containing `day`.
+    Range filters keep the month_for columns usable by indexes, unlike
+    month_for__month / month_for__year which wrap the column in EXTRACT().
+    """
+    day = day or date.today()
+    start = day.replace(day=1)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+class MonthStart(Func):
+    """
+    First day of the month of a date column. Casting to timestamp (not
+    timestamptz) keeps the expression immutable, so PostgreSQL accepts it in
+    generated columns and indexes.
+    """
+    template = "DATE_TRUNC('month', %(expressions)s::timestamp)::date"
+    output_field = DateField()
@@ -0,0 +1,49 @@
+from collections import defaultdict
+from django.db.models import Q
+from .models import Bill
+from .periods import month_bounds
+
+# Payment types that settle a Bill of the same type
+BILL_PAYMENT_TYPES = ['water', 'electricity', 'garbage', 'damage', 'other']
+
+
+def reconcile_bills(payments):
+    """
+    Marks the bills covered by verified payments as paid, with the same rule as
+    PaymentViewSet.verify: per tenant, bill type and month, each payment clears
+    unpaid bills while its remaining amount covers them.
+
+    Set-based: one locked SELECT for every candidate bill and one UPDATE for
+    the ones cleared, however many payments are passed. Must run inside a
+    transaction. Returns {payment.pk: [cleared bill ids]}.
+    """
+    payments = [p for p in payments if p.tenant_id and p.payment_type in BILL_PAYMENT_TYPES]
+    cleared = {payment.pk: [] for payment in payments}
+    if not payments:
+        return cleared
+
+    periods = {payment.pk: month_bounds(payment.month_for)[0] for payment in payments}
+    condition = Q()
+    for tenant_id, bill_type, start in {(p.tenant_id, p.payment_type, periods[p.pk]) for p in payments}:
+        condition |= Q(tenant_id=tenant_id, bill_type=bill_type, period=start)
+
+    candidates = defaultdict(list)
+    bills = Bill.objects.select_for_update().filter(condition, is_paid=False) \
+        .only('id', 'tenant_id', 'bill_type', 'amount', 'period')
+    for bill in bills:
+        candidates[(bill.tenant_id, bill.bill_type, bill.period)].append(bill)
+
+    paid_ids = []
+    for payment in payments:
+        remaining = payment.amount
+        open_bills = candidates[(payment.tenant_id, payment.payment_type, periods[payment.pk])]
+        for bill in list(open_bills):
+            if remaining >= bill.amount:
+                remaining -= bill.amount
+                open_bills.remove(bill)
+                cleared[payment.pk].append(bill.id)
+                paid_ids.append(bill.id)
+
+    if paid_ids:
+        Bill.objects.filter(id__in=paid_ids).update(is_paid=True)
+    return cleared
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from seams_project.db_routing import read_from
+
+_MISSING = object()
+# Striped locks: concurrent misses for the same key inside one process wait on each other
+_LOCAL_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _cache():
+    return caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+
+
+def _version_key(label):
+    return f'reports:version:{label.lower()}'
+
+
+def _report_key(name, params, depends_on):
+    """
+    The key embeds the current version of every model the report reads, so a
+    write to one of them makes older entries unreachable; unrelated reports keep theirs.
+    """
+    version_keys = [_version_key(label) for label in depends_on]
+    versions = _cache().get_many(version_keys)
+    stamp = ','.join(str(versions.get(key, 0)) for key in version_keys)
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'reports:{name}:{digest}:{stamp}'
+
+
+def _written_key(label):
+    return f'reports:written:{label.lower()}'
+
+
+def invalidate_reports(*labels):
+    """
+    Bumps the version of each model label once the current transaction
+    commits (at once outside one). Call this after writes that bypass model
+    signals (queryset.update(), bulk_create()).
+
+    Bumping before the commit would let a concurrent request rebuild the
+    entry from the old rows under the new version, keeping them cached.
+    """
+    transaction.on_commit(lambda: _bump_versions(labels))
+
+
+def _bump_versions(labels):
+    cache = _cache()
+    pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 0)
+    for label in labels:
+        if pin_seconds:
+            cache.set(_written_key(label), True, timeout=pin_seconds)
+        key = _version_key(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Never set (or evicted): start from a value no live entry was built with
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def cached_report(name, params, depends_on, compute):
+    """
+    Returns compute() through the cache, with single-flight on misses: one
+    caller computes while concurrent callers (threads here, or other workers
+    sharing the cache backend via cache.add) wait for its result.
+    """
+    cache = _cache()
+    timeout = getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+    lock_timeout = getattr(settings, 'REPORT_CACHE_LOCK_TIMEOUT', 30)
+
+    key = _report_key(name, params, depends_on)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    with _LOCAL_LOCKS[hash(key) % len(_LOCAL_LOCKS)]:
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, timeout=lock_timeout):
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = cache.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+            # The other worker died or is too slow: compute it ourselves
+
+        try:
+            if cache.get_many([_written_key(label) for label in depends_on]):
+                # A replica may not have the write yet; an entry built from it
+                # would stay stale for the whole cache timeout
+                with read_from(None):
+                    value = compute()
+            else:
+                value = compute()
+            cache.set(key, value, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+    return value
+
+
+async def acached_report(name, params, depends_on, compute):
+    """
+    cached_report() for async views, where compute is a coroutine function.
+    Single-flight goes through cache.add() only, and waiting callers sleep
+    with asyncio, so the event loop keeps serving other requests.
+    """
+    cache = _cache()
+    timeout = getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+    lock_timeout = getattr(settings, 'REPORT_CACHE_LOCK_TIMEOUT', 30)
+
+    key = await sync_to_async(_report_key)(name, params, depends_on)
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    if not await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = await cache.aget(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+    try:
+        if await cache.aget_many([_written_key(label) for label in depends_on]):
+            with read_from(None):
+                value = await compute()
+        else:
+            value = await compute()
+        await cache.aset(key, value, timeout=timeout)
+    finally:
+        await cache.adelete(lock_key)
+    return value
+
+
+@receiver(post_save, sender='estates.Payment')
+@receiver(post_delete, sender='estates.Payment')
+@receiver(post_save, sender='estates.Bill')
+@receiver(post_delete, sender='estates.Bill')
+@receiver(post_save, sender='estates.House')
+@receiver(post_delete, sender='estates.House')
+@receiver(post_save, sender='maintenance.MaintenanceRequest')
+@receiver(post_delete, sender='maintenance.MaintenanceRequest')
+def invalidate_reports_on_change(sender, **kwargs):
+    invalidate_reports(sender._meta.label)
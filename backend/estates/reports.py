@@ -1,11 +1,20 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Count
+from rest_framework.views import set_rollback
+from django.db.models import Sum, Count, Exists, OuterRef
 from django.db.models.functions import TruncMonth, Coalesce
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
-from .models import Payment, House, Tenant, Bill
+from rest_framework.pagination import PageNumberPagination
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from .models import Payment, House, Tenant
+from .balances import tenant_balances, months_in_arrears
+from .report_cache import cached_report
+from .periods import month_bounds
+from seams_project.aggregates import status_breakdown
+from seams_project.db_routing import statement_timeout, is_statement_timeout
 from maintenance.models import MaintenanceRequest
 from users.models import Notification
 
@@ -20,153 +29,239 @@ class IsEstateAdmin(permissions.BasePermission):
             getattr(request.user, 'role', None) == 'estate_admin'
         )
 
-class ReportsViewSet(viewsets.ViewSet):
-    permission_classes = [IsEstateAdmin]
+# Public sort keys for debtors_list mapped to the annotated fields
+DEBTOR_ORDERING = {
+    'balance': 'balance',
+    'paid_amount': 'paid_amount',
+    'rent_amount': 'rent_due',
+    'bills_amount': 'bills_due',
+    'house': 'house__house_number',
+    'name': 'user__first_name',
+}
 
-    @action(detail=False, methods=['get'])
-    def dashboard_summary(self, request):
-        today = timezone.now()
-        current_month = today.month
-        current_year = today.year
+REPORT_TIMEOUT_DETAIL = 'This report took too long to compute. Try again shortly or narrow the filters.'
+
+class DebtorPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+class ReportDefinition:
+    """
+    A cached report built from independent aggregates. parts(now) returns
+    {key: zero-argument callable} and combine(results) shapes the response.
+    ReportsViewSet runs the parts one after another; the async views in
+    async_reports run them concurrently. Both share the cache entries.
+    """
 
+    def __init__(self, name, depends_on, params, parts, combine):
+        self.name = name
+        self.depends_on = depends_on
+        self.params = params
+        self.parts = parts
+        self.combine = combine
+
+    def compute(self, now):
+        return self.combine({key: part() for key, part in self.parts(now).items()})
+
+    def cached(self, now):
+        return cached_report(self.name, self.params(now), self.depends_on, lambda: self.compute(now))
+
+
+def _dashboard_parts(today):
+    # Ranges instead of __month/__year lookups, which wrap the column in
+    # EXTRACT() and rule out its indexes
+    month_start, month_end = month_bounds(timezone.localdate(today))
+    completed_from, completed_to = (
+        timezone.make_aware(datetime.combine(day, datetime.min.time())) for day in (month_start, month_end)
+    )
+    expense = Sum(Coalesce('actual_cost', 'estimated_cost'))
+
+    return {
         # 1. Income (Only Verified)
-        total_income = Payment.objects.filter(is_verified=True).aggregate(total=Sum('amount'))['total'] or 0
-        
-        monthly_income = Payment.objects.filter(
-            payment_date__month=current_month, 
-            payment_date__year=current_year,
+        'total_income': lambda: Payment.objects.filter(is_verified=True)
+            .aggregate(total=Sum('amount'))['total'] or 0,
+        'monthly_income': lambda: Payment.objects.filter(
+            payment_date__gte=month_start,
+            payment_date__lt=month_end,
             is_verified=True
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
+        ).aggregate(total=Sum('amount'))['total'] or 0,
         # 2. Expenses
-        total_expenses = MaintenanceRequest.objects.filter(status='completed').aggregate(
-            total=Sum(Coalesce('actual_cost', 'estimated_cost'))
-        )['total'] or 0
-
-        monthly_expenses = MaintenanceRequest.objects.filter(
+        'total_expenses': lambda: MaintenanceRequest.objects.filter(status='completed')
+            .aggregate(total=expense)['total'] or 0,
+        'monthly_expenses': lambda: MaintenanceRequest.objects.filter(
             status='completed',
-            completed_at__month=current_month,
-            completed_at__year=current_year
-        ).aggregate(
-            total=Sum(Coalesce('actual_cost', 'estimated_cost'))
-        )['total'] or 0
-
-        return Response({
-            'total_income': total_income,
-            'monthly_income': monthly_income,
-            'total_expenses': total_expenses,
-            'monthly_expenses': monthly_expenses,
-            'net_profit': total_income - total_expenses
-        })
+            completed_at__gte=completed_from,
+            completed_at__lt=completed_to
+        ).aggregate(total=expense)['total'] or 0,
+    }
 
-    @action(detail=False, methods=['get'])
-    def monthly_trends(self, request):
-        six_months_ago = timezone.now() - timedelta(days=180)
 
-        income_data = Payment.objects.filter(
+def _dashboard_result(results):
+    return {**results, 'net_profit': results['total_income'] - results['total_expenses']}
+
+
+def _trends_since(now):
+    return now - timedelta(days=180)
+
+
+def _trends_parts(now):
+    six_months_ago = _trends_since(now)
+    return {
+        'income': lambda: list(Payment.objects.filter(
             payment_date__gte=six_months_ago,
             is_verified=True
-        ).annotate(month=TruncMonth('payment_date')) \
-            .values('month') \
-            .annotate(total=Sum('amount')) \
-            .order_by('month')
-
-        expense_data = MaintenanceRequest.objects.filter(
+        ).annotate(month=TruncMonth('payment_date'))
+            .values('month')
+            .annotate(total=Sum('amount'))
+            .order_by('month')),
+        'expense': lambda: list(MaintenanceRequest.objects.filter(
             status='completed',
             completed_at__gte=six_months_ago
-        ).annotate(month=TruncMonth('completed_at')) \
-            .values('month') \
-            .annotate(total=Sum(Coalesce('actual_cost', 'estimated_cost'))) \
-            .order_by('month')
+        ).annotate(month=TruncMonth('completed_at'))
+            .values('month')
+            .annotate(total=Sum(Coalesce('actual_cost', 'estimated_cost')))
+            .order_by('month')),
+    }
+
+
+def _trends_result(results):
+    merged_data = {}
 
-        merged_data = {}
+    for item in results['income']:
+        month_str = item['month'].strftime('%b %Y')
+        if month_str not in merged_data: merged_data[month_str] = {'income': 0, 'expense': 0}
+        merged_data[month_str]['income'] = item['total']
 
-        for item in income_data:
-            month_str = item['month'].strftime('%b %Y')
-            if month_str not in merged_data: merged_data[month_str] = {'income': 0, 'expense': 0}
-            merged_data[month_str]['income'] = item['total']
+    for item in results['expense']:
+        month_str = item['month'].strftime('%b %Y')
+        if month_str not in merged_data: merged_data[month_str] = {'income': 0, 'expense': 0}
+        merged_data[month_str]['expense'] = item['total']
 
-        for item in expense_data:
-            month_str = item['month'].strftime('%b %Y')
-            if month_str not in merged_data: merged_data[month_str] = {'income': 0, 'expense': 0}
-            merged_data[month_str]['expense'] = item['total']
+    labels = list(merged_data.keys())
+    income_series = [data['income'] for data in merged_data.values()]
+    expense_series = [data['expense'] for data in merged_data.values()]
 
-        labels = list(merged_data.keys())
-        income_series = [data['income'] for data in merged_data.values()]
-        expense_series = [data['expense'] for data in merged_data.values()]
+    return {
+        'labels': labels,
+        'income': income_series,
+        'expense': expense_series
+    }
 
-        return Response({
-            'labels': labels,
-            'income': income_series,
-            'expense': expense_series
-        })
+
+def _occupancy_parts(now):
+    return {
+        'houses': lambda: status_breakdown(House.objects.all(), House.STATUS_CHOICES),
+        'maintenance_categories': lambda: list(MaintenanceRequest.objects.values('category')
+            .annotate(count=Count('id'))
+            .order_by('-count')),
+    }
+
+
+def _occupancy_result(results):
+    houses = results['houses']
+    return {
+        'occupancy': {
+            'total': houses['total'],
+            'occupied': houses['occupied'],
+            'vacant': houses['vacant'],
+            'maintenance': houses['under_repair'],
+            'reserved': houses['reserved']
+        },
+        'maintenance_categories': results['maintenance_categories']
+    }
+
+
+DASHBOARD_SUMMARY = ReportDefinition(
+    'dashboard_summary', ['estates.Payment', 'maintenance.MaintenanceRequest'],
+    lambda now: {'month': now.strftime('%Y-%m')}, _dashboard_parts, _dashboard_result
+)
+MONTHLY_TRENDS = ReportDefinition(
+    'monthly_trends', ['estates.Payment', 'maintenance.MaintenanceRequest'],
+    lambda now: {'since': _trends_since(now).date()}, _trends_parts, _trends_result
+)
+OCCUPANCY_STATS = ReportDefinition(
+    'occupancy_stats', ['estates.House', 'maintenance.MaintenanceRequest'],
+    lambda now: {}, _occupancy_parts, _occupancy_result
+)
+
+class ReportsViewSet(viewsets.ViewSet):
+    permission_classes = [IsEstateAdmin]
+
+    def dispatch(self, request, *args, **kwargs):
+        with statement_timeout(settings.REPORT_STATEMENT_TIMEOUT_MS):
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if is_statement_timeout(exc):
+            set_rollback()
+            return Response({'detail': REPORT_TIMEOUT_DETAIL}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return super().handle_exception(exc)
+
+    @action(detail=False, methods=['get'])
+    def dashboard_summary(self, request):
+        now = timezone.now()
+        return Response(DASHBOARD_SUMMARY.cached(now))
+
+    @action(detail=False, methods=['get'])
+    def monthly_trends(self, request):
+        now = timezone.now()
+        return Response(MONTHLY_TRENDS.cached(now))
 
     @action(detail=False, methods=['get'])
     def occupancy_stats(self, request):
-        total_houses = House.objects.count()
-        occupied = House.objects.filter(status='occupied').count()
-        vacant = House.objects.filter(status='vacant').count()
-        maintenance_mode = House.objects.filter(status='under_repair').count()
-
-        maintenance_by_cat = MaintenanceRequest.objects.values('category') \
-            .annotate(count=Count('id')) \
-            .order_by('-count')
-
-        return Response({
-            'occupancy': {
-                'total': total_houses,
-                'occupied': occupied,
-                'vacant': vacant,
-                'maintenance': maintenance_mode
-            },
-            'maintenance_categories': maintenance_by_cat
-        })
+        now = timezone.now()
+        return Response(OCCUPANCY_STATS.cached(now))
 
     @action(detail=False, methods=['get'])
     def debtors_list(self, request):
-        today = timezone.now()
-        current_month = today.month
-        current_year = today.year
-        
-        debtors = []
-        active_tenants = Tenant.objects.filter(status='active', house__isnull=False)
-        
-        for tenant in active_tenants:
-            # 1. Expected Rent
-            rent_due = tenant.house.rent_amount
-
-            # 2. Other Bills (for this month)
-            bills_due = Bill.objects.filter(
-                tenant=tenant,
-                month_for__month=current_month,
-                month_for__year=current_year
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            total_expected = rent_due + bills_due
-            
-            # 3. VERIFIED Payments only
-            paid_amount = Payment.objects.filter(
-                tenant=tenant,
-                month_for__month=current_month,
-                month_for__year=current_year,
-                is_verified=True
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            balance = total_expected - paid_amount
-            
-            if balance > 0:
-                debtors.append({
-                    'id': tenant.id,
-                    'name': f"{tenant.user.first_name} {tenant.user.last_name}",
-                    'house': tenant.house.house_number,
-                    'phone': tenant.user.phone or "N/A",
-                    'rent_amount': rent_due,
-                    'bills_amount': bills_due,
-                    'paid_amount': paid_amount,
-                    'balance': balance
-                })
-        
-        return Response(debtors)
+        """
+        Tenants with an outstanding balance for a month (default: current month).
+        Query params: month=YYYY-MM, min_balance, ordering, page/page_size.
+        """
+        month = None
+        if request.query_params.get('month'):
+            try:
+                month = datetime.strptime(request.query_params['month'], '%Y-%m').date()
+            except ValueError:
+                return Response({'error': 'month must be in YYYY-MM format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            min_balance = Decimal(request.query_params.get('min_balance', '0'))
+        except InvalidOperation:
+            min_balance = None
+        if min_balance is None or not min_balance.is_finite():
+            return Response({'error': 'min_balance must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ordering = request.query_params.get('ordering')
+        if ordering and ordering.lstrip('-') not in DEBTOR_ORDERING:
+            return Response({'error': f'ordering must be one of {sorted(DEBTOR_ORDERING)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        debtors = tenant_balances(month).filter(balance__gt=min_balance)
+        if ordering:
+            prefix = '-' if ordering.startswith('-') else ''
+            debtors = debtors.order_by(f"{prefix}{DEBTOR_ORDERING[ordering.lstrip('-')]}", 'id')
+
+        # Paginate only when asked, so existing clients keep receiving a plain list
+        if 'page' in request.query_params:
+            paginator = DebtorPagination()
+            page = paginator.paginate_queryset(debtors, request, view=self)
+            return paginator.get_paginated_response([self._debtor_row(t) for t in page])
+
+        return Response([self._debtor_row(t) for t in debtors])
+
+    @staticmethod
+    def _debtor_row(tenant):
+        return {
+            'id': tenant.id,
+            'name': f"{tenant.user.first_name} {tenant.user.last_name}" if tenant.user else "Deleted User",
+            'house': tenant.house.house_number,
+            'phone': (tenant.user.phone if tenant.user else None) or "N/A",
+            'rent_amount': tenant.rent_due,
+            'bills_amount': tenant.bills_due,
+            'paid_amount': tenant.paid_amount,
+            'balance': tenant.balance
+        }
 
     @action(detail=False, methods=['post'])
     def ping_debtor(self, request):
@@ -180,11 +275,82 @@ class ReportsViewSet(viewsets.ViewSet):
             
             Notification.objects.create(
                 recipient=tenant.user,
-                message=f"PAYMENT REMINDER: Dear {tenant.user.first_name}, you have an outstanding balance for {current_month}. Please pay immediately.",
-                link="/tenant-dashboard"
+                message=self._reminder_message(tenant.user, current_month),
+                link="/tenant-dashboard",
+                kind='payment_reminder'
             )
             
             return Response({'message': f'Reminder sent to {tenant.user.first_name}'})
             
         except Tenant.DoesNotExist:
-            return Response({'error': 'Tenant not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({'error': 'Tenant not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['post'])
+    def ping_debtors(self, request):
+        """
+        Sends payment reminders in bulk, either to `tenant_ids` or to every
+        debtor matching min_balance, house_type and months_in_arrears (for
+        `month`, default current). Tenants reminded within `window_hours`
+        (default PAYMENT_REMINDER_WINDOW_HOURS) are skipped.
+        """
+        month = None
+        if request.data.get('month'):
+            try:
+                month = datetime.strptime(request.data['month'], '%Y-%m').date()
+            except (TypeError, ValueError):
+                return Response({'error': 'month must be in YYYY-MM format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            min_balance = Decimal(str(request.data.get('min_balance', '0')))
+            if not min_balance.is_finite():
+                raise ValueError(min_balance)
+            min_months = int(request.data.get('months_in_arrears', 0))
+            window_hours = int(request.data.get('window_hours', settings.PAYMENT_REMINDER_WINDOW_HOURS))
+        except (InvalidOperation, TypeError, ValueError):
+            return Response({'error': 'min_balance, months_in_arrears and window_hours must be numbers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        tenant_ids = request.data.get('tenant_ids')
+        if tenant_ids is not None:
+            if not isinstance(tenant_ids, list) or not all(str(i).isdigit() for i in tenant_ids):
+                return Response({'error': 'tenant_ids must be a list of IDs'}, status=status.HTTP_400_BAD_REQUEST)
+            tenant_ids = {int(i) for i in tenant_ids}
+            # Explicit IDs are reminded whatever their balance, like ping_debtor
+            recipients = tenant_balances(month, Tenant.objects.filter(id__in=tenant_ids))
+        else:
+            recipients = tenant_balances(month).filter(balance__gt=min_balance)
+            if request.data.get('house_type'):
+                recipients = recipients.filter(house__house_type=request.data['house_type'])
+            if min_months:
+                recipients = recipients.annotate(arrears=months_in_arrears(month)).filter(arrears__gte=min_months)
+
+        cutoff = timezone.now() - timedelta(hours=window_hours)
+        recipients = recipients.filter(user__isnull=False).annotate(recently_reminded=Exists(
+            Notification.objects.filter(recipient=OuterRef('user'), kind='payment_reminder', created_at__gte=cutoff)
+        ))
+
+        month_name = (month or timezone.now()).strftime('%B')
+        matched = list(recipients)
+        notifications = [
+            Notification(
+                recipient=tenant.user,
+                message=self._reminder_message(tenant.user, month_name),
+                link="/tenant-dashboard",
+                kind='payment_reminder'
+            )
+            for tenant in matched if not tenant.recently_reminded
+        ]
+        Notification.objects.bulk_create(notifications)
+
+        result = {
+            'matched': len(matched),
+            'notified': len(notifications),
+            'skipped_recently_reminded': len(matched) - len(notifications),
+        }
+        if tenant_ids is not None:
+            result['not_found'] = sorted(tenant_ids - {tenant.id for tenant in matched})
+        return Response(result)
+
+    @staticmethod
+    def _reminder_message(user, month_name):
+        return f"PAYMENT REMINDER: Dear {user.first_name}, you have an outstanding balance for {month_name}. Please pay immediately."
\ No newline at end of file
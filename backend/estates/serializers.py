@@ -1,11 +1,14 @@
+from django.conf import settings
+from django.core.validators import FileExtensionValidator
 from rest_framework import serializers
-from .models import House, Tenant, Contract, Payment, Bill
+from .models import House, Tenant, Contract, Payment, Bill, TenantMonthlyLedger
 from users.serializers import UserSerializer
+from uploads.serializers import AttachUploadsMixin, UploadField
 
 class HouseSerializer(serializers.ModelSerializer):
     class Meta:
         model = House
-        fields = '__all__'
+        exclude = ['search_vector']
 
 class TenantSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -16,14 +19,33 @@ class TenantSerializer(serializers.ModelSerializer):
         model = Tenant
         fields = '__all__'
 
-class ContractSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('user', 'house')
+
+class ContractSerializer(AttachUploadsMixin, serializers.ModelSerializer):
     tenant_name = serializers.SerializerMethodField()
     house_number = serializers.SerializerMethodField()
-    
+    # A finished resumable upload, instead of sending contract_document in the request
+    contract_document_upload = UploadField()
+    upload_fields = {'contract_document_upload': 'contract_document'}
+
     class Meta:
         model = Contract
         fields = '__all__'
         read_only_fields = ['archived_tenant_name', 'archived_house_number']
+        # Loading the user with the tenant lets save() snapshot the name without a query
+        extra_kwargs = {
+            'tenant': {'queryset': Tenant.objects.select_related('user')},
+            # The stored file keeps the uploaded name's extension (see uploads.storage)
+            'contract_document': {'validators': [
+                FileExtensionValidator([extension.lstrip('.') for extension in settings.UPLOAD_EXTENSIONS])
+            ]},
+        }
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('tenant__user', 'house')
 
     def get_tenant_name(self, obj):
         if obj.tenant and obj.tenant.user:
@@ -48,6 +70,18 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = ['id', 'tenant', 'tenant_name', 'house_number', 'amount', 'payment_date', 
                   'payment_method', 'payment_type', 'reference_number', 'month_for', 'is_verified', 'created_at']
         read_only_fields = ['is_verified', 'created_at', 'archived_tenant_name']
+        extra_kwargs = {
+            'tenant': {'queryset': Tenant.objects.select_related('user')},
+            # The stored file keeps the uploaded name's extension (see uploads.storage)
+            'contract_document': {'validators': [
+                FileExtensionValidator([extension.lstrip('.') for extension in settings.UPLOAD_EXTENSIONS])
+            ]},
+        }
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Everything get_tenant_name / get_house_number read, in the same query
+        return queryset.select_related('tenant__user', 'tenant__house')
 
     def get_tenant_name(self, obj):
         if obj.tenant and obj.tenant.user:
@@ -69,6 +103,18 @@ class BillSerializer(serializers.ModelSerializer):
         model = Bill
         fields = ['id', 'tenant', 'tenant_name', 'house_number', 'bill_type', 'amount', 'month_for', 'description', 'is_paid', 'created_at']
         read_only_fields = ['is_paid', 'created_at', 'archived_tenant_name']
+        extra_kwargs = {
+            'tenant': {'queryset': Tenant.objects.select_related('user')},
+            # The stored file keeps the uploaded name's extension (see uploads.storage)
+            'contract_document': {'validators': [
+                FileExtensionValidator([extension.lstrip('.') for extension in settings.UPLOAD_EXTENSIONS])
+            ]},
+        }
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Everything get_tenant_name / get_house_number read, in the same query
+        return queryset.select_related('tenant__user', 'tenant__house')
 
     def get_tenant_name(self, obj):
         if obj.tenant and obj.tenant.user:
@@ -80,4 +126,23 @@ class BillSerializer(serializers.ModelSerializer):
     def get_house_number(self, obj):
         if obj.tenant and obj.tenant.house:
             return obj.tenant.house.house_number
-        return "N/A"
\ No newline at end of file
+        return "N/A"
+
+class TenantMonthlyLedgerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TenantMonthlyLedger
+        fields = ['period', 'rent_due', 'bills_due', 'paid_amount', 'balance', 'updated_at']
+
+class TenantStatementEntrySerializer(serializers.Serializer):
+    date = serializers.DateField(source='entry_date')
+    entry_type = serializers.CharField()
+    category = serializers.CharField()
+    reference = serializers.CharField()
+    source_id = serializers.SerializerMethodField()
+    charge = serializers.DecimalField(max_digits=12, decimal_places=2)
+    payment = serializers.DecimalField(max_digits=12, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+    def get_source_id(self, obj):
+        # Bill or payment id; rent charges are generated and have none
+        return obj.source_id or None
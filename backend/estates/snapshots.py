@@ -0,0 +1,134 @@
+"""
+Archived snapshot columns (archived_tenant_name, archived_house_number,
+archived_reported_by) keep history readable once the tenant, house or user
+they point to is deleted. They are only shown when the relation is gone, so
+they do not need to be exact on every write:
+
+* save() copies a value only from related objects the caller already loaded,
+  never fetching one just for the snapshot.
+* Columns in SET_ONCE record who it was at the time (the reporter of a
+  maintenance request) and are only ever filled while empty, by save(), the
+  delete receiver and the command alike.
+* Right before a Tenant, House or User is deleted (and its foreign keys are
+  nulled), one UPDATE per snapshot column stores the final values.
+* The refresh_snapshots command updates stale values in batches, e.g. after
+  users or houses were renamed, or rows were written with bulk_create/COPY.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Concat, Trim
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+# (model, snapshot column, relation path, source attribute)
+SNAPSHOTS = [
+    ('estates.Contract', 'archived_tenant_name', 'tenant__user', 'full_name'),
+    ('estates.Contract', 'archived_house_number', 'house', 'house_number'),
+    ('estates.Payment', 'archived_tenant_name', 'tenant__user', 'full_name'),
+    ('estates.Bill', 'archived_tenant_name', 'tenant__user', 'full_name'),
+    ('maintenance.MaintenanceRequest', 'archived_house_number', 'house', 'house_number'),
+    ('maintenance.MaintenanceRequest', 'archived_reported_by', 'reported_by', 'full_name'),
+]
+
+# (model, snapshot column) pairs kept once filled
+SET_ONCE = {
+    ('maintenance.MaintenanceRequest', 'archived_reported_by'),
+}
+
+
+def _python_value(obj, source):
+    return obj.get_full_name() if source == 'full_name' else getattr(obj, source)
+
+
+def _sql_value(path, source):
+    if source == 'full_name':
+        # Same result as User.get_full_name()
+        return Trim(Concat(f'{path}__first_name', Value(' '), f'{path}__last_name', output_field=CharField()))
+    return F(f'{path}__{source}')
+
+
+def _loaded(instance, path):
+    """
+    Follows `path` ('tenant__user') through relations already cached on the
+    instance. Returns None when a hop was not loaded or is empty.
+    """
+    for name in path.split('__'):
+        if instance is None or not instance._meta.get_field(name).is_cached(instance):
+            return None
+        instance = getattr(instance, name)
+    return instance
+
+
+def fill_snapshots(instance):
+    """
+    Sets the instance's snapshot columns from loaded relations. Called from save().
+    """
+    label = instance._meta.label
+    for model, field, path, source in SNAPSHOTS:
+        if model == label:
+            if (model, field) in SET_ONCE and getattr(instance, field):
+                continue
+            related = _loaded(instance, path)
+            if related is not None:
+                setattr(instance, field, _python_value(related, source))
+
+
+def refresh_snapshots(batch_size=1000, dry_run=False, related=None):
+    """
+    Rewrites snapshot columns that differ from the live tenant, house or user,
+    keyset-batched by primary key with one transaction per batch. With
+    `related` (a Tenant, House or User), only rows pointing at it are touched.
+    Returns {'<model>.<column>': rows changed (or stale, with dry_run)}.
+    """
+    counts = {}
+    for label, field, path, source in SNAPSHOTS:
+        model = apps.get_model(label)
+        stale = model.objects.filter(**{f'{path}__isnull': False})
+        if (label, field) in SET_ONCE:
+            stale = stale.filter(**{field: ''})
+        if related is not None:
+            prefix = _prefix_for(model, path, type(related))
+            if prefix is None:
+                continue
+            stale = stale.filter(**{prefix: related})
+        stale = stale.annotate(live=_sql_value(path, source)).exclude(**{field: F('live')}).order_by('pk')
+
+        if dry_run:
+            counts[f'{label}.{field}'] = stale.count()
+            continue
+
+        changed, last_pk = 0, None
+        while True:
+            with transaction.atomic():
+                batch = stale if last_pk is None else stale.filter(pk__gt=last_pk)
+                rows = list(batch.values_list('pk', 'live')[:batch_size])
+                if not rows:
+                    break
+                model.objects.bulk_update([model(pk=pk, **{field: live}) for pk, live in rows], [field])
+            changed += len(rows)
+            last_pk = rows[-1][0]
+        counts[f'{label}.{field}'] = changed
+    return counts
+
+
+def _prefix_for(model, path, target):
+    """
+    The part of `path` that ends at `target`'s model ('tenant' for a Tenant on
+    'tenant__user'), or None when the path never reaches it.
+    """
+    names = path.split('__')
+    for i, name in enumerate(names):
+        model = model._meta.get_field(name).related_model
+        if model is target:
+            return '__'.join(names[:i + 1])
+    return None
+
+
+@receiver(pre_delete, sender='estates.Tenant')
+@receiver(pre_delete, sender='estates.House')
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def snapshot_before_delete(sender, instance, **kwargs):
+    # pre_delete runs before the collector nulls the foreign keys
+    refresh_snapshots(related=instance)
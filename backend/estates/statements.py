@@ -0,0 +1,119 @@
+"""
+Tenant account statement: rent charges, bills and verified payments merged
+into one chronological ledger with a running balance.
+
+The whole statement is one SQL query. A CTE unions the three sources (one
+rent charge on the first of every month from move-in to the contract end or
+today), a SUM() window adds up the running balance over the tenant's full
+history, and only then are the date range and the cursor applied. A page
+therefore shows the true balance however far back it starts, and costs the
+same for any page of a tenant with ten years of history.
+
+Every month's rent follows the one rule TenantMonthlyLedger uses: the
+contract in force that month, else the house's rent. A month with a ledger
+row charges the rent_due fixed when that row was created, so the statement
+agrees with the ledger and later rent changes leave those months alone; a
+month without a row applies the rule now (see balances.rent_in_force()).
+"""
+from collections import namedtuple
+from datetime import date
+from django.db import connections, router
+from django.db.models import DateField, IntegerField
+from seams_project.pagination import KeysetPagination
+from .models import Tenant
+
+StatementEntry = namedtuple(
+    'StatementEntry',
+    ['entry_date', 'kind_order', 'source_id', 'entry_type', 'category', 'reference', 'charge', 'payment', 'balance'],
+)
+
+# Same-day entries: rent first, then bills, then payments, each by id
+ENTRY_ORDER = ['entry_date', 'kind_order', 'source_id']
+
+STATEMENT_SQL = """
+WITH entries AS (
+    SELECT month::date AS entry_date, 0 AS kind_order, 0 AS source_id, 'rent' AS entry_type,
+           'rent' AS category, '' AS reference,
+           COALESCE(ledger.rent_due, contract.monthly_rent, h.rent_amount) AS charge, 0 AS payment
+    FROM tenants t
+    LEFT JOIN houses h ON h.id = t.house_id
+    CROSS JOIN generate_series(
+        DATE_TRUNC('month', t.move_in_date), LEAST(t.contract_end, %(today)s), INTERVAL '1 month'
+    ) AS month
+    LEFT JOIN tenant_monthly_ledger ledger ON ledger.tenant_id = t.id AND ledger.period = month::date
+    LEFT JOIN LATERAL (
+        SELECT monthly_rent
+        FROM contracts
+        WHERE tenant_id = t.id AND start_date < month + INTERVAL '1 month' AND end_date >= month
+        ORDER BY start_date DESC, id DESC
+        LIMIT 1
+    ) contract ON TRUE
+    WHERE t.id = %(tenant)s
+      AND COALESCE(ledger.rent_due, contract.monthly_rent, h.rent_amount) IS NOT NULL
+    UNION ALL
+    SELECT period, 1, id, 'bill', bill_type, COALESCE(description, ''), amount, 0
+    FROM bills
+    WHERE tenant_id = %(tenant)s
+    UNION ALL
+    SELECT payment_date, 2, id, 'payment', payment_type, reference_number, 0, amount
+    FROM payments
+    WHERE tenant_id = %(tenant)s AND is_verified
+), statement AS (
+    SELECT entries.*, SUM(charge - payment) OVER (
+        ORDER BY entry_date, kind_order, source_id ROWS UNBOUNDED PRECEDING
+    ) AS balance
+    FROM entries
+)
+SELECT entry_date, kind_order, source_id, entry_type, category, reference, charge, payment, balance
+FROM statement
+WHERE entry_date BETWEEN %(start)s AND %(end)s
+  AND (entry_date, kind_order, source_id) > (%(after_date)s::date, %(after_order)s, %(after_id)s)
+ORDER BY entry_date, kind_order, source_id
+LIMIT %(limit)s
+"""
+
+
+def tenant_statement(tenant_id, start=None, end=None, after=None, limit=100, today=None):
+    """
+    Statement entries for one tenant dated within [start, end] (inclusive,
+    both optional), after the `after` position (entry_date, kind_order,
+    source_id) when given. Returns at most `limit` StatementEntry rows.
+    """
+    after_date, after_order, after_id = after or (date.min, -1, -1)
+    params = {
+        'tenant': tenant_id,
+        'today': today or date.today(),
+        'start': start or date.min,
+        'end': end or date.max,
+        'after_date': after_date,
+        'after_order': after_order,
+        'after_id': after_id,
+        'limit': limit,
+    }
+    with connections[router.db_for_read(Tenant)].cursor() as cursor:
+        cursor.execute(STATEMENT_SQL, params)
+        return [StatementEntry(*row) for row in cursor.fetchall()]
+
+
+class StatementPagination(KeysetPagination):
+    """
+    KeysetPagination over statement entries instead of a queryset. Always
+    paginates: the statement is a new endpoint with no unpaginated clients.
+    """
+    page_size = 100
+
+    def get_cursor_fields(self):
+        # The cursor values become %(after_date)s::date and integer parameters
+        return [DateField(), IntegerField(), IntegerField()]
+
+    def paginate_statement(self, tenant_id, request, start=None, end=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = ENTRY_ORDER
+
+        rows = tenant_statement(
+            tenant_id, start=start, end=end, after=self.decode_cursor(request), limit=self.page_size + 1
+        )
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
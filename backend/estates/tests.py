@@ -1,3 +1,1401 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import House, Tenant, Contract, Payment, Bill, TenantMonthlyLedger
+from .report_cache import cached_report
+from .reports import DASHBOARD_SUMMARY, ReportDefinition
+from .async_reports import gather_parts
+from .views import PaymentViewSet
+from seams_project import exports
+from seams_project.metrics import registry
+from seams_project.db_routing import statement_timeout, is_statement_timeout
+from maintenance.models import MaintenanceRequest
+from users.models import Notification
 
-# Create your tests here.
+User = get_user_model()
+
+
+def make_tenant(index, rent=Decimal('10000'), status='active'):
+    user = User.objects.create_user(
+        username=f'tenant{index}', role='tenant',
+        first_name='Tenant', last_name=str(index), phone=f'07000000{index:02d}'
+    )
+    house = House.objects.create(
+        house_number=f'H{index:03d}', house_type='1_bedroom', rent_amount=rent, status='occupied'
+    )
+    return Tenant.objects.create(
+        user=user, house=house, move_in_date=date(2024, 1, 1),
+        contract_start=date(2024, 1, 1), contract_end=date(2030, 1, 1), status=status
+    )
+
+
+class DebtorsListTests(APITestCase):
+    url = '/api/reports/debtors_list/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.admin)
+        self.month = date.today().replace(day=1)
+
+    def test_balance_includes_bills_and_verified_payments_only(self):
+        tenant = make_tenant(1)
+        Bill.objects.create(tenant=tenant, bill_type='water', amount=Decimal('500'), month_for=self.month)
+        Payment.objects.create(
+            tenant=tenant, amount=Decimal('4000'), payment_date=self.month, payment_method='mpesa',
+            month_for=self.month, is_verified=True
+        )
+        Payment.objects.create(
+            tenant=tenant, amount=Decimal('6500'), payment_date=self.month, payment_method='mpesa',
+            month_for=self.month, is_verified=False
+        )
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        row = response.data[0]
+        self.assertEqual(row['bills_amount'], Decimal('500'))
+        self.assertEqual(row['paid_amount'], Decimal('4000'))
+        self.assertEqual(row['balance'], Decimal('6500'))
+        self.assertEqual(row['house'], 'H001')
+
+    def test_fully_paid_and_inactive_tenants_are_excluded(self):
+        paid = make_tenant(1)
+        Payment.objects.create(
+            tenant=paid, amount=Decimal('10000'), payment_date=self.month, payment_method='bank',
+            month_for=self.month, is_verified=True
+        )
+        make_tenant(2, status='inactive')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data, [])
+
+    def test_month_min_balance_and_ordering(self):
+        make_tenant(1, rent=Decimal('5000'))
+        make_tenant(2, rent=Decimal('20000'))
+        make_tenant(3, rent=Decimal('12000'))
+
+        response = self.client.get(self.url, {'min_balance': '6000', 'ordering': '-balance'})
+        self.assertEqual([row['house'] for row in response.data], ['H002', 'H003'])
+
+        last_year = self.month.replace(year=self.month.year - 1)
+        response = self.client.get(self.url, {'month': last_year.strftime('%Y-%m'), 'ordering': 'balance'})
+        self.assertEqual([row['house'] for row in response.data], ['H001', 'H003', 'H002'])
+
+        self.assertEqual(self.client.get(self.url, {'month': '2024-13'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ordering': 'password'}).status_code, 400)
+        for value in ('NaN', 'Infinity', '-inf', 'x'):
+            self.assertEqual(self.client.get(self.url, {'min_balance': value}).status_code, 400)
+
+    def test_pagination(self):
+        for i in range(5):
+            make_tenant(i)
+
+        response = self.client.get(self.url, {'page': 2, 'page_size': 2, 'ordering': 'house'})
+
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([row['house'] for row in response.data['results']], ['H002', 'H003'])
+
+    def test_query_count_is_constant(self):
+        for i in range(3):
+            make_tenant(i)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+
+        for i in range(3, 30):
+            tenant = make_tenant(i)
+            Bill.objects.create(tenant=tenant, bill_type='water', amount=Decimal('300'), month_for=self.month)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.data), 30)
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 1)
+
+
+class PingDebtorsTests(APITestCase):
+    url = '/api/reports/ping_debtors/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.admin)
+        self.month = date.today().replace(day=1)
+
+    def reminders(self):
+        return Notification.objects.filter(kind='payment_reminder')
+
+    def test_filters_and_single_insert(self):
+        for i in range(1, 6):
+            make_tenant(i, rent=Decimal(i * 5000))
+        paid = make_tenant(6)
+        Payment.objects.create(
+            tenant=paid, amount=Decimal('10000'), payment_date=self.month, payment_method='bank',
+            month_for=self.month, is_verified=True
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'min_balance': '12000'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'matched': 3, 'notified': 3, 'skipped_recently_reminded': 0})
+        self.assertEqual(
+            sorted(self.reminders().values_list('recipient__username', flat=True)),
+            ['tenant3', 'tenant4', 'tenant5']
+        )
+        # Session/auth lookups aside: one SELECT for recipients, one INSERT
+        self.assertEqual(len([q for q in queries if 'notification' in q['sql'].lower()]), 2)
+
+    def test_recently_reminded_tenants_are_skipped(self):
+        make_tenant(1)
+        make_tenant(2)
+
+        self.assertEqual(self.client.post(self.url, {}, format='json').data['notified'], 2)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.data, {'matched': 2, 'notified': 0, 'skipped_recently_reminded': 2})
+
+        response = self.client.post(self.url, {'window_hours': 0}, format='json')
+        self.assertEqual(response.data['notified'], 2)
+        self.assertEqual(self.reminders().count(), 4)
+
+    def test_tenant_ids_house_type_and_months_in_arrears(self):
+        first, second, third = make_tenant(1), make_tenant(2), make_tenant(3)
+        House.objects.filter(pk=third.house_id).update(house_type='studio')
+        Tenant.objects.filter(pk__in=[first.pk, third.pk]).update(move_in_date=self.month)
+        # Two quiet months with no ledger rows at all, then this month
+        two_months_ago = ((self.month - timedelta(days=1)).replace(day=1) - timedelta(days=1)).replace(day=1)
+        Tenant.objects.filter(pk=second.pk).update(move_in_date=two_months_ago)
+
+        response = self.client.post(self.url, {'tenant_ids': [first.id, 9999]}, format='json')
+        self.assertEqual(response.data['notified'], 1)
+        self.assertEqual(response.data['not_found'], [9999])
+
+        response = self.client.post(self.url, {'house_type': 'studio', 'window_hours': 0}, format='json')
+        self.assertEqual(response.data['matched'], 1)
+
+        response = self.client.post(self.url, {'months_in_arrears': 3, 'window_hours': 0}, format='json')
+        self.assertEqual(response.data['matched'], 1)
+        self.assertEqual(self.reminders().filter(recipient=second.user).count(), 1)
+
+        # A month paid in full no longer counts
+        Payment.objects.create(
+            tenant=second, amount=Decimal('10000'), payment_date=two_months_ago, payment_method='bank',
+            month_for=two_months_ago, is_verified=True
+        )
+        response = self.client.post(self.url, {'months_in_arrears': 3, 'window_hours': 0}, format='json')
+        self.assertEqual(response.data['matched'], 0)
+        response = self.client.post(self.url, {'months_in_arrears': 2, 'window_hours': 0}, format='json')
+        self.assertEqual(response.data['matched'], 1)
+
+        self.assertEqual(self.client.post(self.url, {'tenant_ids': 'all'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'min_balance': 'x'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'min_balance': 'NaN'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'min_balance': '-Infinity'}, format='json').status_code, 400)
+
+
+class TenantMonthlyLedgerTests(APITestCase):
+
+    def setUp(self):
+        self.tenant = make_tenant(1)
+        self.month = date(2025, 3, 1)
+
+    def entry(self, period=None):
+        return TenantMonthlyLedger.objects.get(tenant=self.tenant, period=period or self.month)
+
+    def test_bills_and_verified_payments_update_ledger(self):
+        Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('800'), month_for=date(2025, 3, 15))
+        payment = Payment.objects.create(
+            tenant=self.tenant, amount=Decimal('3000'), payment_date=self.month, payment_method='mpesa',
+            month_for=self.month
+        )
+        self.assertEqual(self.entry().paid_amount, Decimal('0'))
+        self.assertEqual(self.entry().balance, Decimal('10800'))
+
+        payment.is_verified = True
+        payment.save()
+
+        self.assertEqual(self.entry().paid_amount, Decimal('3000'))
+        self.assertEqual(self.entry().balance, Decimal('7800'))
+
+    def test_moving_and_deleting_rows_refreshes_both_months(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant, amount=Decimal('2500'), payment_date=self.month, payment_method='cash',
+            month_for=self.month, is_verified=True
+        )
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.month_for = date(2025, 4, 1)
+        payment.save()
+
+        self.assertEqual(self.entry().paid_amount, Decimal('0'))
+        self.assertEqual(self.entry(date(2025, 4, 1)).paid_amount, Decimal('2500'))
+
+        payment.delete()
+        self.assertEqual(self.entry(date(2025, 4, 1)).paid_amount, Decimal('0'))
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        other = make_tenant(2)
+        for tenant, amount in [(self.tenant, '1200'), (other, '700'), (other, '300')]:
+            Bill.objects.create(tenant=tenant, bill_type='garbage', amount=Decimal(amount), month_for=self.month)
+            Payment.objects.create(
+                tenant=tenant, amount=Decimal(amount), payment_date=self.month, payment_method='bank',
+                month_for=self.month, is_verified=True
+            )
+        incremental = set(TenantMonthlyLedger.objects.values_list('tenant', 'period', 'bills_due', 'paid_amount', 'balance'))
+
+        call_command('rebuild_ledger', stdout=StringIO())
+
+        rebuilt = set(TenantMonthlyLedger.objects.filter(period=self.month)
+                      .values_list('tenant', 'period', 'bills_due', 'paid_amount', 'balance'))
+        self.assertEqual(incremental, rebuilt)
+        current = date.today().replace(day=1)
+        self.assertEqual(TenantMonthlyLedger.objects.filter(period=current).count(), 2)
+
+    def test_rent_is_fixed_when_the_month_is_created(self):
+        Contract.objects.create(
+            tenant=self.tenant, house=self.tenant.house, start_date=date(2025, 4, 1), end_date=date(2026, 3, 31),
+            monthly_rent=Decimal('12000'), deposit_paid=Decimal('0')
+        )
+        Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('800'), month_for=self.month)
+        House.objects.filter(pk=self.tenant.house_id).update(rent_amount=Decimal('15000'))
+
+        # Later activity in March and a rebuild keep March's rent
+        Bill.objects.create(tenant=self.tenant, bill_type='garbage', amount=Decimal('200'), month_for=self.month)
+        Payment.objects.bulk_create([Payment(
+            tenant=self.tenant, amount=Decimal('100'), payment_date=self.month, payment_method='cash',
+            month_for=date(2025, 4, 1), is_verified=True
+        )])
+        TenantMonthlyLedger.refresh_many([(self.tenant.id, self.month), (self.tenant.id, date(2025, 4, 1))])
+        call_command('rebuild_ledger', stdout=StringIO())
+
+        self.assertEqual((self.entry().rent_due, self.entry().balance), (Decimal('10000'), Decimal('11000')))
+        # April is created under the contract in force then, not the house's new rent
+        self.assertEqual(self.entry(date(2025, 4, 1)).rent_due, Decimal('12000'))
+
+    def test_tenant_ledger_endpoint(self):
+        Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('800'), month_for=self.month)
+        admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(admin)
+
+        response = self.client.get(f'/api/tenants/{self.tenant.id}/ledger/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['period'], '2025-03-01')
+        self.assertEqual(Decimal(response.data[0]['balance']), Decimal('10800.00'))
+
+
+class PeriodKeyTests(APITestCase):
+
+    def setUp(self):
+        self.tenant = make_tenant(1)
+
+    def test_period_follows_month_for_on_every_write_path(self):
+        bill = Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('800'), month_for=date(2025, 3, 15))
+        self.assertEqual(Bill.objects.get(pk=bill.pk).period, date(2025, 3, 1))
+
+        Bill.objects.filter(pk=bill.pk).update(month_for=date(2025, 12, 31))
+        self.assertEqual(Bill.objects.get(pk=bill.pk).period, date(2025, 12, 1))
+
+        Payment.objects.bulk_create([Payment(
+            tenant=self.tenant, amount=Decimal('100'), payment_date=date(2025, 3, 2), payment_method='cash',
+            month_for=date(2025, 2, 28)
+        )])
+        self.assertEqual(Payment.objects.get().period, date(2025, 2, 1))
+
+    def assertUsesIndex(self, queryset, index_name):
+        # The test tables are tiny, so the planner would pick a sequential scan
+        # regardless; disabling it shows whether an index can serve the filter
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_finance_filters_use_period_indexes(self):
+        month = date(2025, 3, 1)
+        # Two years of rows, so the statistics favour the period indexes over
+        # the tenant-only keyset ones
+        days = [date(2024 + i // 12, i % 12 + 1, day) for i in range(24) for day in (1, 15)]
+        Payment.objects.bulk_create([
+            Payment(tenant=self.tenant, amount=Decimal('100'), payment_date=day, payment_method='cash',
+                    month_for=day, is_verified=bool(i % 2))
+            for i, day in enumerate(days)
+        ])
+        Bill.objects.bulk_create([
+            Bill(tenant=self.tenant, bill_type=bill_type, amount=Decimal('100'), month_for=day)
+            for day in days for bill_type in ('water', 'electricity', 'garbage')
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE payments, bills')
+
+        self.assertUsesIndex(
+            Payment.objects.filter(tenant=self.tenant, period=month, is_verified=True).values('amount'),
+            'payment_tenant_period_idx'
+        )
+        self.assertUsesIndex(
+            Bill.objects.filter(tenant=self.tenant, bill_type='water', is_paid=False, period=month).values('amount'),
+            'bill_tenant_period_idx'
+        )
+
+
+def encode_position(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class PaymentKeysetPaginationTests(APITestCase):
+    url = '/api/payments/'
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        tenant = make_tenant(1)
+        # Duplicate payment dates exercise the id tiebreaker
+        for i in range(7):
+            Payment.objects.create(
+                tenant=tenant, amount=Decimal('100') * (i + 1), payment_date=date(2025, 1, 1 + i // 3),
+                payment_method='mpesa', month_for=date(2025, 1, 1)
+            )
+
+    def walk(self, page_size):
+        pages, url, params = [], self.url, {'page_size': page_size}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url, params = response.data['next'], None
+        return pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        pages = self.walk(3)
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        served = [pk for page in pages for pk in page]
+        expected = list(Payment.objects.order_by('-payment_date', '-id').values_list('id', flat=True))
+        self.assertEqual(served, expected)
+
+    def test_compatibility_mode_returns_plain_list(self):
+        response = self.client.get(self.url)
+
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_deep_pages_cost_the_same_as_first_page(self):
+        first = self.client.get(self.url, {'page_size': 2})
+        with CaptureQueriesContext(connection) as page_one:
+            self.client.get(self.url, {'page_size': 2})
+        with CaptureQueriesContext(connection) as page_three:
+            second = self.client.get(first.data['next'])
+            self.client.get(second.data['next'])
+
+        self.assertEqual(len(page_three), 2 * len(page_one))
+        self.assertNotIn('OFFSET', page_three[-1]['sql'].split('FROM "payments"')[-1])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 404)
+        for position in (['abc', 1], [None, 1], ['2024-01-01', 'x'], [[], {}]):
+            self.assertEqual(self.client.get(self.url, {'cursor': encode_position(position)}).status_code, 404)
+
+
+def scraped(body, name, **labels):
+    """
+    Value of one sample in a Prometheus text exposition, or None.
+    """
+    wanted = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    for line in body.splitlines():
+        sample, _, value = line.rpartition(' ')
+        if sample == f'{name}{{{wanted}}}':
+            return float(value)
+    return None
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTests(APITestCase):
+    url = '/api/_metrics'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.admin)
+
+    def scrape(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_per_endpoint_latency_queries_and_size(self):
+        before = self.scrape()
+        for i in range(3):
+            make_tenant(i)
+        self.client.get('/api/reports/debtors_list/')
+        self.client.get('/api/reports/debtors_list/')
+
+        body = self.scrape()
+
+        endpoint = {'endpoint': 'reports-debtors-list'}
+        count = scraped(body, 'seams_http_request_duration_seconds_count', **endpoint)
+        self.assertEqual(count - (scraped(before, 'seams_http_request_duration_seconds_count', **endpoint) or 0), 2)
+        self.assertIsNotNone(scraped(body, 'seams_http_requests_total', endpoint='reports-debtors-list', method='GET', status=200))
+        self.assertIsNotNone(scraped(body, 'seams_http_request_duration_seconds_bucket', endpoint='reports-debtors-list', le='+Inf'))
+        self.assertGreaterEqual(scraped(body, 'seams_db_queries_per_request_sum', **endpoint), 2)
+        self.assertGreater(scraped(body, 'seams_http_response_size_bytes_total', **endpoint), 0)
+        self.assertIn('# TYPE seams_http_request_duration_seconds histogram', body)
+
+    def test_worker_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.client.get('/api/houses/')
+            labels = [['endpoint', 'house-list'], ['method', 'GET'], ['status', 200]]
+            local = scraped(self.scrape(), 'seams_http_requests_total',
+                            endpoint='house-list', method='GET', status=200)
+
+            # Another worker process's flushed totals
+            with open(os.path.join(directory, 'metrics-99999-1.json'), 'w') as handle:
+                json.dump({'counters': [['seams_http_requests_total', labels, 40]], 'histograms': []}, handle)
+
+            body = self.scrape()
+
+        self.assertEqual(scraped(body, 'seams_http_requests_total', endpoint='house-list', method='GET', status=200), local + 40)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer sécret').status_code, 403)
+        self.scrape()
+
+    def test_concurrent_flushes_never_fail_requests(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory,
+                                                                           METRICS_FLUSH_SECONDS=0):
+            errors = []
+
+            def flush():
+                try:
+                    for _ in range(50):
+                        registry.flush()
+                except Exception as error:
+                    errors.append(error)
+
+            threads = [threading.Thread(target=flush) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual([name for name in os.listdir(directory) if not name.endswith('.json')], [])
+
+            # An unwritable directory is logged, not raised
+            with mock.patch('seams_project.metrics.tempfile.mkstemp', side_effect=PermissionError), \
+                    self.assertLogs('seams_project.metrics', 'ERROR'):
+                self.assertEqual(self.client.get('/api/houses/').status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_hidden_without_a_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+
+class ListQueryCountTests(APITestCase):
+    """
+    Each list endpoint issues the same number of queries however many rows it returns.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        self.created = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.created += 1
+            tenant = make_tenant(self.created)
+            Payment.objects.create(
+                tenant=tenant, amount=Decimal('100'), payment_date=date(2025, 1, 1),
+                payment_method='mpesa', month_for=date(2025, 1, 1)
+            )
+            Bill.objects.create(tenant=tenant, bill_type='water', amount=Decimal('50'), month_for=date(2025, 1, 1))
+            Contract.objects.create(
+                tenant=tenant, house=tenant.house, start_date=date(2025, 1, 1), end_date=date(2026, 1, 1),
+                monthly_rent=Decimal('10000'), deposit_paid=Decimal('10000')
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = ['/api/payments/', '/api/bills/', '/api/contracts/', '/api/tenants/']
+        self.add_rows(2)
+        small = {url: self.count_queries(url) for url in urls}
+        self.add_rows(10)
+        large = {url: self.count_queries(url) for url in urls}
+
+        self.assertEqual(small, large)
+        self.assertEqual(set(large.values()), {1})
+
+
+class ReportCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        self.tenant = make_tenant(1)
+
+    def pay(self, amount):
+        today = date.today()
+        return Payment.objects.create(
+            tenant=self.tenant, amount=Decimal(amount), payment_date=today, payment_method='cash',
+            month_for=today, is_verified=True
+        )
+
+    def test_second_request_is_served_from_cache(self):
+        self.pay('1000')
+        first = self.client.get('/api/reports/dashboard_summary/')
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/reports/dashboard_summary/')
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(len(queries), 0)
+
+    def test_writes_invalidate_only_dependent_reports(self):
+        self.client.get('/api/reports/dashboard_summary/')
+        self.client.get('/api/reports/occupancy_stats/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pay('2500')
+            # Until the write commits, the cached report still matches the database
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/api/reports/dashboard_summary/')
+            self.assertEqual(len(queries), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reports/occupancy_stats/')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data['occupancy']['occupied'], 1)
+
+        response = self.client.get('/api/reports/dashboard_summary/')
+        self.assertEqual(response.data['total_income'], Decimal('2500'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            House.objects.create(house_number='V1', house_type='bedsitter', rent_amount=Decimal('4000'))
+        response = self.client.get('/api/reports/occupancy_stats/')
+        self.assertEqual(response.data['occupancy']['total'], 2)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                cached_report('slow_report', {'x': 1}, ['estates.Payment'], compute)
+            ))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 42}] * 8)
+
+
+class HouseStatusSyncTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.admin)
+
+    def test_command_reports_and_applies_two_updates(self):
+        occupied = make_tenant(1).house
+        House.objects.filter(pk=occupied.pk).update(status='vacant')
+        empty = House.objects.create(house_number='E001', house_type='bedsitter', rent_amount=5000, status='occupied')
+        repair = House.objects.create(house_number='R001', house_type='bedsitter', rent_amount=5000, status='under_repair')
+
+        out = StringIO()
+        call_command('sync_house_status', '--dry-run', stdout=out)
+        self.assertIn('H001: vacant -> occupied', out.getvalue())
+        self.assertIn('E001: occupied -> vacant', out.getvalue())
+        self.assertIn('Would update 2 houses', out.getvalue())
+        self.assertEqual(House.objects.get(pk=empty.pk).status, 'occupied')
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sync_house_status', stdout=StringIO())
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(
+            dict(House.objects.values_list('house_number', 'status')),
+            {'H001': 'occupied', 'E001': 'vacant', 'R001': 'under_repair'}
+        )
+
+        # --since skips houses (and tenants) untouched since then
+        House.objects.filter(pk=empty.pk).update(status='occupied', updated_at=timezone.now() - timedelta(days=30))
+        out = StringIO()
+        call_command('sync_house_status', '--since', date.today().isoformat(), stdout=out)
+        self.assertIn('Successfully synchronized 0 houses', out.getvalue())
+        self.assertEqual(repair.tenants.count(), 0)
+
+    def test_tenant_changes_keep_house_status_in_sync(self):
+        house = House.objects.create(house_number='A001', house_type='bedsitter', rent_amount=5000)
+        other = House.objects.create(house_number='A002', house_type='bedsitter', rent_amount=5000, status='reserved')
+        user = User.objects.create_user(username='newtenant', role='tenant')
+
+        response = self.client.post('/api/tenants/', {
+            'user_id': user.id, 'house': house.id, 'move_in_date': '2024-01-01',
+            'contract_start': '2024-01-01', 'contract_end': '2030-01-01', 'status': 'active'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        house.refresh_from_db()
+        self.assertEqual(house.status, 'occupied')
+
+        tenant = Tenant.objects.get(pk=response.data['id'])
+        tenant.house = other
+        tenant.save()
+        self.assertEqual(dict(House.objects.values_list('house_number', 'status')), {'A001': 'vacant', 'A002': 'occupied'})
+
+        tenant.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'vacant')
+
+
+class SnapshotTests(APITestCase):
+
+    def setUp(self):
+        self.tenant = make_tenant(1)
+        self.month = date(2025, 3, 1)
+
+    def contract(self, **kwargs):
+        return Contract(
+            start_date=self.month, end_date=date(2026, 3, 1), monthly_rent=Decimal('10000'),
+            deposit_paid=Decimal('10000'), **kwargs
+        )
+
+    def test_save_does_not_fetch_relations_for_snapshots(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.contract(tenant_id=self.tenant.id, house_id=self.tenant.house_id).save()
+        self.assertEqual(len(queries), 1)
+
+        tenant = Tenant.objects.select_related('user', 'house').get(pk=self.tenant.pk)
+        contract = self.contract(tenant=tenant, house=tenant.house)
+        with CaptureQueriesContext(connection) as queries:
+            contract.save()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual((contract.archived_tenant_name, contract.archived_house_number), ('Tenant 1', 'H001'))
+
+    def test_deleting_user_or_house_stores_final_values(self):
+        payment = Payment.objects.create(
+            tenant_id=self.tenant.id, amount=Decimal('100'), payment_date=self.month,
+            payment_method='cash', month_for=self.month
+        )
+        contract = self.contract(tenant_id=self.tenant.id, house_id=self.tenant.house_id)
+        contract.save()
+        self.assertEqual(Payment.objects.get(pk=payment.pk).archived_tenant_name, '')
+
+        User.objects.filter(pk=self.tenant.user_id).delete()
+        House.objects.filter(pk=self.tenant.house_id).delete()
+
+        self.assertEqual(Payment.objects.get(pk=payment.pk).archived_tenant_name, 'Tenant 1')
+        contract.refresh_from_db()
+        self.assertEqual((contract.archived_tenant_name, contract.archived_house_number), ('Tenant 1', 'H001'))
+
+    def test_command_refreshes_renamed_records(self):
+        Bill.objects.bulk_create([
+            Bill(tenant=self.tenant, bill_type='water', amount=Decimal('10'), month_for=self.month) for _ in range(3)
+        ])
+        User.objects.filter(pk=self.tenant.user_id).update(first_name='Renamed')
+
+        out = StringIO()
+        call_command('refresh_snapshots', '--dry-run', stdout=out)
+        self.assertIn('estates.Bill.archived_tenant_name: 3', out.getvalue())
+        self.assertEqual(Bill.objects.filter(archived_tenant_name='').count(), 3)
+
+        call_command('refresh_snapshots', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(set(Bill.objects.values_list('archived_tenant_name', flat=True)), {'Renamed 1'})
+
+        out = StringIO()
+        call_command('refresh_snapshots', stdout=out)
+        self.assertIn('Refreshed 0 stale snapshots', out.getvalue())
+
+    def test_reporter_snapshot_is_set_once(self):
+        reporter = self.tenant.user
+        request = MaintenanceRequest.objects.create(house=self.tenant.house, reported_by=reporter,
+                                                    issue_description='Leak')
+        self.assertEqual(request.archived_reported_by, 'Tenant 1')
+
+        User.objects.filter(pk=reporter.pk).update(first_name='Renamed')
+        request = MaintenanceRequest.objects.select_related('reported_by').get(pk=request.pk)
+        request.save()
+        call_command('refresh_snapshots', stdout=StringIO())
+        reporter.delete()
+        self.assertEqual(MaintenanceRequest.objects.get(pk=request.pk).archived_reported_by, 'Tenant 1')
+
+        # An empty one is still filled
+        late = User.objects.create_user(username='late', first_name='Late', last_name='Reporter')
+        request = MaintenanceRequest.objects.create(house=self.tenant.house, issue_description='Gate')
+        MaintenanceRequest.objects.filter(pk=request.pk).update(reported_by=late)
+        call_command('refresh_snapshots', stdout=StringIO())
+        self.assertEqual(MaintenanceRequest.objects.get(pk=request.pk).archived_reported_by, 'Late Reporter')
+
+
+class HouseStatsTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        for number, status, house_type in [('A1', 'occupied', '1_bedroom'), ('A2', 'vacant', '1_bedroom'),
+                                           ('A3', 'reserved', 'bedsitter'), ('A4', 'occupied', 'bedsitter')]:
+            House.objects.create(house_number=number, house_type=house_type, status=status, rent_amount=Decimal('5000'))
+
+    def test_every_status_counted_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/houses/stats/')
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['occupied'], 2)
+        self.assertEqual(response.data['reserved'], 1)
+        self.assertEqual(response.data['under_repair'], 0)
+        self.assertEqual(response.data['occupancy_rate'], 50.0)
+
+    def test_group_by_house_type(self):
+        response = self.client.get('/api/houses/stats/', {'group_by': 'house_type'})
+
+        groups = {row['house_type']: row for row in response.data['groups']}
+        self.assertEqual(groups['bedsitter']['reserved'], 1)
+        self.assertEqual(groups['1_bedroom']['vacant'], 1)
+        self.assertEqual(self.client.get('/api/houses/stats/', {'group_by': 'rent_amount'}).status_code, 400)
+
+
+class SyntheticDataTests(APITestCase):
+    def test_generate_estate_and_benchmark_endpoints(self):
+        out = StringIO()
+        call_command('generate_estate', houses=20, months=3, technicians=2, requests_per_house=1,
+                     notifications_per_user=2, stdout=out)
+
+        self.assertEqual(House.objects.count(), 20)
+        tenants = Tenant.objects.filter(status='active')
+        self.assertEqual(tenants.count(), House.objects.filter(status='occupied').count())
+        self.assertTrue(Payment.objects.filter(reference_number__startswith='SYN').exists())
+        # Ledger rows written alongside the COPY match a recomputation
+        entry = TenantMonthlyLedger.objects.filter(tenant__in=tenants).order_by('id').first()
+        paid = entry.paid_amount
+        TenantMonthlyLedger.refresh(entry.tenant_id, entry.period)
+        entry.refresh_from_db()
+        self.assertEqual(entry.paid_amount, paid)
+
+        with self.assertRaises(CommandError):
+            call_command('generate_estate', houses=1, stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('benchmark_endpoints', repeat=1, filter='reports-', output_dir=directory, stdout=StringIO())
+            call_command('benchmark_endpoints', repeat=1, filter='reports-', output_dir=directory, stdout=out)
+            runs = sorted(os.listdir(directory))
+            with open(os.path.join(directory, runs[-1])) as handle:
+                run = json.load(handle)
+
+        self.assertEqual(run['dataset']['houses'], 20)
+        names = {r['name'] for r in run['results']}
+        self.assertIn('reports-debtors-list', names)
+        self.assertTrue(all(r['status'] == 200 for r in run['results']))
+        self.assertIn('Compared with run of', out.getvalue())
+
+
+class PaymentImportTests(APITestCase):
+    url = '/api/payments/import_statement/'
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        self.first = make_tenant(1)
+        self.second = make_tenant(2)
+        self.month = date(2025, 5, 1)
+
+    def upload(self, text, **data):
+        upload = SimpleUploadedFile('statement.csv', text.encode(), content_type='text/csv')
+        return self.client.post(self.url, {'file': upload, **data}, format='multipart')
+
+    def test_rows_matched_by_house_phone_and_account(self):
+        response = self.upload(
+            'Receipt No.,Completion Time,Paid In,house_number,phone,account\n'
+            'R1,2025-05-03 10:00:00,"4,000",H001,,\n'
+            'R2,2025-05-04 09:00:00,2500,,+254700000002,\n'
+            'R3,04/05/2025,1500,,,H002\n'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(Payment.objects.get(reference_number='R2').tenant, self.second)
+        self.assertEqual(Payment.objects.get(reference_number='R1').archived_tenant_name, 'Tenant 1')
+        self.assertTrue(Payment.objects.get(reference_number='R3').is_verified)
+        ledger = TenantMonthlyLedger.objects.get(tenant=self.second, period=self.month)
+        self.assertEqual(ledger.paid_amount, Decimal('4000'))
+
+    def test_per_row_errors_and_duplicate_references(self):
+        Payment.objects.create(
+            tenant=self.first, amount=Decimal('100'), payment_date=self.month, payment_method='mpesa',
+            month_for=self.month, reference_number='OLD1'
+        )
+        response = self.upload(
+            'reference,date,amount,house\n'
+            'OLD1,2025-05-01,100,H001\n'
+            'N1,not-a-date,100,H001\n'
+            'N2,2025-05-01,-5,H001\n'
+            'N3,2025-05-01,100,H999\n'
+            'N4,2025-05-01,100,H001\n'
+        )
+
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual([e['row'] for e in response.data['errors']], [2, 3, 4, 5])
+
+    def test_amounts_must_fit_the_payment_field(self):
+        response = self.upload(
+            'reference,date,amount,house\n'
+            'A1,2025-05-01,NaN,H001\n'
+            'A2,2025-05-01,Infinity,H001\n'
+            'A3,2025-05-01,1.005,H001\n'
+            'A4,2025-05-01,100000000,H001\n'
+            'A5,2025-05-01,99999999.99,H001\n'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual([e['row'] for e in response.data['errors']], [2, 3, 4, 5])
+
+    def test_undecodable_file_is_rejected(self):
+        text = 'reference,date,amount,house\nU1,2025-05-01,100,H001\n'.encode() + b'U2,2025-05-01,100,H\xff\n'
+        upload = SimpleUploadedFile('statement.csv', text, content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.data['errors'][-1]['errors'][0])
+
+        upload = SimpleUploadedFile('statement.xlsx', b'PK\x03\x04\xff\xfe', content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+
+    def test_bill_payments_clear_bills_in_one_pass(self):
+        water = Bill.objects.create(tenant=self.first, bill_type='water', amount=Decimal('600'), month_for=self.month)
+        Bill.objects.create(tenant=self.first, bill_type='water', amount=Decimal('900'), month_for=self.month)
+
+        response = self.upload(
+            'reference,date,amount,house,payment_type\n'
+            'W1,2025-05-10,700,H001,water\n'
+        )
+
+        self.assertEqual(response.data['bills_cleared'], 1)
+        self.assertEqual(list(Bill.objects.filter(is_paid=True)), [water])
+
+    def test_queries_scale_with_chunks_not_rows(self):
+        header = 'reference,date,amount,house\n'
+        small = header + ''.join(f'S{i},2025-05-01,10,H00{1 + i % 2}\n' for i in range(5))
+        # Another month, so both uploads create their ledger rows
+        large = header + ''.join(f'L{i},2025-06-01,10,H00{1 + i % 2}\n' for i in range(200))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.upload(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.upload(large)
+
+        self.assertEqual(response.data['imported'], 200)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_tenants_cannot_import(self):
+        self.client.force_authenticate(self.first.user)
+        self.assertEqual(self.upload('amount,date\n').status_code, 403)
+
+
+class VerifyBatchTests(APITestCase):
+    url = '/api/payments/verify_batch/'
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        self.tenant = make_tenant(1)
+        self.month = date(2025, 6, 1)
+
+    def payment(self, amount, payment_type='rent', **kwargs):
+        return Payment.objects.create(
+            tenant=self.tenant, amount=Decimal(amount), payment_date=self.month, payment_method='mpesa',
+            payment_type=payment_type, month_for=self.month, **kwargs
+        )
+
+    def test_per_payment_summary(self):
+        bill = Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('500'), month_for=self.month)
+        water = self.payment('500', 'water')
+        rent = self.payment('9000')
+        done = self.payment('100', is_verified=True)
+
+        response = self.client.post(self.url, {'payment_ids': [water.id, rent.id, done.id, 999999]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['verified'], 2)
+        self.assertEqual(response.data['results'], [
+            {'id': water.id, 'status': 'verified', 'bills_cleared': 1},
+            {'id': rent.id, 'status': 'verified', 'bills_cleared': 0},
+            {'id': done.id, 'status': 'already_verified'},
+            {'id': 999999, 'status': 'not_found'},
+        ])
+        bill.refresh_from_db()
+        self.assertTrue(bill.is_paid)
+        ledger = TenantMonthlyLedger.objects.get(tenant=self.tenant, period=self.month)
+        self.assertEqual(ledger.paid_amount, Decimal('9600'))
+
+    def test_a_bill_is_cleared_only_once(self):
+        Bill.objects.create(tenant=self.tenant, bill_type='garbage', amount=Decimal('300'), month_for=self.month)
+        first, second = self.payment('300', 'garbage'), self.payment('300', 'garbage')
+
+        response = self.client.post(self.url, {'payment_ids': [first.id, second.id]}, format='json')
+
+        self.assertEqual(response.data['bills_cleared'], 1)
+
+    def test_query_count_is_constant(self):
+        small = [self.payment('10', 'water').id for _ in range(2)]
+        large = [self.payment('10', 'water').id for _ in range(40)]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(self.url, {'payment_ids': small}, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            self.client.post(self.url, {'payment_ids': large}, format='json')
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.client.post(self.url, {'payment_ids': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'payment_ids': ['x']}, format='json').status_code, 400)
+        self.client.force_authenticate(self.tenant.user)
+        self.assertEqual(self.client.post(self.url, {'payment_ids': [1]}, format='json').status_code, 403)
+
+    def test_single_verify_still_clears_bills(self):
+        Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('200'), month_for=self.month)
+        payment = self.payment('200', 'water')
+
+        response = self.client.post(f'/api/payments/{payment.id}/verify/')
+
+        self.assertEqual(response.data['message'], 'Payment verified. 1 Bill(s) marked as Paid.')
+        response = self.client.post(f'/api/payments/{payment.id}/verify/')
+        self.assertEqual(response.data['status'], 'warning')
+
+
+class ConcurrentVerifyTests(TransactionTestCase):
+
+    def test_concurrent_batches_do_not_double_clear(self):
+        admin = User.objects.create_user(username='admin', role='estate_admin')
+        tenant = make_tenant(1)
+        month = date(2025, 6, 1)
+        Bill.objects.create(tenant=tenant, bill_type='water', amount=Decimal('400'), month_for=month)
+        payments = [
+            Payment.objects.create(
+                tenant=tenant, amount=Decimal('400'), payment_date=month, payment_method='mpesa',
+                payment_type='water', month_for=month
+            )
+            for _ in range(6)
+        ]
+        cleared = []
+
+        def verify(payment):
+            client = APIClient()
+            client.force_authenticate(admin)
+            try:
+                response = client.post('/api/payments/verify_batch/', {'payment_ids': [payment.id]}, format='json')
+                cleared.append(response.data['bills_cleared'])
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=verify, args=(payment,)) for payment in payments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(cleared), [0, 0, 0, 0, 0, 1])
+
+
+@skipUnless('replica1' in settings.DATABASES, 'needs a replica: run with seams_project.test_settings')
+class ReplicaRoutingTests(TransactionTestCase):
+    # The stand-in replica is a second connection to the test database
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        make_tenant(1)
+
+    def queries_per_database(self, method, url, data=None):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, len(primary), len(replica)
+
+    def test_reads_use_replica_and_writes_pin_to_primary(self):
+        response, _, replica = self.queries_per_database('get', '/api/reports/debtors_list/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(replica, 0)
+
+        response, primary, replica = self.queries_per_database(
+            'post', '/api/houses/', {'house_number': 'H900', 'house_type': '1_bedroom', 'rent_amount': '9000'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, 0)
+
+        # Read-your-writes: the user who just wrote reads from the primary
+        response, primary, replica = self.queries_per_database('get', '/api/houses/')
+        self.assertIn('H900', [house['house_number'] for house in response.data])
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            cache.clear()
+            _, _, replica = self.queries_per_database('get', '/api/houses/')
+        self.assertGreater(replica, 0)
+
+    def test_session_users_are_pinned_too(self):
+        self.client = APIClient()
+        self.client.force_login(self.admin)
+        _, _, replica = self.queries_per_database('get', '/api/houses/')
+        self.assertGreater(replica, 0)
+
+        response, _, _ = self.queries_per_database(
+            'post', '/api/houses/', {'house_number': 'H901', 'house_type': '1_bedroom', 'rent_amount': '9000'}
+        )
+        self.assertEqual(response.status_code, 201)
+        response, primary, replica = self.queries_per_database('get', '/api/houses/')
+        self.assertIn('H901', [house['house_number'] for house in response.data])
+        self.assertEqual(replica, 0)
+
+    def test_export_streams_from_the_replica_chosen_for_the_request(self):
+        Payment.objects.create(
+            tenant=Tenant.objects.get(), amount=Decimal('100'), payment_date=date(2025, 1, 1),
+            payment_method='cash', month_for=date(2025, 1, 1)
+        )
+        with CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.client.get('/api/payments/export/')
+            # Rows are read while the body streams, after the view returned
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('Tenant 1', body)
+        self.assertTrue(any('"payments"' in query['sql'] for query in replica))
+
+    def test_without_replicas_everything_reads_from_primary(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            _, primary, replica = self.queries_per_database('get', '/api/reports/debtors_list/')
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_report_statement_timeout(self):
+        with statement_timeout(50):
+            with self.assertRaises(OperationalError) as raised, connection.cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(1)')
+            self.assertTrue(is_statement_timeout(raised.exception))
+            # The limit covers single statements only, nothing after them
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW statement_timeout')
+                self.assertEqual(cursor.fetchone()[0], '0')
+
+        slow = lambda today: connections['replica1'].cursor().execute('SELECT pg_sleep(1)')
+        with override_settings(REPORT_STATEMENT_TIMEOUT_MS=50), \
+                mock.patch.object(DASHBOARD_SUMMARY, 'compute', slow):
+            response = self.client.get('/api/reports/dashboard_summary/')
+        self.assertEqual(response.status_code, 503)
+
+
+class AsyncReportTests(TransactionTestCase):
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(admin)}'}
+        tenant = make_tenant(1)
+        today = date.today()
+        Payment.objects.create(
+            tenant=tenant, amount=Decimal('1500'), payment_date=today, payment_method='cash',
+            month_for=today, is_verified=True
+        )
+
+    async def test_asgi_requests_get_the_same_reports_as_the_viewset(self):
+        for name in ['dashboard_summary', 'monthly_trends', 'occupancy_stats']:
+            url = f'/api/reports/{name}/'
+            await cache.aclear()
+            response = await AsyncClient().get(url, headers=self.auth)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.resolver_match.func.__module__, 'estates.async_reports')
+
+            await cache.aclear()
+            expected = await sync_to_async(Client().get)(url, headers=self.auth)
+            self.assertNotEqual(expected.resolver_match.func.__module__, 'estates.async_reports')
+            self.assertEqual(response.json(), expected.json())
+
+        self.assertEqual(response.json()['occupancy']['occupied'], 1)
+
+    async def test_permissions(self):
+        response = await AsyncClient().get('/api/reports/dashboard_summary/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+        response = await AsyncClient().get('/api/reports/dashboard_summary/', headers={'Authorization': 'Bearer junk'})
+        expected = await sync_to_async(Client().get)('/api/reports/dashboard_summary/',
+                                                     headers={'Authorization': 'Bearer junk'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+
+        tenant = await User.objects.aget(username='tenant1')
+        response = await AsyncClient().get(
+            '/api/reports/dashboard_summary/', headers={'Authorization': f'Bearer {AccessToken.for_user(tenant)}'}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    async def test_parts_run_concurrently_within_the_budget(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def part():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.2)
+            with lock:
+                running[0] -= 1
+            return threading.current_thread().name
+
+        report = ReportDefinition('test', [], lambda now: {}, lambda now: {i: part for i in range(4)}, lambda r: r)
+        with override_settings(REPORT_QUERY_CONCURRENCY=2):
+            started = time.monotonic()
+            threads = await gather_parts(report, timezone.now())
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(peak[0], 2)
+        self.assertLess(elapsed, 0.6)
+        self.assertTrue(all(name.startswith('report-query') for name in threads.values()))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_reports', '--requests', '3', '--concurrency', '2', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[2:5]], ['wsgi', 'asgi,', 'asgi,'])
+        self.assertTrue(all(line.split()[-6] == '3' for line in lines[2:5]))
+
+
+class ExportTests(APITestCase):
+    url = '/api/payments/export/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.admin)
+        self.tenants = [make_tenant(1), make_tenant(2)]
+
+    def add_payments(self, tenant, count):
+        Payment.objects.bulk_create(
+            Payment(
+                tenant=tenant, amount=Decimal('100'), payment_date=date(2025, 1, 1) + timedelta(days=i),
+                payment_method='mpesa', month_for=date(2025, 1, 1)
+            )
+            for i in range(count)
+        )
+
+    def export(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return response, [line.split(',') for line in lines]
+
+    def test_csv_has_header_and_display_values(self):
+        self.add_payments(self.tenants[0], 2)
+        response, rows = self.export()
+
+        self.assertEqual(response['Content-Type'], exports.CSV_CONTENT_TYPE)
+        self.assertIn('attachment; filename="payments-', response['Content-Disposition'])
+        self.assertEqual(rows[0][:3], ['ID', 'Tenant', 'House'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][1:5], ['Tenant 1', 'H001', '100.00', '2025-01-02'])
+
+    def test_takes_the_list_scoping(self):
+        self.add_payments(self.tenants[0], 2)
+        self.add_payments(self.tenants[1], 3)
+
+        self.client.force_authenticate(self.tenants[1].user)
+        _, rows = self.export()
+        self.assertEqual({row[1] for row in rows[1:]}, {'Tenant 2'})
+        self.assertEqual(len(rows), 4)
+
+    def test_queries_do_not_grow_with_rows(self):
+        # Tiny chunks: rows arrive over many cursor fetches, never as one list
+        with mock.patch.object(PaymentViewSet, 'export_chunk_size', 2):
+            self.add_payments(self.tenants[0], 3)
+            with CaptureQueriesContext(connection) as few:
+                _, rows = self.export()
+            self.assertEqual(len(rows), 4)
+
+            self.add_payments(self.tenants[1], 20)
+            with CaptureQueriesContext(connection) as many:
+                _, rows = self.export()
+            self.assertEqual(len(rows), 24)
+        self.assertEqual(len(few), len(many))
+
+    def test_deleted_tenant_shows_archived_name(self):
+        self.add_payments(self.tenants[0], 1)
+        Payment.objects.update(archived_tenant_name='Tenant 1')
+        self.tenants[0].delete()
+
+        _, rows = self.export()
+        self.assertEqual(rows[1][1:3], ['Tenant 1 (Deleted)', 'N/A'])
+
+    def test_bills_and_contracts(self):
+        tenant = self.tenants[0]
+        Bill.objects.create(tenant=tenant, bill_type='water', amount=Decimal('250'), month_for=date(2025, 1, 1))
+        Contract.objects.create(
+            tenant=tenant, house=tenant.house, start_date=date(2025, 1, 1), end_date=date(2026, 1, 1),
+            monthly_rent=Decimal('10000'), deposit_paid=Decimal('10000')
+        )
+
+        _, rows = self.export('/api/bills/export/')
+        self.assertEqual(rows[1][1:5], ['Tenant 1', 'H001', 'water', '250.00'])
+        _, rows = self.export('/api/contracts/export/')
+        self.assertEqual(rows[1][1:4], ['Tenant 1', 'H001', '2025-01-01'])
+
+    def test_formula_text_is_written_as_text(self):
+        self.add_payments(self.tenants[0], 1)
+        self.tenants[0].user.first_name = '=HYPERLINK("http://example.com")'
+        self.tenants[0].user.save()
+        for value in ('+1', '-1', '@SUM(A1)', '\tx', '\rx'):
+            self.assertEqual(exports._cell(value), f"'{value}")
+        self.assertEqual(exports._cell('Tenant 1'), 'Tenant 1')
+        self.assertEqual(exports._cell(Decimal('-1')), Decimal('-1'))
+
+        response = self.client.get(self.url)
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[1][1], '\'=HYPERLINK("http://example.com") 1')
+
+    def test_rejects_unknown_or_unavailable_filetype(self):
+        response = self.client.get(self.url, {'filetype': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch.object(exports, 'Workbook', None):
+            response = self.client.get(self.url, {'filetype': 'xlsx'})
+        self.assertEqual(response.status_code, 501)
+
+
+class TenantStatementTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        self.tenant = make_tenant(1)
+        Tenant.objects.filter(pk=self.tenant.pk).update(contract_end=date(2024, 3, 31))
+        self.url = f'/api/tenants/{self.tenant.pk}/statement/'
+
+    def pay(self, day, amount, is_verified=True):
+        return Payment.objects.create(
+            tenant=self.tenant, amount=Decimal(amount), payment_date=day, payment_method='mpesa',
+            month_for=day, is_verified=is_verified
+        )
+
+    def add_history(self):
+        Bill.objects.create(tenant=self.tenant, bill_type='water', amount=Decimal('500'), month_for=date(2024, 2, 15))
+        self.pay(date(2024, 2, 10), '10000')
+        self.pay(date(2024, 2, 11), '999', is_verified=False)
+
+    def entries(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [(row['date'], row['entry_type'], row['balance']) for row in response.data['results']]
+
+    def test_merges_sources_with_running_balance(self):
+        self.add_history()
+        response = self.client.get(self.url)
+
+        self.assertEqual(self.entries(response), [
+            ('2024-01-01', 'rent', '10000.00'),
+            ('2024-02-01', 'rent', '20000.00'),
+            ('2024-02-01', 'bill', '20500.00'),
+            ('2024-02-10', 'payment', '10500.00'),
+            ('2024-03-01', 'rent', '20500.00'),
+        ])
+        self.assertIsNone(response.data['results'][0]['source_id'])
+        self.assertEqual(response.data['results'][2]['category'], 'water')
+        self.assertIsNone(response.data['next'])
+
+    def test_rent_comes_from_ledger_then_contract(self):
+        self.add_history()
+        Contract.objects.create(
+            tenant=self.tenant, house=self.tenant.house, start_date=date(2024, 3, 1), end_date=date(2024, 12, 31),
+            monthly_rent=Decimal('12000'), deposit_paid=Decimal('0')
+        )
+        House.objects.filter(pk=self.tenant.house_id).update(rent_amount=Decimal('15000'))
+
+        rents = [row['charge'] for row in self.client.get(self.url).data['results'] if row['entry_type'] == 'rent']
+        # January has neither a ledger row nor a contract; February's row fixed the rent of its day
+        self.assertEqual(rents, ['15000.00', '10000.00', '12000.00'])
+
+        # Activity in February after the change keeps its rent, as the ledger does
+        self.pay(date(2024, 2, 20), '1')
+        rents = [row['charge'] for row in self.client.get(self.url).data['results'] if row['entry_type'] == 'rent']
+        self.assertEqual(rents, ['15000.00', '10000.00', '12000.00'])
+        self.assertEqual(TenantMonthlyLedger.objects.get(tenant=self.tenant, period=date(2024, 2, 1)).rent_due,
+                         Decimal('10000'))
+
+    def test_date_range_keeps_balance_from_earlier_history(self):
+        self.add_history()
+        response = self.client.get(self.url, {'start': '2024-02-05', 'end': '2024-02-29'})
+        self.assertEqual(self.entries(response), [('2024-02-10', 'payment', '10500.00')])
+
+        response = self.client.get(self.url, {'start': '2024-02-31'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pages_in_constant_queries(self):
+        # Ten years of monthly rent, bills and payments
+        Tenant.objects.filter(pk=self.tenant.pk).update(move_in_date=date(2014, 1, 1), contract_end=date(2023, 12, 31))
+        months = [date(2014 + i // 12, i % 12 + 1, 1) for i in range(120)]
+        Bill.objects.bulk_create(
+            Bill(tenant=self.tenant, bill_type='water', amount=Decimal('500'), month_for=month) for month in months
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                tenant=self.tenant, amount=Decimal('10500'), payment_date=month + timedelta(days=4),
+                payment_method='mpesa', month_for=month, is_verified=True
+            )
+            for month in months
+        )
+
+        served, url, params = [], self.url, {'page_size': 100}
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, params)
+            served.extend(self.entries(response))
+            url, params = response.data['next'], None
+
+        self.assertEqual(len(served), 360)
+        self.assertEqual(served, sorted(served, key=lambda row: row[0]))
+        self.assertEqual(served[-1][2], '0.00')
+
+    def test_invalid_cursor(self):
+        for position in (['abc', 0, 1], ['2024-01-01', 'x', 1], [None, 0, 1], ['2024-02-30', 0, 1]):
+            self.assertEqual(self.client.get(self.url, {'cursor': encode_position(position)}).status_code, 404)
+
+        response = self.client.get(self.url, {'cursor': encode_position(['2024-01-01', 0, 0])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_tenant_sees_only_own_statement(self):
+        other = make_tenant(2)
+        self.client.force_authenticate(other.user)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/tenants/{other.pk}/statement/').status_code, 200)
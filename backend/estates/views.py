@@ -2,15 +2,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Q
-from datetime import date, timedelta
-from .models import House, Tenant, Contract, Payment, Bill
-from .serializers import HouseSerializer, TenantSerializer, ContractSerializer, PaymentSerializer, BillSerializer
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+import io
+from datetime import date, datetime, timedelta
+from .models import House, Tenant, Contract, Payment, Bill, TenantMonthlyLedger
+from .payment_import import PaymentImporter
+from .reconciliation import reconcile_bills
+from .statements import StatementPagination
+from .report_cache import invalidate_reports
+from seams_project.aggregates import status_breakdown
+from seams_project.exports import ExportMixin, full_name, live_or_archived
+from seams_project.pagination import KeysetPagination
+from .serializers import HouseSerializer, TenantSerializer, ContractSerializer, PaymentSerializer, BillSerializer, TenantMonthlyLedgerSerializer, TenantStatementEntrySerializer
 
 class HouseViewSet(viewsets.ModelViewSet):
     queryset = House.objects.all()
     serializer_class = HouseSerializer
     permission_classes = [IsAuthenticated]
+    STATS_GROUPS = ['house_type', 'location']
 
     @action(detail=False, methods=['get'])
     def vacant(self, request):
@@ -20,20 +31,22 @@ class HouseViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        total = House.objects.count()
-        occupied = House.objects.filter(status='occupied').count()
-        vacant = House.objects.filter(status='vacant').count()
-        under_repair = House.objects.filter(status='under_repair').count()
-        
-        occupancy_rate = round((occupied / total * 100), 1) if total > 0 else 0
+        """
+        House counts per status from a single query.
+        Optional ?group_by=house_type|location adds a per-group breakdown.
+        """
+        group_by = request.query_params.get('group_by')
+        if group_by and group_by not in self.STATS_GROUPS:
+            return Response({'error': f'group_by must be one of {self.STATS_GROUPS}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = status_breakdown(House.objects.all(), House.STATUS_CHOICES)
+        total = counts['total']
+        occupancy_rate = round((counts['occupied'] / total * 100), 1) if total > 0 else 0
         
-        return Response({
-            'total': total,
-            'occupied': occupied,
-            'vacant': vacant,
-            'under_repair': under_repair,
-            'occupancy_rate': occupancy_rate
-        })
+        data = {**counts, 'occupancy_rate': occupancy_rate}
+        if group_by:
+            data['groups'] = status_breakdown(House.objects.all(), House.STATUS_CHOICES, group_by=group_by)
+        return Response(data)
 
 
 class TenantViewSet(viewsets.ModelViewSet):
@@ -47,52 +60,103 @@ class TenantViewSet(viewsets.ModelViewSet):
         Tenants only see their own profile. Admins see all.
         """
         user = self.request.user
+        queryset = Tenant.objects.all()
         if getattr(user, 'role', None) == 'tenant':
-            return Tenant.objects.filter(user=user)
-        return Tenant.objects.all()
-
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        
-        if response.status_code == 201:
-            house_id = request.data.get('house')
-            try:
-                house = House.objects.get(id=house_id)
-                house.status = 'occupied'
-                house.save()
-            except House.DoesNotExist:
-                pass
-        
-        return response
+            queryset = queryset.filter(user=user)
+        return self.get_serializer_class().setup_eager_loading(queryset)
 
     @action(detail=False, methods=['get'])
     def expiring(self, request):
         thirty_days_later = date.today() + timedelta(days=30)
-        expiring_tenants = Tenant.objects.filter(
+        expiring_tenants = self.get_serializer_class().setup_eager_loading(Tenant.objects.filter(
             contract_end__lte=thirty_days_later,
             contract_end__gte=date.today()
-        )
+        ))
         serializer = self.get_serializer(expiring_tenants, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        """
+        Month-by-month balances for one tenant, read from the materialized ledger.
+        """
+        tenant = self.get_object()
+        serializer = TenantMonthlyLedgerSerializer(tenant.ledger_entries.all(), many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """
+        Rent charges, bills and verified payments in date order, each with the
+        running balance. Query params: start/end=YYYY-MM-DD (inclusive),
+        cursor, page_size.
+        """
+        dates = {}
+        for param in ('start', 'end'):
+            if request.query_params.get(param):
+                try:
+                    dates[param] = datetime.strptime(request.query_params[param], '%Y-%m-%d').date()
+                except ValueError:
+                    return Response({'error': f'{param} must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tenant = self.get_object()
+        paginator = StatementPagination()
+        page = paginator.paginate_statement(tenant.pk, request, **dates)
+        return paginator.get_paginated_response(TenantStatementEntrySerializer(page, many=True).data)
+
+
+TENANT_NAME = live_or_archived('tenant__user', full_name('tenant__user'), 'archived_tenant_name', 'Unknown Tenant')
+TENANT_HOUSE = Coalesce('tenant__house__house_number', Value('N/A'))
+
 
-class ContractViewSet(viewsets.ModelViewSet):
+class ContractViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Contract.objects.all()
     serializer_class = ContractSerializer
     permission_classes = [IsAuthenticated]
+    export_name = 'contracts'
+    export_columns = [
+        ('ID', 'id'),
+        ('Tenant', TENANT_NAME),
+        ('House', live_or_archived('house', 'house__house_number', 'archived_house_number', 'Unknown House')),
+        ('Start date', 'start_date'),
+        ('End date', 'end_date'),
+        ('Monthly rent', 'monthly_rent'),
+        ('Deposit paid', 'deposit_paid'),
+        ('Created at', 'created_at'),
+    ]
+
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(Contract.objects.all())
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    export_name = 'payments'
+    export_columns = [
+        ('ID', 'id'),
+        ('Tenant', TENANT_NAME),
+        ('House', TENANT_HOUSE),
+        ('Amount', 'amount'),
+        ('Payment date', 'payment_date'),
+        ('Method', 'payment_method'),
+        ('Type', 'payment_type'),
+        ('Reference', 'reference_number'),
+        ('Month for', 'month_for'),
+        ('Verified', 'is_verified'),
+        ('Created at', 'created_at'),
+    ]
+    VERIFY_BATCH_LIMIT = 5000
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Payment.objects.all()
         if getattr(user, 'role', None) == 'tenant':
             # Tenants only see their own payments
-            return Payment.objects.filter(tenant__user=user)
-        return Payment.objects.all()
+            queryset = queryset.filter(tenant__user=user)
+        return self.get_serializer_class().setup_eager_loading(queryset)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -112,50 +176,128 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
             
         payment = self.get_object()
-        
-        if payment.is_verified:
-             return Response({'status': 'warning', 'message': 'Payment was already verified'})
-
-        payment.is_verified = True
-        payment.save()
-
-        # --- LOGIC TO LINK PAYMENT TO BILL ---
-        # If this payment is for a specific bill type (e.g. Water), mark that bill as paid.
-        if payment.payment_type in ['water', 'electricity', 'garbage', 'damage', 'other']:
-            # Find unpaid bills for this tenant, same type, matching month/year
-            matching_bills = Bill.objects.filter(
-                tenant=payment.tenant,
-                bill_type=payment.payment_type,
-                is_paid=False,
-                month_for__year=payment.month_for.year,
-                month_for__month=payment.month_for.month
-            )
-
-            # Check if payment covers the bill
-            bills_cleared = 0
-            remaining_amount = payment.amount
-
-            for bill in matching_bills:
-                if remaining_amount >= bill.amount:
-                    bill.is_paid = True
-                    bill.save()
-                    remaining_amount -= bill.amount
-                    bills_cleared += 1
-            
-            if bills_cleared > 0:
-                return Response({'status': 'verified', 'message': f'Payment verified. {bills_cleared} Bill(s) marked as Paid.'})
+
+        with transaction.atomic():
+            # Lock the row so two admins verifying at once cannot both clear its bills
+            payment = Payment.objects.select_for_update().get(pk=payment.pk)
+            if payment.is_verified:
+                 return Response({'status': 'warning', 'message': 'Payment was already verified'})
+
+            bills_cleared = len(self._verify_payments([payment])[payment.pk])
+
+        if bills_cleared > 0:
+            return Response({'status': 'verified', 'message': f'Payment verified. {bills_cleared} Bill(s) marked as Paid.'})
 
         return Response({'status': 'verified', 'message': 'Payment verified successfully'})
 
+    @action(detail=False, methods=['post'])
+    def verify_batch(self, request):
+        """
+        Admin action to verify many payments in one transaction.
+        Body: {"payment_ids": [...]}. Returns a per-payment summary.
+        """
+        if getattr(request.user, 'role', None) != 'estate_admin':
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        payment_ids = request.data.get('payment_ids')
+        if not isinstance(payment_ids, list) or not payment_ids:
+            return Response({'error': 'payment_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(payment_ids) > self.VERIFY_BATCH_LIMIT:
+            return Response({'error': f'At most {self.VERIFY_BATCH_LIMIT} payments per batch'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            payment_ids = [int(pk) for pk in payment_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'payment_ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Locked in pk order so overlapping batches queue instead of deadlocking
+            payments = list(Payment.objects.select_for_update().filter(pk__in=payment_ids).order_by('pk'))
+            pending = [payment for payment in payments if not payment.is_verified]
+            cleared = self._verify_payments(pending)
+
+        found = {payment.pk: payment for payment in payments}
+        results = []
+        for pk in dict.fromkeys(payment_ids):
+            if pk not in found:
+                results.append({'id': pk, 'status': 'not_found'})
+            elif pk in cleared:
+                results.append({'id': pk, 'status': 'verified', 'bills_cleared': len(cleared[pk])})
+            else:
+                results.append({'id': pk, 'status': 'already_verified'})
+
+        return Response({
+            'verified': len(cleared),
+            'bills_cleared': sum(len(ids) for ids in cleared.values()),
+            'results': results,
+        })
+
+    @staticmethod
+    def _verify_payments(payments):
+        """
+        Marks locked payments verified with one UPDATE and settles their bills
+        set-based. Returns {payment.pk: [cleared bill ids]} for every payment.
+        """
+        if not payments:
+            return {}
+
+        Payment.objects.filter(pk__in=[payment.pk for payment in payments]).update(is_verified=True)
+        for payment in payments:
+            payment.is_verified = True
+
+        cleared = {payment.pk: [] for payment in payments}
+        cleared.update(reconcile_bills(payments))
+
+        # queryset.update() skips model signals, so refresh derived data explicitly
+        TenantMonthlyLedger.refresh_many((payment.tenant_id, payment.month_for) for payment in payments)
+        invalidate_reports('estates.Payment', 'estates.Bill')
+        return cleared
+
+    @action(detail=False, methods=['post'])
+    def import_statement(self, request):
+        """
+        Admin upload of a CSV bank/M-Pesa statement (multipart field `file`).
+        Returns import counts and a per-row error report, with status 400 when
+        the file is not UTF-8 text or not valid CSV.
+        """
+        if getattr(request.user, 'role', None) != 'estate_admin':
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'A statement file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = PaymentImporter(
+            payment_method=request.data.get('payment_method', 'mpesa'),
+            payment_type=request.data.get('payment_type', 'rent'),
+        )
+        summary = importer.run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+        if importer.unreadable:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
 
-class BillViewSet(viewsets.ModelViewSet):
+class BillViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    export_name = 'bills'
+    export_columns = [
+        ('ID', 'id'),
+        ('Tenant', TENANT_NAME),
+        ('House', TENANT_HOUSE),
+        ('Bill type', 'bill_type'),
+        ('Amount', 'amount'),
+        ('Month for', 'month_for'),
+        ('Description', 'description'),
+        ('Paid', 'is_paid'),
+        ('Created at', 'created_at'),
+    ]
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Bill.objects.all()
         if getattr(user, 'role', None) == 'tenant':
             # Tenant sees only their bills
-            return Bill.objects.filter(tenant__user=user)
-        return Bill.objects.all()
\ No newline at end of file
+            queryset = queryset.filter(tenant__user=user)
+        return self.get_serializer_class().setup_eager_loading(queryset)
\ No newline at end of file
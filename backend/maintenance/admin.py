@@ -1,4 +1,5 @@
 from django.contrib import admin
+from search.admin import VectorSearchMixin
 from .models import MaintenanceRequest, MaintenanceImage
 
 class MaintenanceImageInline(admin.TabularInline):
@@ -6,7 +7,7 @@ class MaintenanceImageInline(admin.TabularInline):
     extra = 1
 
 @admin.register(MaintenanceRequest)
-class MaintenanceRequestAdmin(admin.ModelAdmin):
+class MaintenanceRequestAdmin(VectorSearchMixin, admin.ModelAdmin):
     list_display = ['request_id', 'house', 'category', 'priority', 'status', 'created_at']
     list_filter = ['status', 'priority', 'category']
     search_fields = ['request_id', 'house__house_number', 'issue_description']
@@ -0,0 +1,42 @@
+from concurrent.futures import Future, wait
+from django.core.management.base import BaseCommand
+from seams_project.media import DERIVATIVE_FIELDS, generate_derivatives, missing_derivatives, shutdown_pool
+
+
+class Command(BaseCommand):
+    help = 'Creates thumbnails and web-sized copies of maintenance photos and profile pictures that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Images read and queued at a time')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the images without derivatives')
+
+    def handle(self, *args, **options):
+        for label, _, _ in DERIVATIVE_FIELDS:
+            pending = missing_derivatives(label).order_by('pk')
+            if options['dry_run']:
+                self.stdout.write(f'{label}: {pending.count()}')
+                continue
+
+            queued, last_pk = 0, None
+            while True:
+                batch = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+                batch = list(batch[:options['batch_size']])
+                if not batch:
+                    break
+                jobs = []
+                for instance in batch:
+                    try:
+                        jobs.append(generate_derivatives(instance))
+                    except OSError as e:
+                        self.stderr.write(f'{label} {instance.pk}: {e}')
+                # One batch in flight at a time keeps the queued image bytes bounded
+                wait([job for job in jobs if isinstance(job, Future)])
+                queued += len(jobs)
+                last_pk = batch[-1].pk
+
+            shutdown_pool()
+            left = missing_derivatives(label).count()
+            self.stdout.write(f'{label}: {queued} processed, {left} still without derivatives')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0010_keyset_indexes'),
+        ('maintenance', '0006_maintenancerequest_archived_house_number_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenancerequest',
+            index=models.Index(fields=['-created_at', '-id'], name='maintenance_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancerequest',
+            index=models.Index(fields=['reported_by', 'status', '-created_at', '-id'], name='maintenance_reporter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancerequest',
+            index=models.Index(fields=['assigned_to', '-created_at', '-id'], name='maintenance_assignee_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:30
+
+from django.db import migrations, models
+
+
+def seed_request_counter(apps, schema_editor):
+    """
+    Start the counter after the highest existing MR-xxx number.
+    """
+    MaintenanceRequest = apps.get_model('maintenance', 'MaintenanceRequest')
+    IdCounter = apps.get_model('maintenance', 'IdCounter')
+
+    highest = 0
+    for request_id in MaintenanceRequest.objects.values_list('request_id', flat=True).iterator():
+        try:
+            highest = max(highest, int(request_id.split('-')[1]))
+        except (IndexError, ValueError):
+            continue
+    IdCounter.objects.update_or_create(name='maintenance_request', defaults={'value': highest})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'id_counters',
+            },
+        ),
+        migrations.RunPython(seed_request_counter, migrations.RunPython.noop),
+    ]
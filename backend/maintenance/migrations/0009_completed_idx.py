@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0012_period_keys'),
+        ('maintenance', '0008_idcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenancerequest',
+            index=models.Index(fields=['status', 'completed_at'], name='maintenance_completed_idx'),
+        ),
+    ]
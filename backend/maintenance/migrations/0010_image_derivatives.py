@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0009_completed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenanceimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
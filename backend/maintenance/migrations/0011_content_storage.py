@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:52
+
+import uploads.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0010_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenanceimage',
+            name='image',
+            field=models.ImageField(storage=uploads.storage.ContentAddressedStorage(), upload_to='maintenance/'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:59
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estates', '0014_search_vector'),
+        ('maintenance', '0011_content_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenancerequest',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector(models.Func(models.F('request_id'), models.Value('[^[:alnum:]]+'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE', output_field=models.CharField()), config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(models.F('archived_house_number'), config='simple', weight='A'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(models.Func(models.F('archived_house_number'), models.Value('[^[:alnum:]]+'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE', output_field=models.CharField()), config='simple', weight='A'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(models.F('issue_description'), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(models.F('notes'), config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancerequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='maintenance_search_idx'),
+        ),
+    ]
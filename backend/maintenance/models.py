@@ -1,6 +1,50 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.conf import settings
 from estates.models import House
+from estates.snapshots import fill_snapshots
+from uploads.storage import content_storage
+from search.vectors import compact, document
+
+
+class IdCounter(models.Model):
+    """
+    Named counter row used to hand out human-readable IDs (MR-001, ...).
+    Allocation locks the row (SELECT ... FOR UPDATE), so concurrent inserts
+    never see the same value and no table scan is needed.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'id_counters'
+
+    @classmethod
+    def allocate(cls, name, count=1):
+        """
+        Reserves `count` consecutive values and returns them as a range.
+        """
+        with transaction.atomic():
+            counter, _ = cls.objects.select_for_update().get_or_create(name=name)
+            start = counter.value + 1
+            counter.value += count
+            counter.save(update_fields=['value'])
+        return range(start, start + count)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class MaintenanceRequestManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() is skipped by bulk_create, so reserve one block of IDs up front
+        objs = list(objs)
+        missing = [obj for obj in objs if not obj.request_id]
+        for obj, number in zip(missing, IdCounter.allocate(MaintenanceRequest.REQUEST_ID_COUNTER, len(missing))):
+            obj.request_id = MaintenanceRequest.format_request_id(number)
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class MaintenanceRequest(models.Model):
     PRIORITY_CHOICES = [
@@ -27,6 +71,8 @@ class MaintenanceRequest(models.Model):
         ('general', 'General'),
     ]
     
+    REQUEST_ID_COUNTER = 'maintenance_request'
+
     request_id = models.CharField(max_length=20, unique=True, editable=False)
     
     # FIXED: Protect history if House is deleted
@@ -50,34 +96,41 @@ class MaintenanceRequest(models.Model):
     notes = models.TextField(blank=True)
     estimated_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     actual_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Full-text document for /api/search/, kept current by Postgres
+    search_vector = models.GeneratedField(
+        expression=document((compact('request_id'), 'A'), ('archived_house_number', 'A'),
+                            (compact('archived_house_number'), 'A'), ('issue_description', 'B'), ('notes', 'C')),
+        output_field=SearchVectorField(), db_persist=True,
+    )
+
+    objects = MaintenanceRequestManager()
     
     class Meta:
         db_table = 'maintenance_requests'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='maintenance_keyset_idx'),
+            models.Index(fields=['reported_by', 'status', '-created_at', '-id'], name='maintenance_reporter_idx'),
+            models.Index(fields=['assigned_to', '-created_at', '-id'], name='maintenance_assignee_idx'),
+            models.Index(fields=['status', 'completed_at'], name='maintenance_completed_idx'),
+            GinIndex(fields=['search_vector'], name='maintenance_search_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if self.status:
             self.status = self.status.lower().strip()
 
-        if self.reported_by and not self.archived_reported_by:
-            self.archived_reported_by = self.reported_by.get_full_name()
-            
-        # Snapshot House
-        if self.house:
-            self.archived_house_number = self.house.house_number
+        fill_snapshots(self)
 
         if not self.request_id:
-            last_request = MaintenanceRequest.objects.all().order_by('id').last()
-            if last_request:
-                try:
-                    last_id = int(last_request.request_id.split('-')[1])
-                    self.request_id = f'MR-{str(last_id + 1).zfill(3)}'
-                except (IndexError, ValueError):
-                    self.request_id = f'MR-{str(last_request.id + 1).zfill(3)}'
-            else:
-                self.request_id = 'MR-001'
+            number = IdCounter.allocate(self.REQUEST_ID_COUNTER)[0]
+            self.request_id = self.format_request_id(number)
                 
         super().save(*args, **kwargs)
+
+    @staticmethod
+    def format_request_id(number):
+        return f'MR-{str(number).zfill(3)}'
     
     def __str__(self):
         h_num = self.house.house_number if self.house else self.archived_house_number
@@ -86,7 +139,10 @@ class MaintenanceRequest(models.Model):
 
 class MaintenanceImage(models.Model):
     maintenance_request = models.ForeignKey(MaintenanceRequest, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='maintenance/')
+    # Stored once per content; see uploads.refs for when the file is deleted
+    image = models.ImageField(upload_to='maintenance/', storage=content_storage)
+    # {'thumbnail': name, 'web': name}, filled in after upload (seams_project/media.py)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
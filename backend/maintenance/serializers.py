@@ -1,11 +1,27 @@
 from rest_framework import serializers
 from .models import MaintenanceRequest, MaintenanceImage
 from users.serializers import UserSerializer
+from seams_project.media import DerivativeField
+from uploads.serializers import AttachUploadsMixin, UploadField
+
+class MaintenanceImageSerializer(AttachUploadsMixin, serializers.ModelSerializer):
+    # Lists should load these; `image` stays the full-size original
+    thumbnail = DerivativeField('image', 'thumbnail')
+    web = DerivativeField('image', 'web')
+    # A finished resumable upload, instead of sending `image` in the request
+    upload = UploadField(image=True)
+    upload_fields = {'upload': 'image'}
 
-class MaintenanceImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = MaintenanceImage
-        fields = '__all__'
+        exclude = ['derivatives']
+        extra_kwargs = {'image': {'required': False}}
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if self.instance is None and not attrs.get('image'):
+            raise serializers.ValidationError({'image': 'Send an image or an upload id'})
+        return attrs
 
 class MaintenanceRequestSerializer(serializers.ModelSerializer):
     reported_by_name = serializers.SerializerMethodField()
@@ -15,9 +31,14 @@ class MaintenanceRequestSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = MaintenanceRequest
-        fields = '__all__'
+        exclude = ['search_vector']
         read_only_fields = ['request_id', 'created_at', 'archived_reported_by', 'archived_house_number']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Names, house number and images rendered per row, loaded up front
+        return queryset.select_related('reported_by', 'assigned_to', 'house').prefetch_related('images')
+
     def get_reported_by_name(self, obj):
         if obj.reported_by:
             return obj.reported_by.get_full_name()
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from estates.models import House
+from seams_project.media import media_view, shutdown_pool
+from users.serializers import UserSerializer
+from .models import MaintenanceRequest, MaintenanceImage, IdCounter
 
-# Create your tests here.
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MaintenanceListQueryCountTests(APITestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.technician = User.objects.create_user(username='tech', role='technician', first_name='Tech')
+        self.client.force_authenticate(self.admin)
+        self.created = 0
+
+    def add_requests(self, count):
+        for _ in range(count):
+            self.created += 1
+            tenant = User.objects.create_user(username=f'tenant{self.created}', role='tenant')
+            house = House.objects.create(house_number=f'M{self.created}', house_type='bedsitter', rent_amount=5000)
+            request = MaintenanceRequest.objects.create(
+                house=house, reported_by=tenant, assigned_to=self.technician, issue_description='Leaking tap'
+            )
+            MaintenanceImage.objects.create(
+                maintenance_request=request,
+                image=SimpleUploadedFile('tap.jpg', b'fake', content_type='image/jpeg')
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), len(response.data)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_requests(2)
+        small, rows = self.count_queries('/api/maintenance/')
+        self.assertEqual(rows, 2)
+
+        self.add_requests(10)
+        large, rows = self.count_queries('/api/maintenance/')
+        self.assertEqual(rows, 12)
+
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)
+
+
+class MaintenanceStatsTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', role='estate_admin'))
+        technician = User.objects.create_user(username='tech', role='technician')
+        for status, category in [('new', 'plumbing'), ('cancelled', 'plumbing'), ('completed', 'electrical')]:
+            MaintenanceRequest.objects.create(
+                issue_description='Issue', status=status, category=category, assigned_to=technician
+            )
+
+    def test_every_status_counted_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/maintenance/stats/')
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['new'], 1)
+        self.assertEqual(response.data['cancelled'], 1)
+        self.assertEqual(response.data['pending'], 0)
+
+    def test_group_by_category_and_technician(self):
+        response = self.client.get('/api/maintenance/stats/', {'group_by': 'category'})
+        groups = {row['category']: row for row in response.data['groups']}
+        self.assertEqual(groups['plumbing']['total'], 2)
+        self.assertEqual(groups['electrical']['completed'], 1)
+
+        response = self.client.get('/api/maintenance/stats/', {'group_by': 'technician'})
+        self.assertEqual(response.data['groups'][0]['total'], 3)
+
+
+class RequestIdAllocationTests(TransactionTestCase):
+
+    def test_sequential_ids_without_scanning(self):
+        first = MaintenanceRequest.objects.create(issue_description='One')
+        with CaptureQueriesContext(connection) as queries:
+            second = MaintenanceRequest.objects.create(issue_description='Two')
+
+        self.assertEqual((first.request_id, second.request_id), ('MR-001', 'MR-002'))
+        self.assertFalse(any('FROM "maintenance_requests"' in q['sql'] for q in queries))
+
+    def test_bulk_create_reserves_a_block(self):
+        MaintenanceRequest.objects.create(issue_description='Before')
+        created = MaintenanceRequest.objects.bulk_create(
+            [MaintenanceRequest(issue_description=f'Bulk {i}') for i in range(5)]
+        )
+
+        self.assertEqual([r.request_id for r in created], ['MR-002', 'MR-003', 'MR-004', 'MR-005', 'MR-006'])
+        self.assertEqual(IdCounter.objects.get(name=MaintenanceRequest.REQUEST_ID_COUNTER).value, 6)
+
+    def test_concurrent_inserts_get_unique_ids(self):
+        errors = []
+
+        def submit(worker):
+            try:
+                for i in range(10):
+                    MaintenanceRequest.objects.create(issue_description=f'Worker {worker} #{i}')
+                MaintenanceRequest.objects.bulk_create(
+                    [MaintenanceRequest(issue_description=f'Worker {worker} bulk') for _ in range(5)]
+                )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=submit, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        ids = sorted(int(r.split('-')[1]) for r in MaintenanceRequest.objects.values_list('request_id', flat=True))
+        self.assertEqual(ids, list(range(1, 121)))
+
+
+def make_photo(size=(2000, 1500), name='leak.png'):
+    output = BytesIO()
+    Image.new('RGB', size, 'steelblue').save(output, 'PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_WORKERS=0)
+class ImageDerivativeTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.tenant = User.objects.create_user(username='tenant', role='tenant')
+        self.client.force_authenticate(self.admin)
+        house = House.objects.create(house_number='D1', house_type='bedsitter', rent_amount=5000)
+        self.request = MaintenanceRequest.objects.create(
+            house=house, reported_by=self.tenant, issue_description='Damp wall'
+        )
+        self.other = MaintenanceRequest.objects.create(house=house, issue_description='Broken gate')
+
+    def upload(self, request):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/maintenance-images/', {'maintenance_request': request.pk, 'image': make_photo()},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, 201)
+        return MaintenanceImage.objects.get(pk=response.data['id'])
+
+    def test_upload_creates_resized_copies(self):
+        image = self.upload(self.request)
+
+        self.assertEqual(set(image.derivatives), {'thumbnail', 'web'})
+        with Image.open(image.image.storage.path(image.derivatives['thumbnail'])) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 240))
+            self.assertEqual(thumbnail.format, 'JPEG')
+
+        response = self.client.get(f'/api/maintenance/{self.request.pk}/')
+        photo = response.data['images'][0]
+        self.assertTrue(photo['thumbnail'].endswith(image.derivatives['thumbnail']))
+        self.assertTrue(photo['web'].endswith(image.derivatives['web']))
+        self.assertTrue(photo['image'].endswith(image.image.name))
+        self.assertNotIn('derivatives', photo)
+
+    def test_unreadable_upload_falls_back_to_original(self):
+        with self.assertLogs('seams_project.media', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            image = MaintenanceImage.objects.create(
+                maintenance_request=self.request,
+                image=SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+            )
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, {})
+
+        photo = self.client.get(f'/api/maintenance-images/{image.pk}/').data
+        self.assertEqual(photo['thumbnail'], photo['image'])
+
+    def test_replacing_profile_picture_replaces_derivatives(self):
+        self.client.force_authenticate(self.tenant)
+        for name in ('first.png', 'second.png'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    '/api/users/update_profile/', {'profile_picture': make_photo((600, 600), name)}, format='multipart'
+                )
+            self.assertEqual(response.status_code, 200)
+
+        # The response is rendered before the upload commits, so it still shows the original
+        self.assertEqual(response.data['user']['profile_picture_thumbnail'], response.data['user']['profile_picture'])
+        self.tenant.refresh_from_db()
+        self.assertIn('second', self.tenant.profile_picture_derivatives['thumbnail'])
+        self.assertTrue(UserSerializer(self.tenant).data['profile_picture_thumbnail'].endswith('_thumbnail.jpg'))
+
+    def test_old_derivatives_are_deleted(self):
+        storage = MaintenanceImage._meta.get_field('image').storage
+        self.client.force_authenticate(self.tenant)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/users/update_profile/', {'profile_picture': make_photo((600, 600), 'first.png')},
+                              format='multipart')
+        self.tenant.refresh_from_db()
+        first = list(self.tenant.profile_picture_derivatives.values())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/users/update_profile/', {'profile_picture': make_photo((600, 600), 'second.png')},
+                              format='multipart')
+        self.tenant.refresh_from_db()
+        self.assertFalse(any(storage.exists(name) for name in first))
+        self.assertTrue(all(storage.exists(name) for name in self.tenant.profile_picture_derivatives.values()))
+
+        # Two rows with the same photo share the original but not derivatives
+        self.client.force_authenticate(self.admin)
+        images = [self.upload(self.request), self.upload(self.other)]
+        self.assertEqual(images[0].image.name, images[1].image.name)
+        self.assertNotEqual(images[0].derivatives, images[1].derivatives)
+        with self.captureOnCommitCallbacks(execute=True):
+            images[0].delete()
+        self.assertFalse(any(storage.exists(name) for name in images[0].derivatives.values()))
+        self.assertTrue(all(storage.exists(name) for name in images[1].derivatives.values()))
+
+    def test_images_filter_by_request_and_role(self):
+        mine = self.upload(self.request)
+        theirs = self.upload(self.other)
+
+        listed = self.client.get('/api/maintenance-images/', {'maintenance_request': self.other.pk}).data
+        self.assertEqual([image['id'] for image in listed], [theirs.pk])
+        self.assertEqual(self.client.get('/api/maintenance-images/', {'maintenance_request': 'x'}).status_code, 400)
+
+        self.client.force_authenticate(self.tenant)
+        listed = self.client.get('/api/maintenance-images/').data
+        self.assertEqual([image['id'] for image in listed], [mine.pk])
+
+    def test_media_responses_are_cacheable(self):
+        image = self.upload(self.request)
+        response = media_view(RequestFactory().get('/media/'), image.derivatives['thumbnail'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_backfill_command(self):
+        image = self.upload(self.request)
+        MaintenanceImage.objects.filter(pk=image.pk).update(derivatives={})
+
+        out = StringIO()
+        call_command('generate_derivatives', stdout=out)
+        image.refresh_from_db()
+        self.assertEqual(set(image.derivatives), {'thumbnail', 'web'})
+        self.assertIn('maintenance.MaintenanceImage: 1 processed, 0 still without derivatives', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_WORKERS=1)
+class ImageWorkerPoolTests(TransactionTestCase):
+
+    def tearDown(self):
+        shutdown_pool()
+
+    def test_worker_process_renders_and_saves(self):
+        house = House.objects.create(house_number='D2', house_type='bedsitter', rent_amount=5000)
+        request = MaintenanceRequest.objects.create(house=house, issue_description='Cracked tiles')
+        # TransactionTestCase commits, so the upload is queued to the pool on save
+        image = MaintenanceImage.objects.create(maintenance_request=request, image=make_photo())
+
+        shutdown_pool()
+        image.refresh_from_db()
+        self.assertEqual(set(image.derivatives), {'thumbnail', 'web'})
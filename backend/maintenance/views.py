@@ -1,32 +1,58 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Case, Q, Value, When
 from .models import MaintenanceRequest, MaintenanceImage
 from .serializers import MaintenanceRequestSerializer, MaintenanceImageSerializer
 from users.models import Notification
+from seams_project.aggregates import status_breakdown
+from seams_project.exports import ExportMixin, full_name, live_or_archived
+from seams_project.pagination import KeysetPagination
 
 User = get_user_model()
 
-class MaintenanceRequestViewSet(viewsets.ModelViewSet):
+class MaintenanceRequestViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing maintenance requests.
     """
     serializer_class = MaintenanceRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    STATS_GROUPS = {'category': 'category', 'technician': 'assigned_to'}
+    export_name = 'maintenance'
+    export_columns = [
+        ('Request ID', 'request_id'),
+        ('House', live_or_archived('house', 'house__house_number', 'archived_house_number', 'Unknown House')),
+        ('Reported by', live_or_archived('reported_by', full_name('reported_by'), 'archived_reported_by', 'Unknown User')),
+        ('Assigned to', Case(When(assigned_to__isnull=True, then=Value('Unassigned')), default=full_name('assigned_to'))),
+        ('Category', 'category'),
+        ('Priority', 'priority'),
+        ('Status', 'status'),
+        ('Issue', 'issue_description'),
+        ('Created at', 'created_at'),
+        ('Assigned at', 'assigned_at'),
+        ('Completed at', 'completed_at'),
+        ('Estimated cost', 'estimated_cost'),
+        ('Actual cost', 'actual_cost'),
+        ('Notes', 'notes'),
+    ]
 
     def get_queryset(self):
         """
-        Returns maintenance requests based on user role.
+        Returns maintenance requests based on user role, with the relations
+        the serializer renders loaded up front.
         """
+        return self.get_serializer_class().setup_eager_loading(self._role_queryset())
+
+    def _role_queryset(self):
         user = self.request.user
         
         # Security: Unauthenticated users see nothing
         if not user.is_authenticated:
-            print("❌ User not authenticated")
             return MaintenanceRequest.objects.none()
 
         # Define active statuses (what tenants should see)
@@ -34,31 +60,10 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
 
         # 1. TENANTS: Return their active requests (NOT completed/cancelled)
         if getattr(user, 'role', None) == 'tenant':
-            print(f"\n{'='*60}")
-            print(f"🔍 TENANT QUERY DEBUG")
-            print(f"{'='*60}")
-            print(f"User ID: {user.id}")
-            print(f"User Email: {user.email}")
-            print(f"Looking for statuses: {ACTIVE_STATUSES}")
-            
-            # Get ALL requests for this tenant (ignore status)
-            all_user_requests = MaintenanceRequest.objects.filter(reported_by=user)
-            print(f"\n📋 ALL REQUESTS FOR THIS USER ({all_user_requests.count()} total):")
-            for req in all_user_requests:
-                print(f"  - {req.request_id}: status='{req.status}' | in filter? {req.status in ACTIVE_STATUSES}")
-            
-            # Now apply the filter
-            queryset = MaintenanceRequest.objects.filter(
+            return MaintenanceRequest.objects.filter(
                 reported_by=user,
-                status__in=ACTIVE_STATUSES  # ✅ KEY FIX: Show all active statuses
+                status__in=ACTIVE_STATUSES
             ).order_by('-created_at')
-            
-            print(f"\n✅ FILTERED RESULTS: {queryset.count()} requests")
-            for req in queryset:
-                print(f"  - {req.request_id}: {req.status}")
-            print(f"{'='*60}\n")
-            
-            return queryset
 
         # 2. TECHNICIANS: Return requests assigned to them (all statuses)
         if getattr(user, 'role', None) == 'technician':
@@ -91,6 +96,7 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
         else:
             requests = MaintenanceRequest.objects.none()
         
+        requests = self.get_serializer_class().setup_eager_loading(requests)
         serializer = self.get_serializer(requests, many=True)
         return Response(serializer.data)
     
@@ -112,6 +118,7 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
         else:
             requests = MaintenanceRequest.objects.none()
         
+        requests = self.get_serializer_class().setup_eager_loading(requests)
         serializer = self.get_serializer(requests, many=True)
         return Response(serializer.data)
     
@@ -228,27 +235,49 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
-        Return counts of requests by status for the dashboard.
+        Return counts of requests by status for the dashboard, from one query.
+        Optional ?group_by=category|technician adds a per-group breakdown.
         """
+        group_by = request.query_params.get('group_by')
+        if group_by and group_by not in self.STATS_GROUPS:
+            return Response({'error': f'group_by must be one of {list(self.STATS_GROUPS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
         # Global stats (default)
-        total = MaintenanceRequest.objects.count()
-        pending = MaintenanceRequest.objects.filter(status='pending').count()
-        assigned = MaintenanceRequest.objects.filter(status='assigned').count()
-        in_progress = MaintenanceRequest.objects.filter(status='in_progress').count()
-        completed = MaintenanceRequest.objects.filter(status='completed').count()
-        
-        return Response({
-            'total': total,
-            'pending': pending,
-            'assigned': assigned,
-            'in_progress': in_progress,
-            'completed': completed
-        })
+        data = status_breakdown(MaintenanceRequest.objects.all(), MaintenanceRequest.STATUS_CHOICES)
+        if group_by:
+            data['groups'] = status_breakdown(
+                MaintenanceRequest.objects.all(),
+                MaintenanceRequest.STATUS_CHOICES,
+                group_by=self.STATS_GROUPS[group_by]
+            )
+        return Response(data)
 
 
 class MaintenanceImageViewSet(viewsets.ModelViewSet):
     """
     ViewSet for handling image uploads associated with maintenance requests.
+    Filter with ?maintenance_request=<id>.
     """
     queryset = MaintenanceImage.objects.all()
-    serializer_class = MaintenanceImageSerializer
\ No newline at end of file
+    serializer_class = MaintenanceImageSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        """
+        Images of the requests the user is involved in: tenants see their own
+        reports, technicians their assignments, admins everything.
+        """
+        user = self.request.user
+        queryset = MaintenanceImage.objects.all()
+        if getattr(user, 'role', None) == 'tenant':
+            queryset = queryset.filter(maintenance_request__reported_by=user)
+        elif getattr(user, 'role', None) == 'technician':
+            queryset = queryset.filter(maintenance_request__assigned_to=user)
+
+        request_id = self.request.query_params.get('maintenance_request')
+        if request_id:
+            if not request_id.isdigit():
+                raise ValidationError({'maintenance_request': 'Must be a request id'})
+            queryset = queryset.filter(maintenance_request_id=request_id)
+        return queryset
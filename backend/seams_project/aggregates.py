@@ -0,0 +1,21 @@
+from django.db.models import Count, Q
+
+
+def status_breakdown(queryset, choices, field='status', group_by=None):
+    """
+    Counts rows for every value in `choices` (zeros included) plus a total,
+    in one query using conditional aggregation (COUNT(*) FILTER (WHERE ...)).
+
+    Without group_by returns a dict; with group_by returns one dict per
+    distinct value of that field, keyed by the field name.
+    """
+    counts = {'total': Count('pk')}
+    for value, _ in choices:
+        counts[value] = Count('pk', filter=Q(**{field: value}))
+
+    if group_by is None:
+        return queryset.aggregate(**counts)
+
+    return list(
+        queryset.order_by().values(group_by).annotate(**counts).order_by(group_by)
+    )
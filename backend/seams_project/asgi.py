@@ -2,6 +2,11 @@
 ASGI config for seams_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The notification stream (/api/notifications/stream/) is a long-lived async
+response and needs an ASGI server, e.g.
+``uvicorn seams_project.asgi:application`` or ``daphne seams_project.asgi:application``.
+Requests served here resolve against ASGI_URLCONF first, where the reports
+run their aggregates concurrently (estates/async_reports.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
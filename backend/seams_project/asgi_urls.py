@@ -0,0 +1,15 @@
+"""
+URLconf for requests served through ASGI (seams_project/asgi.py). The async
+report views run their aggregates concurrently and take precedence over the
+ReportsViewSet actions of the same name; everything else is urls.py.
+"""
+from django.urls import path
+from estates import async_reports
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/reports/dashboard_summary/', async_reports.dashboard_summary, name='reports-dashboard-summary'),
+    path('api/reports/monthly_trends/', async_reports.monthly_trends, name='reports-monthly-trends'),
+    path('api/reports/occupancy_stats/', async_reports.occupancy_stats, name='reports-occupancy-stats'),
+    *wsgi_urlpatterns,
+]
@@ -0,0 +1,55 @@
+"""
+DRF authentication and permissions for plain Django views.
+
+The async views served through seams_project/asgi.py are not DRF views, but
+should accept the same credentials and answer exactly as the API does: the
+configured authentication classes, the view's permission classes, and a 401
+with a WWW-Authenticate challenge or a 403 with DRF's error body.
+"""
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import exception_handler
+
+
+def check_access(request, permission_classes):
+    """
+    Authenticates `request` and checks `permission_classes` the way
+    APIView.initial() does. Returns (user, None) when access is granted and
+    (None, response) otherwise. Synchronous, since authentication may query
+    the database; wrap it with sync_to_async in async views.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+        for permission_class in permission_classes:
+            permission = permission_class()
+            if not permission.has_permission(drf_request, None):
+                if drf_request.authenticators and not drf_request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None),
+                                                  getattr(permission, 'code', None))
+    except exceptions.APIException as exc:
+        return None, _error_response(drf_request, exc)
+    return user, None
+
+
+def _error_response(drf_request, exc):
+    # As APIView.handle_exception(): challenge unauthenticated clients when
+    # the first authenticator has a scheme, otherwise answer 403
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticators = drf_request.authenticators
+        auth_header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = 403
+
+    response = exception_handler(exc, {'request': drf_request, 'view': None})
+    error = JsonResponse(response.data, status=response.status_code, encoder=JSONEncoder, safe=False)
+    for name, value in response.headers.items():
+        if name.lower() != 'content-type':
+            error[name] = value
+    return error
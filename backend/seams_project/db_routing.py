@@ -0,0 +1,191 @@
+"""
+Read-replica routing.
+
+Writes always go to 'default'. ReplicaRoutingMiddleware sends the reads of
+read-only viewset actions (GET/HEAD/OPTIONS on a DRF viewset, which includes
+every report) to one of DATABASE_REPLICAS, unless:
+
+* the caller wrote something in the last REPLICA_PIN_SECONDS (read-your-writes:
+  any unsafe request pins the user to the primary for that long; the pin is
+  kept in the cache, so workers need a shared CACHE_BACKEND), or
+* the read happens inside a transaction on the primary, where it must see the
+  transaction's own rows and locks.
+
+The caller is whoever DRF authenticated, by any of the configured schemes:
+the authentication classes below report the user through
+user_authenticated(), and only then is the replica chosen, so a pinned
+user's reads never leave the primary. The authentication's own lookups, and
+requests nobody could be authenticated for, read from the primary as well.
+
+Everything else (admin, management commands, background loops) reads from
+the primary. The chosen alias lives in a context variable, so it is scoped to
+the request in both threaded and async servers.
+"""
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from rest_framework import authentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt import authentication as jwt_authentication
+
+_read_alias = ContextVar('seams_read_alias', default=None)
+
+# SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+
+def current_read_alias():
+    alias = _read_alias.get()
+    if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def choose_replica():
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    return random.choice(replicas) if replicas else None
+
+
+@contextmanager
+def read_from(alias):
+    """
+    Routes reads made inside the block to `alias` (None means the primary).
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def _is_pinned(user_id):
+    return user_id is not None and bool(cache.get(_pin_key(user_id)))
+
+
+def user_authenticated(request, user):
+    """
+    Records the user DRF authenticated for `request` (the Django request),
+    and routes the reads of a viewset request from here on.
+    """
+    request._db_user_id = user.pk
+    if getattr(request, '_db_routable', False):
+        alias = replica_for(request)
+        if alias is not None:
+            _read_alias.set(alias)
+            request._db_routed = True
+
+
+class RoutedAuthenticationMixin:
+    # Pinning follows the authenticated user, however they signed in
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            user_authenticated(request._request, result[0])
+        return result
+
+
+class JWTAuthentication(RoutedAuthenticationMixin, jwt_authentication.JWTAuthentication):
+    pass
+
+
+class SessionAuthentication(RoutedAuthenticationMixin, authentication.SessionAuthentication):
+    pass
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._db_user_id = None
+        try:
+            response = self.get_response(request)
+        finally:
+            # Not a token reset: under ASGI, process_view runs in a copied context
+            if getattr(request, '_db_routed', False):
+                _read_alias.set(None)
+
+        if request.method not in SAFE_METHODS and request._db_user_id is not None:
+            cache.set(_pin_key(request._db_user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Router-generated viewset views carry their action map; plain views
+        # don't. The replica is chosen once the user is known.
+        request._db_routable = bool(getattr(view_func, 'actions', None))
+        return None
+
+
+def replica_for(request):
+    """
+    Replica to read from for this request, or None for the primary. Async
+    views authenticate first (check_access) and pass the result to
+    read_from() themselves.
+    """
+    if request.method not in SAFE_METHODS:
+        return None
+    if _is_pinned(getattr(request, '_db_user_id', None)):
+        return None
+    return choose_replica()
+
+
+class StatementTimeout:
+    """
+    execute_wrapper hook that caps each read at `milliseconds`. The SET LOCAL
+    travels in the same round trip as the query; Postgres runs such a
+    multi-statement string as one implicit transaction in autocommit mode, so
+    the limit ends with the statement and costs no extra query. Inside an
+    explicit transaction it lasts until that transaction ends.
+    """
+
+    def __init__(self, milliseconds):
+        self.prefix = f'SET LOCAL statement_timeout = {int(milliseconds)}; '
+
+    def __call__(self, execute, sql, params, many, context):
+        # Server-side cursors wrap the query in DECLARE, which cannot take a prefix
+        named = getattr(context['cursor'].cursor, 'name', None)
+        if not many and not named and sql.lstrip()[:6].upper() == 'SELECT':
+            sql = self.prefix + sql
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    """
+    Cancels any single read running longer than `milliseconds` inside the
+    block, whichever database it is routed to.
+    """
+    hook = StatementTimeout(milliseconds)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(hook))
+        yield
+
+
+def is_statement_timeout(exc):
+    if not isinstance(exc, OperationalError):
+        return False
+    cause = exc.__cause__
+    return (getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)) == QUERY_CANCELED
@@ -0,0 +1,198 @@
+"""
+Streaming CSV/XLSX exports for list endpoints.
+
+ExportMixin adds a `GET <list url>/export/?filetype=csv|xlsx` action to a
+viewset. The export reads the same queryset as the list view (role scoping
+included) as plain tuples through a server-side cursor, `chunk_size` rows
+per fetch, and writes the file as the rows arrive, so the process holds one
+chunk at a time whether the export has a thousand rows or millions.
+
+Text cells that a spreadsheet would read as a formula are written with a
+leading quote (see _cell()), in both formats.
+
+XLSX needs openpyxl, which is optional: its write-only workbook spools to a
+temporary file that is then streamed back.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Case, CharField, Q, Value, When
+from django.db.models.functions import Concat, Trim
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - optional dependency
+    Workbook = None
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Bytes of CSV gathered before a chunk is handed to the server
+FLUSH_BYTES = 64 * 1024
+
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def full_name(path):
+    # Same result as User.get_full_name()
+    return Trim(Concat(f'{path}__first_name', Value(' '), f'{path}__last_name', output_field=CharField()))
+
+
+def live_or_archived(path, live, archived, missing):
+    """
+    The display rule of the serializers' get_tenant_name/get_house_number
+    methods as SQL: the live value while `path` exists, else the archived
+    snapshot marked "(Deleted)", else `missing`.
+    """
+    return Case(
+        When(**{f'{path}__isnull': False}, then=live),
+        When(~Q(**{archived: ''}), then=Concat(archived, Value(' (Deleted)'))),
+        default=Value(missing),
+        output_field=CharField(),
+    )
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # User-entered text such as a name or a note must not run as a
+        # formula when the file is opened in Excel or LibreOffice; the quote
+        # makes both read the cell as text. openpyxl likewise writes any
+        # string starting with '=' as a formula.
+        return f"'{value}"
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        # Local wall time, as shown in the app; XLSX cannot hold an offset
+        return timezone.make_naive(value)
+    return value
+
+
+def iter_rows(queryset, chunk_size):
+    """
+    Yields the queryset's rows from a server-side cursor. The cursor is
+    declared inside a transaction on the queryset's database so it streams;
+    outside one, Postgres would materialize the whole result at commit
+    (Django declares it WITH HOLD in autocommit mode).
+    """
+    with transaction.atomic(using=queryset.db):
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield [_cell(value) for value in row]
+
+
+def csv_chunks(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    try:
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        # A client that disconnects mid-download closes the response; end
+        # the cursor's transaction here rather than whenever it is collected
+        rows.close()
+
+
+async def _aiter(chunks, batch=16):
+    """
+    Async view of a sync iterator. Under ASGI, Django would otherwise read a
+    sync iterator to the end before sending anything. Each batch runs on the
+    request's thread, which owns the cursor's connection.
+    """
+    pull = sync_to_async(lambda: list(islice(chunks, batch)))
+    try:
+        while True:
+            items = await pull()
+            if not items:
+                break
+            for item in items:
+                yield item
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def write_xlsx(headers, rows, title):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    spool = tempfile.TemporaryFile()
+    workbook.save(spool)
+    spool.seek(0)
+    return spool
+
+
+class ExportMixin:
+    """
+    Viewset mixin. Subclasses set `export_columns` to (header, value) pairs,
+    where value is a field lookup ('tenant__house__house_number') or a query
+    expression, and `export_name` to the file's base name.
+    """
+    export_columns = ()
+    export_name = 'export'
+    export_chunk_size = 2000
+    export_filetypes = ('csv', 'xlsx')
+
+    def get_export_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Rows are read as tuples, so eager loading has nothing to attach to
+        queryset = queryset.select_related(None).prefetch_related(None)
+
+        names, expressions = [], {}
+        for index, (header, value) in enumerate(self.export_columns):
+            if isinstance(value, str):
+                names.append(value)
+            else:
+                names.append(f'export_{index}')
+                expressions[names[-1]] = value
+        queryset = queryset.annotate(**expressions).values_list(*names)
+        # Fix the database now: the rows are read after the view returns,
+        # when the request's read routing no longer applies
+        return queryset.using(queryset.db)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams the list as a file. Query: filetype=csv (default) or xlsx.
+        """
+        filetype = request.query_params.get('filetype', 'csv')
+        if filetype not in self.export_filetypes:
+            return Response(
+                {'error': f"filetype must be one of: {', '.join(self.export_filetypes)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if filetype == 'xlsx' and Workbook is None:
+            return Response({'error': 'XLSX export needs openpyxl installed'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        headers = [header for header, value in self.export_columns]
+        rows = iter_rows(self.get_export_queryset(), self.export_chunk_size)
+        filename = f'{self.export_name}-{timezone.localdate():%Y%m%d}.{filetype}'
+
+        if filetype == 'xlsx':
+            return FileResponse(
+                write_xlsx(headers, rows, self.export_name),
+                as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE,
+            )
+
+        chunks = csv_chunks(headers, rows)
+        if isinstance(request._request, ASGIRequest):
+            chunks = _aiter(chunks)
+        response = StreamingHttpResponse(chunks, content_type=CSV_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,23 @@
+"""
+Image resizing for the derivative worker processes (see media.py). Kept
+free of Django imports so a spawned worker only loads Pillow.
+"""
+from io import BytesIO
+from PIL import Image, ImageOps
+
+
+def render_derivatives(data, sizes, quality):
+    """
+    Returns {variant: JPEG bytes} with the image fitted into each
+    (width, height) box of `sizes`, EXIF rotation applied.
+    """
+    rendered = {}
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for variant, size in sizes.items():
+            copy = image.copy()
+            copy.thumbnail(size, Image.Resampling.LANCZOS)
+            output = BytesIO()
+            copy.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+            rendered[variant] = output.getvalue()
+    return rendered
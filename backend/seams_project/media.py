@@ -0,0 +1,260 @@
+"""
+Resized copies ("derivatives") of uploaded photos, and media serving.
+
+Phones upload photos of several megabytes, while lists only need a
+thumbnail. After an upload commits, the image is decoded, resized and
+re-encoded as JPEG in a process pool (IMAGE_WORKERS processes; the work is
+CPU-bound, so threads would hold the GIL). The worker runs imaging.py, which
+gets bytes and returns bytes without touching Django, the database or the
+storage, so workers are spawned fresh rather than forked. The parent
+process saves the files and records their names in the model's derivatives
+JSON field. Until that is done, and for files Pillow cannot read,
+DerivativeField falls back to the original's URL.
+
+Derivatives belong to one row, even when rows share a content-addressed
+original, so their names carry the row's pk (derivative_name()). A row can
+therefore always name its own files: when its image is replaced or the row
+is deleted, they are removed once the transaction commits, without reading
+back names that a concurrent save may have overwritten.
+
+The manage.py generate_derivatives command backfills images uploaded
+before derivatives existed, or whose rendering failed.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from rest_framework import serializers
+from .imaging import render_derivatives
+
+logger = logging.getLogger(__name__)
+
+# (model, image field, derivatives field)
+DERIVATIVE_FIELDS = [
+    ('maintenance.MaintenanceImage', 'image', 'derivatives'),
+    (settings.AUTH_USER_MODEL, 'profile_picture', 'profile_picture_derivatives'),
+]
+
+_pool = None
+
+
+def derivative_name(name, pk, variant):
+    # 'maintenance/leak.png' of row 7 -> 'maintenance/derivatives/leak_7_thumbnail.jpg'
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'derivatives', f'{stem}_{pk}_{variant}.jpg')
+
+
+def _spec(label):
+    for model, field, target in DERIVATIVE_FIELDS:
+        if model == label:
+            return field, target
+    raise LookupError(f'{label} has no image derivatives')
+
+
+def _store(label, pk, name, rendered):
+    """
+    Saves rendered derivatives and records them, unless the image was
+    replaced in the meantime. Returns the stored names ({} when stale).
+    """
+    model = apps.get_model(label)
+    field, target = _spec(label)
+    with transaction.atomic():
+        # Locked so the row cannot be replaced or deleted, and its files
+        # cleaned up, while they are being written
+        previous = model.objects.select_for_update().filter(pk=pk, **{field: name}) \
+            .values_list(target, flat=True).first()
+        if previous is None:
+            return {}
+        names = {}
+        for variant, data in rendered.items():
+            # Always the default storage: derivatives belong to one row,
+            # unlike content-addressed originals, which rows may share.
+            # A re-render replaces the row's files rather than adding copies.
+            derivative = derivative_name(name, pk, variant)
+            default_storage.delete(derivative)
+            names[variant] = default_storage.save(derivative, ContentFile(data))
+        model.objects.filter(pk=pk, **{field: name}).update(**{target: names})
+        _discard(set(previous.values()) - set(names.values()))
+    return names
+
+
+def _own_files(instance, name):
+    """
+    Names of the derivatives of image `name` belonging to `instance`: its
+    own derivative names, and any other names recorded on it.
+    """
+    _, target = _spec(instance._meta.label)
+    names = {derivative_name(name, instance.pk, variant) for variant in settings.IMAGE_DERIVATIVES}
+    return names | set((getattr(instance, target) or {}).values())
+
+
+def _discard(names):
+    # After commit, so a rolled-back change still finds its files
+    names = sorted(name for name in names if name)
+    if names:
+        transaction.on_commit(partial(_delete_files, names))
+
+
+def _delete_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.exception('Could not delete derivative %s', name)
+
+
+def _finished(label, pk, name, future):
+    # Runs on the pool's result thread, which has its own connection
+    try:
+        _store(label, pk, name, future.result())
+    except Exception:
+        logger.exception('Could not create derivatives of %s', name)
+    finally:
+        close_old_connections()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: a fork would copy the server's threads' locks and DB sockets
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+
+def generate_derivatives(instance, wait=False):
+    """
+    Renders the instance's image derivatives. With IMAGE_WORKERS = 0 (or
+    `wait`) this happens right away and returns the stored names; otherwise
+    the job goes to the process pool and its Future is returned at once.
+    """
+    label = instance._meta.label
+    field, _ = _spec(label)
+    file = getattr(instance, field)
+    if not file:
+        return {}
+    with file.storage.open(file.name, 'rb') as source:
+        data = source.read()
+    job = (data, settings.IMAGE_DERIVATIVES, settings.IMAGE_DERIVATIVE_QUALITY)
+
+    if settings.IMAGE_WORKERS <= 0:
+        return _store(label, instance.pk, file.name, render_derivatives(*job))
+    future = get_pool().submit(render_derivatives, *job)
+    if wait:
+        return _store(label, instance.pk, file.name, future.result())
+    future.add_done_callback(partial(_finished, label, instance.pk, file.name))
+    return future
+
+
+def missing_derivatives(label):
+    """
+    Rows of `label` that have an image but no derivatives yet.
+    """
+    field, target = _spec(label)
+    return apps.get_model(label).objects.filter(**{f'{field}__isnull': False, target: {}}).exclude(**{field: ''})
+
+
+def shutdown_pool():
+    """
+    Waits for queued jobs, including saving their results, and stops the workers.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def _schedule(instance):
+    try:
+        generate_derivatives(instance)
+    except Exception:
+        # A missing or unreadable upload must not fail the request that saved it
+        logger.exception('Could not queue derivatives for %s', instance._meta.label)
+
+
+def _image_name(instance):
+    field, _ = _spec(instance._meta.label)
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value) or ''
+
+
+def remember_image(sender, instance, **kwargs):
+    instance._image_origin = _image_name(instance)
+
+
+def reset_derivatives(sender, instance, **kwargs):
+    # A replaced image drops the old derivatives in the same write, and
+    # their files once it commits
+    instance._stale_derivatives = set()
+    if _image_name(instance) != instance._image_origin:
+        if instance._image_origin and instance.pk is not None:
+            instance._stale_derivatives = _own_files(instance, instance._image_origin)
+        setattr(instance, _spec(sender._meta.label)[1], {})
+
+
+def queue_derivatives(sender, instance, **kwargs):
+    name = _image_name(instance)
+    if name and name != instance._image_origin:
+        transaction.on_commit(partial(_schedule, instance))
+    _discard(instance._stale_derivatives)
+    instance._image_origin = name
+
+
+def delete_derivatives(sender, instance, **kwargs):
+    name = _image_name(instance)
+    if name:
+        _discard(_own_files(instance, name))
+
+
+for _model, _field, _target in DERIVATIVE_FIELDS:
+    post_init.connect(remember_image, sender=_model)
+    pre_save.connect(reset_derivatives, sender=_model)
+    post_save.connect(queue_derivatives, sender=_model)
+    post_delete.connect(delete_derivatives, sender=_model)
+
+
+class DerivativeField(serializers.Field):
+    """
+    Read-only URL of one derivative of an image field, or of the original
+    while the derivative is not ready. Absolute when the serializer has the
+    request, like ImageField URLs.
+    """
+
+    def __init__(self, image_field, variant, **kwargs):
+        self.image_field = image_field
+        self.variant = variant
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        file = getattr(instance, self.image_field)
+        if not file:
+            return None
+        _, target = _spec(instance._meta.label)
+        name = (getattr(instance, target) or {}).get(self.variant)
+        url = default_storage.url(name) if name else file.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+def media_view(request, path):
+    """
+    Serves MEDIA_ROOT (DEBUG only; production serves it from the web server
+    with the same header). Uploads get unique names, and a derivative's name
+    is only reused to render the same original again, so responses can be
+    cached for a long time.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_SECONDS, immutable=True)
+    return response
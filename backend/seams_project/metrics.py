@@ -0,0 +1,244 @@
+"""
+Per-endpoint request metrics in Prometheus text format.
+
+MetricsMiddleware records, per URL name (DRF routes are named like
+'reports-debtors-list' or 'maintenance-list'), request counts, a latency
+histogram, SQL query counts and time, and response sizes into an in-process
+registry. Updates are a few dict operations under a lock.
+
+With METRICS_DIR set, every worker process periodically writes its cumulative
+values to its own file there and /api/_metrics sums all files, so gunicorn or
+uvicorn workers add up correctly. Without it, only the serving process's
+values are exported.
+
+/api/_metrics is only served when METRICS_TOKEN is set, to scrapers sending
+it as a bearer token.
+"""
+import hmac
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = {
+    'seams_http_requests_total': ('counter', 'Requests served, by endpoint, method and status'),
+    'seams_http_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'seams_http_response_size_bytes_total': ('counter', 'Response body bytes by endpoint (streamed bodies excluded)'),
+    'seams_db_queries_per_request': ('histogram', 'SQL queries issued per request by endpoint'),
+    'seams_db_query_duration_seconds_total': ('counter', 'Time spent in SQL by endpoint'),
+}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Separate from `lock`, which snapshot() takes while a flush holds this one
+        self.flush_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time_ns()
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, list(labels), dict(h, counts=list(h['counts']))]
+                    for (name, labels), h in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """
+        Writes this process's snapshot to METRICS_DIR at most every
+        METRICS_FLUSH_SECONDS. The file name carries the pid and start time,
+        so a restarted worker never overwrites its predecessor's totals.
+        A failed write is logged and retried on a later request; it never
+        fails the request that triggered it.
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        # Request threads skip the flush another thread is already doing
+        if not self.flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self.flushed_at < getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+                return
+            self.flushed_at = now
+            path = os.path.join(directory, f'metrics-{os.getpid()}-{self.started}.json')
+            try:
+                os.makedirs(directory, exist_ok=True)
+                # Own temp file per flush: never '.json' so scrapes skip it
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w') as handle:
+                        json.dump(self.snapshot(), handle)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+            except OSError:
+                logger.exception('Could not write metrics to %s', directory)
+        finally:
+            self.flush_lock.release()
+
+
+registry = Registry()
+
+
+def _collect():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return [registry.snapshot()]
+
+    registry.flush(force=True)
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.startswith('metrics-') and name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                # Replaced or half-written between listdir and open
+                continue
+    return snapshots
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, {'buckets': h['buckets'], 'counts': [0] * len(h['buckets']), 'sum': 0, 'count': 0})
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], h['counts'])]
+            merged['sum'] += h['sum']
+            merged['count'] += h['count']
+    return counters, histograms
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render():
+    counters, histograms = _merge(_collect())
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        else:
+            for (metric, labels), h in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h['buckets'], h['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {h["count"]}')
+                lines.append(f'{name}_sum{_labels(labels)} {h["sum"]}')
+                lines.append(f'{name}_count{_labels(labels)} {h["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper hook counting queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        endpoint = (match.view_name if match else None) or 'unmatched'
+        labels = (('endpoint', endpoint),)
+        registry.inc('seams_http_requests_total', labels + (('method', request.method), ('status', response.status_code)))
+        registry.observe('seams_http_request_duration_seconds', labels, elapsed, LATENCY_BUCKETS)
+        registry.observe('seams_db_queries_per_request', labels, timer.count, QUERY_BUCKETS)
+        registry.inc('seams_db_query_duration_seconds_total', labels, timer.duration)
+        if not response.streaming:
+            registry.inc('seams_http_response_size_bytes_total', labels, len(response.content))
+        registry.flush()
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape target. Scrapers must send METRICS_TOKEN as a bearer
+    token; without one configured the endpoint does not exist.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return HttpResponse(status=404)
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return HttpResponse(status=401)
+    # Bytes: compare_digest() rejects non-ASCII strings
+    if not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return HttpResponse(status=403)
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+
+class ASGIUrlconfMiddleware:
+    """
+    Resolves requests that arrived through ASGI against ASGI_URLCONF, so
+    async views can replace sync ones only where an event loop serves them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest) and getattr(settings, 'ASGI_URLCONF', None):
+            request.urlconf = settings.ASGI_URLCONF
+        return self.get_response(request)
@@ -46,20 +46,27 @@ INSTALLED_APPS = [
     'users',
     'estates',
     'maintenance',
+    'uploads',
+    'search',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'seams_project.middleware.ASGIUrlconfMiddleware',
+    'seams_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'seams_project.db_routing.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'seams_project.urls'
+# Requests served through asgi.py resolve here first (async report views)
+ASGI_URLCONF = 'seams_project.asgi_urls'
 
 TEMPLATES = [
     {
@@ -93,6 +100,39 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma-separated hosts serving streaming copies of the primary
+# (same name and credentials). Read-only API requests are routed to them by
+# seams_project.db_routing; tests read them through the primary's test database
+# (seams_project.test_settings adds a stand-in replica when none is configured).
+for number, host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['seams_project.db_routing.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Longest a single report query may run before it is cancelled
+REPORT_STATEMENT_TIMEOUT_MS = int(os.getenv('REPORT_STATEMENT_TIMEOUT_MS', '15000'))
+
+# Async report views: aggregates run concurrently, at most this many
+# connections per request and worker threads (connections) per process
+REPORT_QUERY_CONCURRENCY = int(os.getenv('REPORT_QUERY_CONCURRENCY', '4'))
+REPORT_QUERY_WORKERS = int(os.getenv('REPORT_QUERY_WORKERS', '8'))
+
+# Cache
+# Local memory by default; point CACHE_BACKEND at FileBasedCache (or Redis) to share
+# cached reports and their invalidation between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'seams-cache'),
+    }
+}
+
+# Seconds a computed report stays cached (writes invalidate it sooner)
+REPORT_CACHE_TIMEOUT = int(os.getenv('REPORT_CACHE_TIMEOUT', '300'))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -135,8 +175,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        # The simplejwt and DRF classes, also reporting the user to the replica routing
+        'seams_project.db_routing.JWTAuthentication',
+        'seams_project.db_routing.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -156,6 +197,28 @@ CORS_ALLOWED_ORIGINS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized copies of uploaded photos (seams_project/media.py): box per variant,
+# JPEG quality, and worker processes (0 renders inline, in the saving thread)
+IMAGE_DERIVATIVES = {'thumbnail': (320, 320), 'web': (1280, 1280)}
+IMAGE_DERIVATIVE_QUALITY = 82
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+
+# Cache lifetime of media responses; uploaded files are never rewritten in place
+MEDIA_CACHE_SECONDS = 365 * 24 * 60 * 60
+
+# Resumable uploads (/api/uploads/): partial files live outside MEDIA_ROOT until
+# verified; manage.py purge_uploads drops sessions idle for UPLOAD_SESSION_HOURS
+UPLOAD_CHUNK_DIR = Path(os.getenv('UPLOAD_CHUNK_DIR', BASE_DIR / 'upload_chunks'))
+UPLOAD_CHUNK_MAX_BYTES = 8 * 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(100 * 1024 * 1024)))
+UPLOAD_SESSION_HOURS = 24
+# Extensions a stored file may keep; media is served from our origin, so
+# anything a browser would run (.html, .svg) is refused
+UPLOAD_EXTENSIONS = ['.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.gif', '.webp']
+
+# /api/search/ ranks at most this many matches per type
+SEARCH_CANDIDATES = 1000
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=5),
@@ -166,14 +229,55 @@ SIMPLE_JWT = {
 # EMAIL CONFIGURATION (SMTP)
 # ==========================================
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
+# Seconds any one SMTP operation may block. The outbox renews its lease
+# between messages, not during one, so keep this well below OUTBOX_LEASE_SECONDS
+EMAIL_TIMEOUT = 30
 
 # Credentials loaded securely from .env
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Outbox worker (manage.py runworker): retries back off 60s, 120s, 240s, ...
+# For local testing point EMAIL_HOST/EMAIL_PORT at a debugging SMTP server,
+# e.g. `python -m aiosmtpd -n -l localhost:1025` with EMAIL_USE_TLS=False.
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 60
+# A worker's claim on a batch, renewed before each message; rows still
+# 'sending' after it are claimed again (see EMAIL_TIMEOUT)
+OUTBOX_LEASE_SECONDS = 300
+
+# Bulk payment reminders skip tenants already reminded within this many hours
+PAYMENT_REMINDER_WINDOW_HOURS = int(os.getenv('PAYMENT_REMINDER_WINDOW_HOURS', '24'))
+
+# Notification push stream (/api/notifications/stream/, served over ASGI)
+NOTIFICATION_STREAM_POLL_SECONDS = 2
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = 15
+# Each poll re-reads rows this recent, for transactions that commit out of id order
+NOTIFICATION_STREAM_OVERLAP_SECONDS = 30
+# Lifetime of the single-use tickets browsers open the stream with
+NOTIFICATION_STREAM_TICKET_SECONDS = 30
+
+# manage.py archive_notifications: read notifications older than this many
+# days (per user role, 'default' for the rest) leave the live table
+NOTIFICATION_RETENTION_DAYS = {
+    'default': 90,
+    'tenant': 90,
+    'technician': 60,
+    'manager': 180,
+    'estate_admin': 180,
+}
+
+# Prometheus metrics at /api/_metrics, served only when METRICS_TOKEN is set;
+# scrapers send it as 'Authorization: Bearer <token>'. With several worker
+# processes set METRICS_DIR to a directory they share (cleared on deploy) so
+# the scrape sums them.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 # Frontend URL for email links
 FRONTEND_URL = 'http://localhost:3000'
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=seams_project.test_settings
+
+Without DATABASE_REPLICA_HOSTS there is no replica, so a stand-in one is
+added: a second connection to the primary's test database, which lets the
+routing tests run against a single server.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, DATABASE_REPLICAS
+
+if not DATABASE_REPLICAS:
+    DATABASES['replica1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS = ['replica1']
@@ -1,14 +1,19 @@
+import re
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from users.views import UserViewSet, tenant_register, verify_email, NotificationViewSet
+from users.streams import notification_stream
+from .media import media_view
+from .metrics import metrics_view
 from estates.views import HouseViewSet, TenantViewSet, ContractViewSet, PaymentViewSet, BillViewSet
 from estates.reports import ReportsViewSet
 from maintenance.views import MaintenanceRequestViewSet, MaintenanceImageViewSet
+from uploads.views import UploadViewSet
+from search.views import search
 
 router = DefaultRouter()
 router.register('users', UserViewSet)
@@ -20,10 +25,15 @@ router.register('bills', BillViewSet)
 router.register('maintenance', MaintenanceRequestViewSet, basename='maintenance')
 router.register('maintenance-images', MaintenanceImageViewSet)
 router.register('notifications', NotificationViewSet, basename='notifications')
+router.register('uploads', UploadViewSet, basename='uploads')
 router.register('reports', ReportsViewSet, basename='reports')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/_metrics', metrics_view, name='metrics'),
+    # Before the router, whose detail route would otherwise match 'stream'
+    path('api/notifications/stream/', notification_stream, name='notification-stream'),
+    path('api/search/', search, name='search'),
     path('api/', include(router.urls)),
     path('api/auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -32,4 +42,4 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += [re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.*)$", media_view, name='media')]
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from search.terms import TERM_SOURCES, rebuild_terms
+
+
+class Command(BaseCommand):
+    help = 'Adds the words of all searchable rows to the spelling vocabulary, e.g. after bulk imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows read per statement')
+
+    def handle(self, *args, **options):
+        for label, _ in TERM_SOURCES:
+            added = rebuild_terms(label, batch_size=options['batch_size'])
+            self.stdout.write(f'{label}: {added} new words')
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('word', models.CharField(max_length=64, primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'search_terms',
+                'indexes': [models.Index(fields=['word'], name='search_term_prefix_idx', opclasses=['varchar_pattern_ops'])],
+            },
+        ),
+    ]
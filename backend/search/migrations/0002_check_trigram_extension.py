@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+import warnings
+from django.db import migrations
+
+
+def check_trigram_extension(apps, schema_editor):
+    """
+    Typo tolerance is built on search_terms (see search.terms) because our
+    Postgres builds do not ship pg_trgm. Check that on each database the
+    project is migrated on, so the choice is revisited where it no longer
+    holds.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone() is not None
+    if available:
+        warnings.warn(
+            'pg_trgm is available on this database: search.terms could correct '
+            'misspellings with TrigramSimilarity instead of the search_terms vocabulary.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_trigram_extension, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class SearchTerm(models.Model):
+    """
+    One distinct word of the searchable text, used to correct misspelt query
+    words (see search.terms). Rows are only ever added; a word whose rows
+    are gone simply corrects to no results.
+    """
+    word = models.CharField(max_length=64, primary_key=True)
+
+    class Meta:
+        db_table = 'search_terms'
+        indexes = [
+            # LIKE 'prefix%' lookups, which the primary key's collation-ordered index cannot serve
+            models.Index(fields=['word'], name='search_term_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.word
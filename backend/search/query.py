@@ -0,0 +1,67 @@
+"""
+Turning a search box string into a ranked tsquery.
+
+Each word becomes a prefix match, so half-typed words find results. Words
+are compacted to letters and digits, as identifiers are in the vectors
+('B-04' -> 'b04'). A word also matches through its English stem, so that
+'leaking' finds 'leaks' (as 'leak:*'); the plain word is only kept when the
+stem is not a prefix of it ('happy' -> 'happi'), since every prefix costs a
+scan of the GIN index. All words must match.
+"""
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, router
+from django.db.models import F
+from .models import SearchTerm
+from .vectors import SEARCH_CONFIG
+
+MAX_TERMS = 8
+MAX_TERM_LENGTH = 64
+
+STEMS_SQL = "SELECT term, ts_lexize('english_stem', term) FROM unnest(%s::text[]) AS term"
+
+
+def query_terms(text):
+    terms = (re.sub(r'[\W_]+', '', word) for word in text.lower().split())
+    return [term[:MAX_TERM_LENGTH] for term in terms if term][:MAX_TERMS]
+
+
+def _stems(terms):
+    with connections[router.db_for_read(SearchTerm)].cursor() as cursor:
+        cursor.execute(STEMS_SQL, [list(terms)])
+        # Stopwords stem to an empty list
+        return {term: stems[0] if stems else term for term, stems in cursor.fetchall()}
+
+
+def search_query(terms):
+    stems = _stems(terms)
+    parts = []
+    for term in terms:
+        stem = stems[term]
+        prefixes = [stem] if term.startswith(stem) else [term, stem]
+        parts.append('(' + ' | '.join(f'{prefix}:*' for prefix in prefixes) + ')')
+    # Terms and their stems are letters and digits only, so the raw tsquery syntax is safe
+    return SearchQuery(' & '.join(parts), config=SEARCH_CONFIG, search_type='raw')
+
+
+def ranked(queryset, vector, query, limit, *fields, **expressions):
+    """
+    The `limit` best matches of `query` on the tsvector at `vector`, as
+    values() dicts of `fields` and `expressions` plus id and rank.
+
+    Only the first SEARCH_CANDIDATES matches the GIN index yields are
+    ranked, so a word found in half of a million rows costs about the same
+    as a rare one. The cap sits in an unordered subquery: ordering the
+    candidates (e.g. newest first) would let the planner walk the primary
+    key instead, reading the whole table for rare words. The candidates are
+    then ordered by rank and cut to `limit` in the same query.
+    """
+    candidates = queryset.filter(**{vector: query}).order_by().values('pk')[:settings.SEARCH_CANDIDATES]
+    rows = (
+        queryset.filter(pk__in=candidates)
+        .annotate(rank=SearchRank(F(vector), query))
+        .order_by('-rank', '-pk')
+        .values('id', 'rank', *fields, **expressions)[:limit]
+    )
+    return [{**row, 'rank': round(row['rank'], 4)} for row in rows]
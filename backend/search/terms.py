@@ -0,0 +1,146 @@
+"""
+Vocabulary for typo-tolerant search.
+
+Our Postgres build has no pg_trgm (migration 0002 checks this on every
+database it runs on), so misspelt query words are corrected
+against search_terms, the distinct words of the searchable text: every word
+one edit away (a letter dropped, added, swapped or changed) is looked up by
+primary key in a single query. The vocabulary stays small (it grows with
+distinct words, not rows) and is filled by the receivers below when a
+save changes the text; rows written with bulk_create or COPY are picked up by the
+rebuild_search_terms command.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, router
+from django.db.models.signals import post_init, post_save
+from .models import SearchTerm
+
+# (model, text fields whose words are collected)
+TERM_SOURCES = [
+    ('estates.House', ['location', 'description']),
+    (settings.AUTH_USER_MODEL, ['first_name', 'last_name', 'username']),
+    ('maintenance.MaintenanceRequest', ['issue_description', 'notes']),
+]
+
+MIN_LENGTH = 3
+MAX_LENGTH = SearchTerm._meta.get_field('word').max_length
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+# Letter runs only: numbers and identifiers are matched as prefixes, never corrected
+TERMS_SQL = """
+    INSERT INTO search_terms (word)
+    SELECT DISTINCT word
+    FROM ({texts}) AS source (text), regexp_split_to_table(lower(source.text), '[^[:alpha:]]+') AS word
+    WHERE length(word) BETWEEN {min_length} AND {max_length}
+    ORDER BY word
+    ON CONFLICT DO NOTHING
+"""
+
+
+def _fields(label):
+    for model, fields in TERM_SOURCES:
+        if model == label:
+            return fields
+    raise LookupError(f'{label} has no search terms')
+
+
+def _insert_terms(model, texts, params):
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        cursor.execute(TERMS_SQL.format(texts=texts, min_length=MIN_LENGTH, max_length=MAX_LENGTH), params)
+        return cursor.rowcount
+
+
+def collect_terms(label, first_pk, last_pk):
+    """
+    Adds the words of rows with first_pk <= pk <= last_pk to the vocabulary.
+    Returns the number of new words.
+    """
+    model = apps.get_model(label)
+    quote = connections[router.db_for_write(model)].ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in _fields(label))
+    texts = (f"SELECT concat_ws(' ', {columns}) FROM {quote(model._meta.db_table)} "
+             f"WHERE {quote(model._meta.pk.column)} BETWEEN %s AND %s")
+    return _insert_terms(model, texts, [first_pk, last_pk])
+
+
+def rebuild_terms(label, batch_size=5000):
+    """
+    Collects the words of every row, keyset-batched by primary key.
+    Returns the number of new words.
+    """
+    pks = apps.get_model(label).objects.order_by('pk').values_list('pk', flat=True)
+    added, last_pk = 0, None
+    while True:
+        batch = list((pks if last_pk is None else pks.filter(pk__gt=last_pk))[:batch_size])
+        if not batch:
+            return added
+        added += collect_terms(label, batch[0], batch[-1])
+        last_pk = batch[-1]
+
+
+def edits(word):
+    """
+    Every string one deletion, transposition, substitution or insertion
+    away from `word`.
+    """
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    transposes = [left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1]
+    replaces = [left + letter + right[1:] for left, right in splits if right for letter in LETTERS]
+    inserts = [left + letter + right for left, right in splits for letter in LETTERS]
+    return set(deletes + transposes + replaces + inserts) - {word}
+
+
+def correct(terms):
+    """
+    Replaces each alphabetic term that is not the start of any known word
+    with the closest known word one edit away, when there is one.
+    """
+    unknown = [
+        term for term in terms
+        if term.isalpha() and MIN_LENGTH <= len(term) <= MAX_LENGTH
+        and not SearchTerm.objects.filter(word__startswith=term).exists()
+    ]
+    if not unknown:
+        return list(terms)
+
+    candidates = {term: edits(term) for term in unknown}
+    known = set(SearchTerm.objects.filter(
+        word__in=set().union(*candidates.values())
+    ).values_list('word', flat=True))
+
+    corrected = []
+    for term in terms:
+        matches = known & candidates.get(term, set())
+        # Typos rarely hit the first letter; then prefer the same length
+        corrected.append(min(matches, key=lambda word: (word[0] != term[0], abs(len(word) - len(term)), word))
+                         if matches else term)
+    return corrected
+
+
+def _text(instance):
+    # Loaded values only: a deferred field cannot have been changed, and
+    # reading it would cost a query
+    return ' '.join(str(instance.__dict__.get(name) or '') for name in _fields(instance._meta.label))
+
+
+def remember_text(sender, instance, **kwargs):
+    instance._terms_origin = _text(instance)
+
+
+def add_terms(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and not set(_fields(sender._meta.label)) & set(update_fields):
+        return
+    # The saved values are at hand, so the table is not read again; saves
+    # that leave the text as loaded (status changes, logins) add nothing
+    text = _text(instance)
+    if created or text != instance._terms_origin:
+        _insert_terms(sender, 'VALUES (%s)', [text])
+    instance._terms_origin = text
+
+
+for _model, _names in TERM_SOURCES:
+    post_init.connect(remember_text, sender=_model)
+    post_save.connect(add_terms, sender=_model)
@@ -0,0 +1,121 @@
+from datetime import date
+from io import StringIO
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from estates.models import House, Tenant
+from maintenance.models import MaintenanceRequest
+from .models import SearchTerm
+
+User = get_user_model()
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.admin)
+        self.house = House.objects.create(house_number='B-04', house_type='bedsitter', rent_amount=5000,
+                                          location='Riverside')
+        self.other_house = House.objects.create(house_number='C-11', house_type='bedsitter', rent_amount=5000)
+        user = User.objects.create_user(username='wanjiku', first_name='Grace', last_name='Wanjiku',
+                                        phone='+254712345678', role='tenant')
+        self.tenant = Tenant.objects.create(user=user, house=self.house, move_in_date=date(2025, 1, 1),
+                                            contract_start=date(2025, 1, 1), contract_end=date(2026, 1, 1))
+        self.leak = MaintenanceRequest.objects.create(house=self.house, issue_description='Kitchen tap leaks')
+        self.noted = MaintenanceRequest.objects.create(house=self.other_house, issue_description='Cupboard door',
+                                                       notes='Leaking pipe found behind it')
+        self.window = MaintenanceRequest.objects.create(house=self.other_house, issue_description='Broken window')
+
+    def search(self, q, **params):
+        response = self.client.get('/api/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, data, kind):
+        return [row['id'] for row in data['results'][kind]]
+
+    def test_ranked_by_field_weight(self):
+        data = self.search('leaking')
+        # Stemmed and prefix-matched; the description outranks the notes
+        self.assertEqual(self.ids(data, 'maintenance'), [self.leak.pk, self.noted.pk])
+        self.assertEqual(data['results']['maintenance'][0]['house_number'], 'B-04')
+        self.assertIsNone(data['corrected'])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.ids(self.search('leak pipe'), 'maintenance'), [self.noted.pk])
+
+    def test_identifiers_names_and_phones(self):
+        data = self.search('b-04')
+        self.assertEqual(self.ids(data, 'houses'), [self.house.pk])
+        self.assertEqual(self.ids(data, 'maintenance'), [self.leak.pk])
+
+        self.assertEqual(self.ids(self.search(self.leak.request_id), 'maintenance'), [self.leak.pk])
+        self.assertEqual(self.ids(self.search('wanj'), 'tenants'), [self.tenant.pk])
+        self.assertEqual(self.ids(self.search('254712'), 'tenants'), [self.tenant.pk])
+        self.assertEqual(self.search('grace')['results']['tenants'][0]['name'], 'Grace Wanjiku')
+
+    def test_index_follows_writes(self):
+        self.tenant.user.first_name = 'Akinyi'
+        self.tenant.user.save()
+        self.assertEqual(self.ids(self.search('akinyi'), 'tenants'), [self.tenant.pk])
+        self.assertEqual(self.ids(self.search('grace'), 'tenants'), [])
+
+        # Generated by Postgres, so rows written without save() are indexed too
+        MaintenanceRequest.objects.bulk_create([MaintenanceRequest(issue_description='Termites in roof')])
+        self.assertEqual(len(self.search('termites')['results']['maintenance']), 1)
+
+    def test_misspelt_words_are_corrected(self):
+        data = self.search('kitchn')
+        self.assertEqual(data['corrected'], 'kitchen')
+        self.assertEqual(self.ids(data, 'maintenance'), [self.leak.pk])
+
+        # A known prefix is searched as typed
+        self.assertIsNone(self.search('kitch')['corrected'])
+
+    def test_types_and_limit(self):
+        data = self.search('leak', types='maintenance', limit=1)
+        self.assertEqual(list(data['results']), ['maintenance'])
+        self.assertEqual(len(data['results']['maintenance']), 1)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/api/search/', {'q': ' -- '}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'leak', 'types': 'payments'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'leak', 'limit': 'ten'}).status_code, 400)
+
+        self.client.force_authenticate(self.tenant.user)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'leak'}).status_code, 403)
+
+    def test_terms_are_only_collected_when_text_changes(self):
+        request = MaintenanceRequest.objects.get(pk=self.window.pk)
+        request.status = 'in_progress'
+        with CaptureQueriesContext(connection) as queries:
+            request.save()
+        self.assertFalse([query for query in queries if 'search_terms' in query['sql']])
+
+        request.notes = 'Glazier booked'
+        request.save()
+        self.assertTrue(SearchTerm.objects.filter(word='glazier').exists())
+
+    def test_rebuild_search_terms(self):
+        MaintenanceRequest.objects.bulk_create([MaintenanceRequest(issue_description='Mould on ceiling')])
+        self.assertFalse(SearchTerm.objects.filter(word='mould').exists())
+
+        out = StringIO()
+        call_command('rebuild_search_terms', stdout=out)
+        self.assertTrue(SearchTerm.objects.filter(word='mould').exists())
+        self.assertEqual(self.search('moudl')['corrected'], 'mould')
+
+    def test_admin_search_uses_vector(self):
+        request = RequestFactory().get('/admin/maintenance/maintenancerequest/')
+        admin = site._registry[MaintenanceRequest]
+        queryset, _ = admin.get_search_results(request, MaintenanceRequest.objects.all(), 'broken')
+        self.assertEqual(list(queryset), [self.window])
+
+    def test_vectors_stay_out_of_the_api(self):
+        self.assertNotIn('search_vector', self.client.get(f'/api/houses/{self.house.pk}/').data)
+        self.assertNotIn('search_vector', self.client.get(f'/api/maintenance/{self.leak.pk}/').data)
@@ -0,0 +1,47 @@
+"""
+Expressions for the stored `search_vector` columns on House, User and
+MaintenanceRequest.
+
+Each column is a GeneratedField: Postgres recomputes it whenever the row is
+written, including bulk_create and COPY, so the GIN indexes never go stale.
+A generated column can only read its own row, so maintenance requests are
+matched on the archived_house_number snapshot rather than the house.
+
+Vectors use the 'simple' configuration (no stemming, no stopwords) so that
+names, phone numbers and prefixes of half-typed words match; the query side
+adds English stemming (see search.query).
+"""
+from django.contrib.postgres.search import SearchVector
+from django.db.models import CharField, F, Func, Value
+
+SEARCH_CONFIG = 'simple'
+
+
+def compact(field):
+    # 'B-04' -> 'B04', 'MR-001' -> 'MR001': identifiers as one token, matching compacted query terms
+    return Func(F(field), Value('[^[:alnum:]]+'), Value(''), Value('g'), function='REGEXP_REPLACE',
+                output_field=CharField())
+
+
+def digits(field):
+    # '+254 712 345 678' -> '254712345678'
+    return Func(F(field), Value('[^0-9]+'), Value(''), Value('g'), function='REGEXP_REPLACE',
+                output_field=CharField())
+
+
+def local_part(field):
+    # 'jane.doe@example.com' -> 'jane.doe'
+    return Func(F(field), Value('@'), Value(1), function='SPLIT_PART', output_field=CharField())
+
+
+def document(*parts):
+    """
+    Combines (expression, weight) pairs into one tsvector, A weighing most.
+    """
+    vector = None
+    for expression, weight in parts:
+        if isinstance(expression, str):
+            expression = F(expression)
+        part = SearchVector(expression, config=SEARCH_CONFIG, weight=weight)
+        vector = part if vector is None else vector + part
+    return vector
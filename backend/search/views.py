@@ -0,0 +1,74 @@
+from django.db.models import F
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from estates.models import House, Tenant
+from estates.reports import IsEstateAdmin
+from maintenance.models import MaintenanceRequest
+from seams_project.exports import full_name, live_or_archived
+from .query import query_terms, ranked, search_query
+from .terms import correct
+
+# type -> (queryset, tsvector lookup, model fields and computed columns returned besides id and rank)
+SEARCHES = {
+    'maintenance': (MaintenanceRequest.objects.all(), 'search_vector', ['request_id', 'issue_description', 'status', 'priority'], {
+        'house_number': live_or_archived('house', 'house__house_number', 'archived_house_number', 'Unknown House'),
+    }),
+    'tenants': (Tenant.objects.all(), 'user__search_vector', ['status'], {
+        'name': full_name('user'),
+        'username': F('user__username'),
+        'phone': F('user__phone'),
+        'house_number': F('house__house_number'),
+    }),
+    'houses': (House.objects.all(), 'search_vector', ['house_number', 'location', 'house_type', 'status'], {}),
+}
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def _search(terms, types, limit):
+    query = search_query(terms)
+    results = {}
+    for name in types:
+        queryset, vector, fields, columns = SEARCHES[name]
+        results[name] = ranked(queryset.all(), vector, query, limit, *fields, **columns)
+    return results
+
+
+@api_view(['GET'])
+@permission_classes([IsEstateAdmin])
+def search(request):
+    """
+    Ranked full-text search over maintenance requests, tenants and houses.
+
+    ?q=         words to find; every word must match, as a prefix
+    ?types=     comma-separated subset of maintenance,tenants,houses
+    ?limit=     results per type (default 10, at most 50)
+
+    When nothing matches, misspelt words are corrected and the search is
+    retried; `corrected` then holds the query that was used.
+    """
+    terms = query_terms(request.query_params.get('q', ''))
+    if not terms:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    types = request.query_params.get('types')
+    types = types.split(',') if types else list(SEARCHES)
+    if not set(types) <= set(SEARCHES):
+        return Response({'error': f'types must be a subset of {list(SEARCHES)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    results = _search(terms, types, limit)
+    corrected = None
+    if not any(results.values()):
+        suggestion = correct(terms)
+        if suggestion != terms:
+            corrected = ' '.join(suggestion)
+            results = _search(suggestion, types, limit)
+
+    return Response({'query': ' '.join(terms), 'corrected': corrected, 'results': results})
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import StoredFile, UploadSession
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at']
+    search_fields = ['name', 'sha256']
+    readonly_fields = ['name', 'sha256', 'size', 'ref_count', 'created_at']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'owner', 'status', 'received', 'size', 'updated_at']
+    list_filter = ['status']
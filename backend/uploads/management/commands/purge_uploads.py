@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from uploads.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = ('Deletes upload sessions idle for too long: unfinished ones with their partial files, '
+            'and finished ones never attached to a contract or image (releasing their stored file)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=settings.UPLOAD_SESSION_HOURS,
+                            help='Idle time after which a session is purged')
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions deleted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the sessions')
+
+    def handle(self, *args, **options):
+        stale = UploadSession.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=options['hours']))
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Found {stale.count()} idle upload sessions'))
+            return
+
+        purged = 0
+        while True:
+            batch = list(stale.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            # Deleted one by one (via the collector) so the post_delete receivers release files
+            purged += UploadSession.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} idle upload sessions'))
@@ -0,0 +1,58 @@
+import uuid
+from django.conf import settings
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """
+    One content-addressed file and the number of rows that point at it
+    (contracts, maintenance images, finished upload sessions). The file is
+    deleted when the count drops to zero.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stored_files'
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload. Chunks are appended to a partial file at `received`
+    until `size` bytes arrived; completing checks the SHA-256 and moves the
+    file into content-addressed storage as `file_name`.
+    """
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    file_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'upload_sessions'
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_session_stale_idx'),
+        ]
+
+    @property
+    def partial_path(self):
+        return settings.UPLOAD_CHUNK_DIR / f'{self.id}.part'
+
+    def __str__(self):
+        return f"{self.filename} {self.received}/{self.size}"
@@ -0,0 +1,150 @@
+"""
+Reference counting for content-addressed files.
+
+Every row that points at a file in uploads.storage holds one reference on
+its StoredFile: the file fields in REFERENCES (kept in step by the receivers
+below, like the ledger signals) and finished UploadSessions until they are
+attached or purged. When the last reference goes, the file is deleted after
+the transaction commits. Names outside cas/ (uploads from before content
+addressing) are not counted and never deleted.
+"""
+import os
+from functools import partial
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from .models import StoredFile, UploadSession
+from .storage import content_storage, is_content_name
+
+# (model, file field) pairs stored in content_storage
+REFERENCES = [
+    ('estates.Contract', 'contract_document'),
+    ('maintenance.MaintenanceImage', 'image'),
+]
+
+# Lookup from each REFERENCES model to the user whose row it is
+HOLDERS = {
+    'estates.Contract': 'tenant__user',
+    'maintenance.MaintenanceImage': 'maintenance_request__reported_by',
+}
+
+
+def acquire(name):
+    """
+    Adds a reference to the stored file `name`.
+    """
+    if not is_content_name(name):
+        return
+    with transaction.atomic():
+        stored, created = StoredFile.objects.select_for_update().get_or_create(
+            name=name,
+            defaults={'sha256': _digest_of(name), 'size': _size_of(name), 'ref_count': 1},
+        )
+        if not created:
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + 1)
+
+
+def release(name):
+    """
+    Drops a reference to `name`; the last one deletes the file once the
+    surrounding transaction commits.
+    """
+    if not is_content_name(name):
+        return
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(name=name).first()
+        if stored is None:
+            return
+        if stored.ref_count > 1:
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') - 1)
+            return
+        StoredFile.objects.filter(pk=stored.pk).update(ref_count=0)
+        transaction.on_commit(partial(_collect, name))
+
+
+def held_by(user, name):
+    """
+    Whether `user` already holds a reference to `name`: a finished upload
+    session of theirs, or one of their rows in REFERENCES.
+    """
+    if UploadSession.objects.filter(owner=user, status='complete', file_name=name).exists():
+        return True
+    for model, field in REFERENCES:
+        rows = apps.get_model(model)._default_manager.filter(**{field: name, HOLDERS[model]: user})
+        if rows.exists():
+            return True
+    return False
+
+
+def _collect(name):
+    # Someone may have taken a new reference between release() and commit
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(name=name, ref_count=0).first()
+        if stored is not None:
+            stored.delete()
+            content_storage.delete(name)
+
+
+def _digest_of(name):
+    # The content name is the digest
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def _size_of(name):
+    try:
+        return content_storage.size(name)
+    except OSError:
+        return 0
+
+
+def _names(instance):
+    names = {}
+    for model, field in REFERENCES:
+        if model == instance._meta.label:
+            value = instance.__dict__.get(field)
+            names[field] = getattr(value, 'name', value) or ''
+    return names
+
+
+def remember_files(sender, instance, **kwargs):
+    instance._file_origins = _names(instance)
+
+
+def count_saved_files(sender, instance, created=False, **kwargs):
+    names = _names(instance)
+    # A new row was initialised with its names, so nothing is held yet
+    origins = {} if created else instance._file_origins
+    for field, name in names.items():
+        origin = origins.get(field, '')
+        if name != origin:
+            acquire(name)
+            release(origin)
+    instance._file_origins = names
+
+
+def count_deleted_files(sender, instance, **kwargs):
+    for name in _names(instance).values():
+        release(name)
+
+
+for _model, _field in REFERENCES:
+    post_init.connect(remember_files, sender=_model)
+    post_save.connect(count_saved_files, sender=_model)
+    post_delete.connect(count_deleted_files, sender=_model)
+
+
+def release_session(sender, instance, **kwargs):
+    if instance.status == 'complete':
+        release(instance.file_name)
+    transaction.on_commit(partial(_remove_partial, instance.partial_path))
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+post_delete.connect(release_session, sender=UploadSession)
@@ -0,0 +1,121 @@
+import os
+import re
+from django.conf import settings
+from django.db import transaction
+from PIL import Image
+from rest_framework import serializers
+from .models import UploadSession
+from .storage import content_storage
+
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'sha256', 'offset', 'status', 'url', 'created_at']
+        read_only_fields = ['status', 'created_at']
+
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        # The extension is kept on the stored file, which is served from MEDIA_URL
+        if os.path.splitext(value)[1].lower() not in settings.UPLOAD_EXTENSIONS:
+            raise serializers.ValidationError(
+                f"File type not allowed; use one of: {', '.join(settings.UPLOAD_EXTENSIONS)}"
+            )
+        return value
+
+    def validate_size(self, value):
+        if value <= 0 or value > settings.UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f'size must be between 1 and {settings.UPLOAD_MAX_BYTES} bytes')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if not SHA256.match(value):
+            raise serializers.ValidationError('sha256 must be 64 hex characters')
+        return value
+
+    def get_url(self, obj):
+        if obj.status != 'complete':
+            return None
+        url = content_storage.url(obj.file_name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class UploadField(serializers.PrimaryKeyRelatedField):
+    """
+    Write-only reference to one of the caller's finished upload sessions.
+    With `image=True` the file must be an image Pillow can read, as
+    ImageField checks for multipart uploads.
+    """
+    default_error_messages = {
+        **serializers.PrimaryKeyRelatedField.default_error_messages,
+        'invalid_image': 'Upload a valid image. The file you uploaded was either not an image or a corrupted image.',
+    }
+
+    def __init__(self, image=False, **kwargs):
+        self.image = image
+        kwargs.setdefault('write_only', True)
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(owner=self.context['request'].user, status='complete')
+
+    def to_internal_value(self, data):
+        session = super().to_internal_value(data)
+        if self.image:
+            try:
+                with content_storage.open(session.file_name) as source, Image.open(source) as image:
+                    image.verify()
+            except Exception:
+                self.fail('invalid_image')
+        return session
+
+
+class AttachUploadsMixin:
+    """
+    ModelSerializer mixin for file fields that can also be filled from a
+    finished upload session. `upload_fields` maps each UploadField to the
+    file field it fills. The session is deleted once the row holds its own
+    reference to the file.
+    """
+    upload_fields = {}
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        self._sessions = []
+        for upload_field, file_field in self.upload_fields.items():
+            session = attrs.pop(upload_field, None)
+            if session is None:
+                continue
+            if attrs.get(file_field):
+                raise serializers.ValidationError({upload_field: f'Send either {file_field} or {upload_field}, not both'})
+            attrs[file_field] = session.file_name
+            self._sessions.append((upload_field, session))
+        return attrs
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            self._consume_sessions()
+        return instance
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            self._consume_sessions()
+        return instance
+
+    def _consume_sessions(self):
+        for upload_field, session in getattr(self, '_sessions', []):
+            # Locked so a session attached by two requests at once is used only once
+            session = UploadSession.objects.select_for_update().filter(pk=session.pk).first()
+            if session is None:
+                raise serializers.ValidationError({upload_field: 'This upload was already used'})
+            session.delete()
@@ -0,0 +1,94 @@
+"""
+Content-addressed file storage.
+
+Files are stored once per content under MEDIA_ROOT at
+cas/<aa>/<bb>/<sha256><ext>, whatever name they were uploaded with. Saving
+content that is already stored writes nothing and returns the existing
+name, so two contracts or photos with the same bytes share one file. Which
+rows use a file is tracked in uploads.refs; this class never deletes, and
+decides whether to reuse a file under the StoredFile row lock refs deletes
+it under.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from .models import StoredFile
+
+PREFIX = 'cas'
+HASH_BLOCK = 1024 * 1024
+
+
+def content_name(digest, extension):
+    return f'{PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_content_name(name):
+    return bool(name) and name.startswith(f'{PREFIX}/')
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the real name from the content; no need to probe for a free one
+        return name
+
+    def _save(self, name, content):
+        """
+        Streams `content` to a temporary file while hashing it, then moves it
+        to its content name (or drops it when that content is stored already).
+        """
+        directory = os.path.join(self.location, PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as target:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    target.write(chunk)
+            return self.adopt(temporary, digest.hexdigest(), os.path.splitext(name)[1])
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def adopt(self, path, digest, extension):
+        """
+        Moves the local file at `path`, whose SHA-256 is `digest`, into the
+        store and returns its name. The caller has verified the digest.
+        """
+        name = content_name(digest, extension)
+        final = self.path(name)
+        with transaction.atomic():
+            # uploads.refs deletes a file holding this row's lock, so the
+            # existence check below cannot race a deletion in progress
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if os.path.exists(final):
+                if stored is not None and stored.ref_count == 0:
+                    # Released and waiting to be collected: drop the row so
+                    # the collection finds nothing to delete. The caller's
+                    # acquire() adds it back.
+                    stored.delete()
+                os.remove(path)
+                return name
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            # Same filesystem: an atomic rename; otherwise a copy
+            shutil.move(path, final)
+            if self.file_permissions_mode is not None:
+                os.chmod(final, self.file_permissions_mode)
+        return name
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from PIL import Image
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from estates.models import Contract, House, Tenant
+from maintenance.models import MaintenanceImage, MaintenanceRequest
+from .models import StoredFile, UploadSession
+from .refs import acquire
+from .storage import content_storage
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp()
+CHUNK_DIR = Path(tempfile.mkdtemp())
+
+
+def png_bytes(color='tomato'):
+    output = BytesIO()
+    Image.new('RGB', (40, 30), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, UPLOAD_CHUNK_DIR=CHUNK_DIR, IMAGE_WORKERS=0)
+class ResumableUploadTests(APITestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(CHUNK_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', role='estate_admin')
+        self.client.force_authenticate(self.user)
+        self.house = House.objects.create(house_number='U1', house_type='bedsitter', rent_amount=5000)
+        self.request = MaintenanceRequest.objects.create(house=self.house, issue_description='Leak')
+
+    def start(self, data, filename='leak.png'):
+        response = self.client.post('/api/uploads/', {
+            'filename': filename, 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def send(self, session_id, offset, chunk):
+        return self.client.patch(
+            f'/api/uploads/{session_id}/', chunk, content_type='application/offset+octet-stream',
+            headers={'Upload-Offset': str(offset)}
+        )
+
+    def upload(self, data, filename='leak.png', chunk_size=50):
+        session = self.start(data, filename)
+        for offset in range(session['offset'], len(data), chunk_size):
+            self.assertEqual(self.send(session['id'], offset, data[offset:offset + chunk_size]).status_code, 200)
+        response = self.client.post(f"/api/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def attach_image(self, session_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/maintenance-images/', {'maintenance_request': self.request.pk, 'upload': session_id}
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return MaintenanceImage.objects.get(pk=response.data['id'])
+
+    def test_chunked_upload_is_verified_and_attached(self):
+        data = png_bytes()
+        session = self.upload(data)
+
+        self.assertEqual(session['status'], 'complete')
+        digest = hashlib.sha256(data).hexdigest()
+        name = f'cas/{digest[:2]}/{digest[2:4]}/{digest}.png'
+        self.assertTrue(session['url'].endswith(name))
+        with content_storage.open(name) as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+        image = self.attach_image(session['id'])
+        self.assertEqual(image.image.name, name)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+        response = self.client.post(
+            '/api/maintenance-images/', {'maintenance_request': self.request.pk, 'upload': session['id']}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_resume_after_interruption(self):
+        data = png_bytes()
+        session = self.start(data)
+        self.send(session['id'], 0, data[:60])
+
+        response = self.send(session['id'], 40, data[40:80])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 60)
+
+        # The client asks where to continue
+        self.assertEqual(self.client.get(f"/api/uploads/{session['id']}/").data['offset'], 60)
+        self.send(session['id'], 60, data[60:])
+        self.assertEqual(self.client.post(f"/api/uploads/{session['id']}/complete/").data['status'], 'complete')
+
+    def test_checksum_mismatch_restarts(self):
+        data = png_bytes()
+        session = self.start(data)
+        self.send(session['id'], 0, b'x' * len(data))
+
+        response = self.client.post(f"/api/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_identical_content_is_stored_once(self):
+        data = png_bytes()
+        first = self.upload(data)
+
+        # Content the caller already holds completes at once, without sending bytes
+        second = self.start(data, 'scan.png')
+        self.assertEqual((second['status'], second['offset']), ('complete', len(data)))
+        image = self.attach_image(first['id'])
+
+        tenant_user = User.objects.create_user(username='tenant', role='tenant')
+        tenant = Tenant.objects.create(
+            user=tenant_user, house=self.house, move_in_date=date(2025, 1, 1),
+            contract_start=date(2025, 1, 1), contract_end=date(2026, 1, 1)
+        )
+        response = self.client.post('/api/contracts/', {
+            'tenant': tenant.pk, 'house': self.house.pk, 'start_date': '2025-01-01', 'end_date': '2026-01-01',
+            'monthly_rent': '5000', 'deposit_paid': '5000', 'contract_document_upload': second['id'],
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        contract = Contract.objects.get(pk=response.data['id'])
+        self.assertEqual(contract.contract_document.name, image.image.name)
+
+        name = image.image.name
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 2)
+
+        # Deleting the request (and with it the image) keeps the contract's file
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request.delete()
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+        self.assertTrue(content_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            contract.delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(content_storage.exists(name))
+
+    def test_known_digest_alone_does_not_skip_the_transfer(self):
+        data = png_bytes()
+        self.upload(data)
+        name = UploadSession.objects.get().file_name
+
+        # Another user knows the digest but must still prove they have the bytes
+        self.client.force_authenticate(User.objects.create_user(username='other', role='estate_admin'))
+        session = self.start(data)
+        self.assertEqual((session['status'], session['offset']), ('uploading', 0))
+        self.assertEqual(self.send(session['id'], 0, b'x' * len(data)).status_code, 200)
+        self.assertEqual(self.client.post(f"/api/uploads/{session['id']}/complete/").status_code, 400)
+
+        session = self.upload(data)
+        self.assertEqual(UploadSession.objects.get(pk=session['id']).file_name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 2)
+
+    def test_extension_must_be_allowed(self):
+        for filename in ('page.html', 'logo.svg', 'noextension'):
+            response = self.client.post('/api/uploads/', {
+                'filename': filename, 'size': 10, 'sha256': hashlib.sha256(b'x').hexdigest(),
+            })
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('filename', response.data)
+
+    def test_released_file_is_reused_not_collected(self):
+        data = png_bytes('teal')
+        session = self.upload(data)
+        name = UploadSession.objects.get().file_name
+        collections = []
+        with mock.patch('uploads.refs.transaction.on_commit', collections.append):
+            self.client.delete(f"/api/uploads/{session['id']}/")
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 0)
+
+        # The same bytes are saved again, and the pending collection runs
+        # before the new row takes its reference: the file must survive it
+        self.assertEqual(content_storage.save('again.png', ContentFile(data)), name)
+        for collect in collections:
+            collect()
+        acquire(name)
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+    def test_multipart_uploads_are_deduplicated(self):
+        data = png_bytes('olive')
+        names = []
+        for filename in ('a.png', 'b.png'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/maintenance-images/', {
+                    'maintenance_request': self.request.pk,
+                    'image': SimpleUploadedFile(filename, data, content_type='image/png'),
+                }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            names.append(MaintenanceImage.objects.get(pk=response.data['id']).image.name)
+
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(StoredFile.objects.get(name=names[0]).ref_count, 2)
+        directory = os.path.dirname(content_storage.path(names[0]))
+        self.assertEqual([entry.name for entry in os.scandir(directory) if entry.is_file()], [os.path.basename(names[0])])
+
+    def test_sessions_are_private(self):
+        session = self.upload(png_bytes())
+        other = User.objects.create_user(username='other', role='estate_admin')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(f"/api/uploads/{session['id']}/").status_code, 404)
+        response = self.client.post(
+            '/api/maintenance-images/', {'maintenance_request': self.request.pk, 'upload': session['id']}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_an_image(self):
+        session = self.upload(b'%PDF-1.4 not an image', filename='notes.png')
+        response = self.client.post(
+            '/api/maintenance-images/', {'maintenance_request': self.request.pk, 'upload': session['id']}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('upload', response.data)
+
+    def test_purge_idle_sessions(self):
+        data = png_bytes()
+        unfinished = self.start(data)
+        self.send(unfinished['id'], 0, data[:10])
+        finished = self.upload(png_bytes('navy'))
+        name = UploadSession.objects.get(pk=finished['id']).file_name
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_uploads', stdout=out)
+        self.assertIn('Purged 2', out.getvalue())
+        self.assertFalse((CHUNK_DIR / f"{unfinished['id']}.part").exists())
+        self.assertFalse(content_storage.exists(name))
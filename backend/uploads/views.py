@@ -0,0 +1,131 @@
+import os
+from django.conf import settings
+from django.db import transaction
+from django.http import UnreadablePostError
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .models import StoredFile, UploadSession
+from .refs import acquire, held_by
+from .serializers import UploadSessionSerializer
+from .storage import content_name, content_storage, file_digest
+
+READ_BLOCK = 64 * 1024
+
+
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                    viewsets.GenericViewSet):
+    """
+    Resumable uploads. The flow:
+
+    1. POST /api/uploads/ {filename, size, sha256}. The filename's extension
+       must be in UPLOAD_EXTENSIONS. If the caller already holds that content
+       (another finished session, or a contract or maintenance image of
+       theirs) the session comes back complete and nothing is sent.
+    2. PATCH /api/uploads/<id>/ with raw bytes and an Upload-Offset header
+       equal to the session's `offset`, as many times as needed. After a
+       dropped connection, GET the session and continue from its `offset`.
+    3. POST /api/uploads/<id>/complete/ checks the size and SHA-256 and
+       stores the file.
+    4. Pass the session id as `upload` when creating a maintenance image, or
+       as `contract_document_upload` on a contract.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        session = serializer.save(owner=self.request.user)
+        name = content_name(session.sha256, os.path.splitext(session.filename)[1])
+        # Knowing a digest proves nothing about having the bytes, so only
+        # content the caller can already read is taken without a transfer.
+        # Their reference keeps the file alive while this one is added.
+        if held_by(self.request.user, name):
+            with transaction.atomic():
+                stored = StoredFile.objects.select_for_update().filter(name=name, size=session.size, ref_count__gt=0)
+                if stored.exists() and content_storage.exists(name):
+                    acquire(name)
+                    session.status, session.received, session.file_name = 'complete', session.size, name
+                    session.save(update_fields=['status', 'received', 'file_name', 'updated_at'])
+
+    def partial_update(self, request, pk=None):
+        """
+        Appends the request body at Upload-Offset. Bytes that arrived before
+        a dropped connection are kept, so the client resumes from `offset`.
+        """
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        length = int(request.headers.get('Content-Length') or 0)
+        if length > settings.UPLOAD_CHUNK_MAX_BYTES:
+            return Response({'error': f'Chunks are limited to {settings.UPLOAD_CHUNK_MAX_BYTES} bytes'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        with transaction.atomic():
+            # Locked so two requests cannot write the same session at once
+            session = self.get_queryset().select_for_update().filter(pk=self.get_object().pk).get()
+            if session.status != 'uploading':
+                return Response({'error': 'Upload is already complete'}, status=status.HTTP_409_CONFLICT)
+            if offset != session.received:
+                return Response({'error': 'Offset does not match', 'offset': session.received},
+                                status=status.HTTP_409_CONFLICT)
+            if session.received + length > session.size:
+                return Response({'error': 'Chunk goes past the declared size'}, status=status.HTTP_400_BAD_REQUEST)
+
+            session.received += self._write(session, request.stream, length)
+            session.save(update_fields=['received', 'updated_at'])
+        return Response(self.get_serializer(session).data)
+
+    @staticmethod
+    def _write(session, stream, length):
+        path = session.partial_path
+        os.makedirs(path.parent, exist_ok=True)
+        written = 0
+        with open(path, 'r+b' if path.exists() else 'w+b') as target:
+            target.seek(session.received)
+            try:
+                while stream is not None and written < length:
+                    block = stream.read(min(READ_BLOCK, length - written))
+                    if not block:
+                        break
+                    target.write(block)
+                    written += len(block)
+            except (UnreadablePostError, OSError):
+                # Client went away mid-chunk: keep what arrived
+                pass
+            # Drop bytes left past this point by an earlier interrupted write
+            target.truncate()
+        return written
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """
+        Verifies the received bytes against the declared size and SHA-256 and
+        moves them into content-addressed storage.
+        """
+        with transaction.atomic():
+            session = self.get_queryset().select_for_update().filter(pk=self.get_object().pk).get()
+            if session.status == 'complete':
+                return Response(self.get_serializer(session).data)
+            if session.received != session.size:
+                return Response({'error': 'Upload is incomplete', 'offset': session.received},
+                                status=status.HTTP_409_CONFLICT)
+
+            digest = file_digest(session.partial_path)
+            if digest != session.sha256:
+                # The bytes cannot be trusted; start over
+                session.partial_path.unlink(missing_ok=True)
+                session.received = 0
+                session.save(update_fields=['received', 'updated_at'])
+                return Response({'error': 'SHA-256 does not match the uploaded bytes', 'offset': 0},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            name = content_storage.adopt(session.partial_path, digest, os.path.splitext(session.filename)[1])
+            acquire(name)
+            session.status, session.file_name = 'complete', name
+            session.save(update_fields=['status', 'file_name', 'updated_at'])
+        return Response(self.get_serializer(session).data)
@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from search.admin import VectorSearchMixin
+from .models import User, OutboxEmail, ArchivedNotification
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(VectorSearchMixin, BaseUserAdmin):
     list_display = ['username', 'email', 'role', 'is_staff', 'is_active']
     list_filter = ['role', 'is_staff', 'is_active']
     search_fields = ['username', 'email', 'first_name', 'last_name']
@@ -18,4 +19,18 @@ class UserAdmin(BaseUserAdmin):
         ('Additional Info', {
             'fields': ('role', 'phone', 'id_number')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject']
+
+
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'kind', 'created_at', 'archived_at']
+    list_filter = ['kind']
+    search_fields = ['message', 'recipient__username']
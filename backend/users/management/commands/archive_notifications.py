@@ -0,0 +1,73 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from users.models import Notification, ArchivedNotification
+
+ARCHIVED_FIELDS = ['id', 'recipient_id', 'message', 'is_read', 'created_at', 'link', 'kind']
+
+
+class Command(BaseCommand):
+    help = 'Moves (or purges) read notifications past their role retention age out of the live table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Notifications moved per transaction')
+        parser.add_argument('--purge', action='store_true', help='Delete expired notifications instead of archiving them')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many notifications have expired')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        expired = Notification.objects.filter(self.expired_condition(), is_read=True)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} notifications are past retention')
+            return
+
+        moved = 0
+        while True:
+            batch = self.move_batch(expired, options['batch_size'], options['purge'])
+            if not batch:
+                break
+            moved += batch
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        action = 'Purged' if options['purge'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{action} {moved} notifications'))
+
+    def expired_condition(self):
+        """
+        One cutoff per role; roles without their own policy use 'default'.
+        """
+        policies = dict(settings.NOTIFICATION_RETENTION_DAYS)
+        default_days = policies.pop('default')
+        now = timezone.now()
+
+        condition = Q(created_at__lt=now - timedelta(days=default_days)) & ~Q(recipient__role__in=list(policies))
+        for role, days in policies.items():
+            condition |= Q(recipient__role=role, created_at__lt=now - timedelta(days=days))
+        return condition
+
+    @staticmethod
+    def move_batch(expired, batch_size, purge):
+        """
+        Each batch is its own short transaction; rows another transaction holds
+        (e.g. mark_read) are skipped and picked up by a later run.
+        """
+        with transaction.atomic():
+            ids = list(
+                expired.select_for_update(skip_locked=True, of=('self',))
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return 0
+            if not purge:
+                ArchivedNotification.objects.bulk_create(
+                    [ArchivedNotification(**row) for row in Notification.objects.filter(id__in=ids).values(*ARCHIVED_FIELDS)],
+                    ignore_conflicts=True
+                )
+            Notification.objects.filter(id__in=ids).delete()
+        return len(ids)
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from users.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbox emails in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per SMTP connection')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain what is due now, then exit')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Outbox worker started')
+        try:
+            while True:
+                sent, failed = deliver_pending(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} emails, {failed} failed')
+                    continue
+                if options['once']:
+                    break
+                # Idle: drop a dead or expired DB connection before polling again
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Outbox worker stopped'))
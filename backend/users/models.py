@@ -1,6 +1,10 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from search.vectors import digits, document, local_part
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -20,6 +24,7 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, blank=True, null=True)
     id_number = models.CharField(max_length=20, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     # Technician specific
     specialization = models.CharField(max_length=100, blank=True, null=True)
@@ -40,19 +45,103 @@ class User(AbstractUser):
     
     registration_date = models.DateTimeField(auto_now_add=True)
 
+    # Full-text document for /api/search/ (tenant names and phones), kept current by Postgres
+    search_vector = models.GeneratedField(
+        expression=document(('first_name', 'A'), ('last_name', 'A'), ('username', 'B'),
+                            (local_part('email'), 'C'), (digits('phone'), 'C')),
+        output_field=SearchVectorField(), db_persist=True,
+    )
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['approval_status', '-registration_date', '-id'], name='user_pending_keyset_idx'),
+            GinIndex(fields=['search_vector'], name='user_search_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
 
 # Ensure this class is NOT indented. It must be at the same level as class User.
 class Notification(models.Model):
+    KIND_CHOICES = (
+        ('general', 'General'),
+        ('payment_reminder', 'Payment Reminder'),
+    )
+
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     link = models.CharField(max_length=255, blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='general')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_inbox_idx'),
+            models.Index(fields=['recipient', 'kind', '-created_at'], name='notification_kind_idx'),
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.recipient}: {self.message}"
+
+
+class ArchivedNotification(models.Model):
+    """
+    Read notifications past their role's retention age, moved out of the live
+    table by the `archive_notifications` command so inbox queries stay small.
+    Keeps the original primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_notifications')
+    message = models.TextField()
+    is_read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    link = models.CharField(max_length=255, blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=Notification.KIND_CHOICES, default='general')
+    archived_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        db_table = 'notification_archive'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='notification_archive_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived notification for {self.recipient}: {self.message}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Email queued in the same transaction as the change that triggers it and
+    delivered later by the `runworker` command, so requests never wait on SMTP.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_emails'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
 
     def __str__(self):
-        return f"Notification for {self.recipient}: {self.message}"
\ No newline at end of file
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
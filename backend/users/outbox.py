@@ -0,0 +1,130 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxEmail
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """
+    Drop-in for send_mail() that writes to the outbox instead of talking to SMTP.
+    Call it inside the transaction of the change the email announces: if that
+    rolls back, the email is never sent.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        recipients=[r for r in recipient_list if r],
+    )
+
+
+def deliver_pending(batch_size=100):
+    """
+    Sends one batch of due emails over a single SMTP connection.
+
+    Rows are claimed in a short transaction (SELECT ... FOR UPDATE SKIP
+    LOCKED, then status 'sending' with a lease of OUTBOX_LEASE_SECONDS in
+    next_attempt_at), so several workers can drain the outbox side by side
+    without holding row locks while SMTP is slow. Before each message the
+    lease of the whole batch is renewed (results are only written at the
+    end), so a slow batch is never claimed twice; each SMTP call is bounded by EMAIL_TIMEOUT, which must
+    stay well below the lease. A worker that dies mid-batch leaves its rows
+    to be claimed again once the lease runs out. Results are written in a second short transaction. Failures are retried
+    with exponential backoff until OUTBOX_MAX_ATTEMPTS, then marked failed.
+    Returns (sent, failed) counts for the batch.
+    """
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    retry_base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+    sent = failed = 0
+
+    lease_seconds = getattr(settings, 'OUTBOX_LEASE_SECONDS', 300)
+    batch = _claim(batch_size, lease_seconds)
+    if not batch:
+        return sent, failed
+
+    pending = []
+    for email in batch:
+        if email.recipients:
+            pending.append(email)
+        else:
+            # Nothing to retry: the backend would "send" it to nobody
+            email.status = 'failed'
+            email.last_error = 'No recipients'
+            failed += 1
+
+    connection = get_connection(fail_silently=False)
+    try:
+        if pending:
+            connection.open()
+        while pending:
+            _renew(batch, lease_seconds)
+            email = pending.pop(0)
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=email.recipients,
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                _record_failure(email, e, max_attempts, retry_base)
+                failed += 1
+            else:
+                email.attempts += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent += 1
+    except Exception as e:
+        # Could not connect at all: every unsent email in the batch backs off
+        for email in pending:
+            _record_failure(email, e, max_attempts, retry_base)
+            failed += 1
+    finally:
+        connection.close()
+
+    with transaction.atomic():
+        OutboxEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return sent, failed
+
+
+def _claim(batch_size, lease_seconds):
+    """
+    Marks up to batch_size due emails as 'sending' and returns them. Emails
+    still 'sending' after their lease belong to a worker that died.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for email in batch:
+            email.status = 'sending'
+            email.next_attempt_at = now + timedelta(seconds=lease_seconds)
+        OutboxEmail.objects.bulk_update(batch, ['status', 'next_attempt_at'])
+    return batch
+
+
+def _renew(emails, lease_seconds):
+    # One UPDATE for the batch's rows, sent or not, until the results are saved
+    OutboxEmail.objects.filter(pk__in=[email.pk for email in emails], status='sending').update(
+        next_attempt_at=timezone.now() + timedelta(seconds=lease_seconds)
+    )
+
+
+def _record_failure(email, error, max_attempts, retry_base):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = timezone.now() + timedelta(seconds=retry_base * 2 ** (email.attempts - 1))
@@ -2,16 +2,19 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from .models import Notification
+from seams_project.media import DerivativeField
 import secrets # CHANGED: Use secrets instead of random
 import string
 
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_thumbnail = DerivativeField('profile_picture', 'thumbnail')
+
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 
-                  'phone', 'id_number', 'profile_picture', 'specialization', 
+                  'phone', 'id_number', 'profile_picture', 'profile_picture_thumbnail', 'specialization', 
                   'profile_completed', 'approval_status', 'email_verified', 
                   'house_number', 'date_joined', 'registration_date', 'is_active']
         read_only_fields = ['id', 'date_joined', 'approval_status', 'email_verified', 'registration_date', 'is_active']
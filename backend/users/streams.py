@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import secrets
+from collections import defaultdict
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+from seams_project.authentication import check_access
+from .models import Notification
+from .serializers import NotificationSerializer
+
+TICKET_SALT = 'users.streams.ticket'
+
+
+class NotificationHub:
+    """
+    Fans new Notification rows out to the stream connections of one worker
+    process. A single indexed query per poll interval serves every connected
+    user, however many there are, and also sees rows inserted with
+    bulk_create() or by other processes, which signals would miss.
+
+    Ids are assigned at insert but become visible at commit, so a row can
+    appear after rows with higher ids were already pushed. Each poll
+    therefore also re-reads the last NOTIFICATION_STREAM_OVERLAP_SECONDS of
+    rows and skips the ids it has delivered within that window.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.last_id = None
+        # id -> when it was first pushed; pruned once older than the overlap
+        self.delivered = {}
+        self.task = None
+
+    async def subscribe(self, user_id):
+        # Registered first: the poller stops as soon as it finds no subscribers
+        queue = asyncio.Queue()
+        self.subscribers[user_id].add(queue)
+        try:
+            task = self.task
+            if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+                self.last_id = await sync_to_async(self._latest_id)()
+                self.delivered = {}
+                self.task = asyncio.ensure_future(self._run())
+            # Rows up to the hub position are already in the client's list (or
+            # its replay); the overlap re-read must not push them again
+            seen = timezone.now()
+            recent = await sync_to_async(self._recent_ids)(user_id, seen - self._overlap(), self.last_id)
+        except BaseException:
+            self.unsubscribe(user_id, queue)
+            raise
+        for notification_id in recent:
+            self.delivered.setdefault(notification_id, seen)
+        return queue, self.last_id
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    async def _run(self):
+        interval = getattr(settings, 'NOTIFICATION_STREAM_POLL_SECONDS', 2)
+        while self.subscribers:
+            await asyncio.sleep(interval)
+            now = timezone.now()
+            since = now - self._overlap()
+            try:
+                rows = await sync_to_async(self._fetch)(list(self.subscribers), self.last_id, since=since)
+            except DatabaseError:
+                # Transient outage: connections stay open and the next poll catches up
+                continue
+            # A row first pushed before `since` was created before it too, so
+            # the overlap query cannot return it any more
+            self.delivered = {key: at for key, at in self.delivered.items() if at >= since}
+            for row in rows:
+                self.last_id = max(self.last_id, row['id'])
+                if row['id'] in self.delivered:
+                    continue
+                self.delivered[row['id']] = now
+                for queue in self.subscribers.get(row['recipient'], ()):
+                    queue.put_nowait(row)
+        self.task = None
+
+    @staticmethod
+    def _overlap():
+        return timedelta(seconds=getattr(settings, 'NOTIFICATION_STREAM_OVERLAP_SECONDS', 30))
+
+    @staticmethod
+    def _latest_id():
+        return Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    @staticmethod
+    def _recent_ids(user_id, since, upto_id):
+        return list(Notification.objects.filter(
+            recipient_id=user_id, created_at__gte=since, id__lte=upto_id
+        ).values_list('id', flat=True))
+
+    @staticmethod
+    def _fetch(user_ids, after_id, upto_id=None, since=None):
+        """
+        Rows of `user_ids` with after_id < id <= upto_id, plus (with `since`)
+        any created since then, in id order.
+        """
+        newer = Q(id__gt=after_id)
+        if since is not None:
+            newer |= Q(created_at__gte=since)
+        rows = Notification.objects.filter(newer, recipient_id__in=user_ids)
+        if upto_id is not None:
+            rows = rows.filter(id__lte=upto_id)
+        return [
+            dict(NotificationSerializer(n).data, recipient=n.recipient_id)
+            for n in rows.order_by('id')
+        ]
+
+
+hub = NotificationHub()
+
+
+def issue_ticket(user):
+    """
+    A short-lived, single-use credential for opening one stream. EventSource
+    cannot send headers, and a JWT in the URL would end up in server and
+    proxy logs for its whole lifetime; a ticket is useless once redeemed or
+    NOTIFICATION_STREAM_TICKET_SECONDS after it was issued.
+    """
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_hex(8)}, salt=TICKET_SALT, compress=True)
+
+
+def _redeem_ticket(ticket):
+    """
+    The active user a ticket was issued to, or None. Redeeming marks the
+    ticket used in the cache (which must be shared between workers).
+    """
+    lifetime = getattr(settings, 'NOTIFICATION_STREAM_TICKET_SECONDS', 30)
+    try:
+        user_id = signing.loads(ticket, salt=TICKET_SALT, max_age=lifetime)['user']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+    used_key = f'notification-stream-ticket:{hashlib.md5(ticket.encode()).hexdigest()}'
+    if not cache.add(used_key, True, timeout=lifetime + 1):
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_active=True).first()
+
+
+def _authenticate(request):
+    """
+    (user, None) for a valid ?ticket= or API credentials, else (None, 401 response).
+    """
+    ticket = request.GET.get('ticket')
+    if ticket is None:
+        return check_access(request, [IsAuthenticated])
+    user = _redeem_ticket(ticket)
+    if user is None:
+        return None, JsonResponse({'detail': 'Stream ticket is invalid, expired or already used.'}, status=401)
+    return user, None
+
+
+def _event(row):
+    data = {key: value for key, value in row.items() if key != 'recipient'}
+    return f"id: {row['id']}\nevent: notification\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def notification_stream(request):
+    """
+    Server-sent events: pushes each new notification of the authenticated
+    user as it is created. Browsers authenticate with ?ticket= from
+    POST /api/notifications/stream_ticket/. Reconnecting clients send
+    Last-Event-ID and get the rows they missed first.
+
+    Needs an ASGI server (see seams_project/asgi.py): under WSGI the response
+    would be buffered and hold a worker forever, so it answers 501 and
+    clients poll /api/notifications/ instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Notification streaming needs an ASGI server.'}, status=501)
+
+    user, denied = await sync_to_async(_authenticate)(request)
+    if denied is not None:
+        return denied
+
+    queue, hub_position = await hub.subscribe(user.id)
+    last_event_id = request.headers.get('Last-Event-ID', '')
+
+    async def events():
+        heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 15)
+        replayed = set()
+        try:
+            yield 'retry: 5000\n\n'
+            if last_event_id.isdigit():
+                for row in await sync_to_async(hub._fetch)([user.id], int(last_event_id), hub_position):
+                    replayed.add(row['id'])
+                    yield _event(row)
+            while True:
+                try:
+                    row = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                # A late commit can reach both the replay and the hub
+                if row['id'] not in replayed:
+                    yield _event(row)
+        finally:
+            hub.unsubscribe(user.id, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
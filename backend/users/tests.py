@@ -1,3 +1,353 @@
-from django.test import TestCase
+import asyncio
+import json
+import socketserver
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail.backends.smtp import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from estates.models import House
+from .models import Notification, ArchivedNotification, OutboxEmail
+from .outbox import queue_email, deliver_pending
+from .streams import hub, issue_ticket
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DebuggingSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP to accept mail; recipients containing 'reject' are refused.
+    """
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost test SMTP')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ')[0].upper()
+            if command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                self.server.messages += 1
+                self.reply('250 OK')
+            elif command == 'RCPT' and 'reject' in line:
+                self.reply('550 No such user')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class DebuggingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), DebuggingSMTPHandler)
+        self.connections = 0
+        self.messages = 0
+
+
+class OutboxTestCase(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.smtp = DebuggingSMTPServer()
+        threading.Thread(target=cls.smtp.serve_forever, daemon=True).start()
+        cls.smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=cls.smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            OUTBOX_MAX_ATTEMPTS=2,
+        )
+        cls.smtp_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.smtp_settings.disable()
+        cls.smtp.shutdown()
+        cls.smtp.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.smtp.connections = 0
+        self.smtp.messages = 0
+
+
+class OutboxWorkerTests(OutboxTestCase):
+
+    def test_batch_is_sent_over_one_connection(self):
+        for i in range(5):
+            queue_email('Hello', 'Body', [f'user{i}@example.com'])
+
+        call_command('runworker', '--once', stdout=StringIO())
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(self.smtp.messages, 5)
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 5)
+
+    def test_failures_back_off_then_give_up(self):
+        good = queue_email('Hello', 'Body', ['ok@example.com'])
+        bad = queue_email('Hello', 'Body', ['reject@example.com'])
+
+        self.assertEqual(deliver_pending(), (1, 1))
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('pending', 1))
+        self.assertIn('No such user', bad.last_error)
+        self.assertEqual(deliver_pending(), (0, 0))  # not due yet
+
+        OutboxEmail.objects.filter(pk=bad.pk).update(next_attempt_at=bad.created_at)
+        self.assertEqual(deliver_pending(), (0, 1))
+        bad.refresh_from_db()
+        good.refresh_from_db()
+        self.assertEqual((bad.status, good.status), ('failed', 'sent'))
+
+    def test_emails_without_recipients_fail(self):
+        email = queue_email('Hello', 'Body', ['', None])
+
+        self.assertEqual(deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.last_error), ('failed', 'No recipients'))
+        self.assertEqual(self.smtp.connections, 0)
+
+    def test_expired_claims_are_sent_again(self):
+        leased = queue_email('Hello', 'Body', ['ok@example.com'])
+        held = queue_email('Hello', 'Body', ['ok@example.com'])
+        # A worker died mid-batch holding `leased`; `held` is another worker's live claim
+        OutboxEmail.objects.filter(pk=leased.pk).update(status='sending', next_attempt_at=leased.created_at)
+        OutboxEmail.objects.filter(pk=held.pk).update(
+            status='sending', next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual(OutboxEmail.objects.get(pk=leased.pk).status, 'sent')
+        self.assertEqual(OutboxEmail.objects.get(pk=held.pk).status, 'sending')
+
+    def test_lease_is_renewed_while_the_batch_is_sent(self):
+        for i in range(5):
+            queue_email('Hello', 'Body', [f'user{i}@example.com'])
+        # Each message takes two minutes, so the batch outlasts one lease
+        clock = [timezone.now()]
+        expired = []
+        send_messages = EmailBackend.send_messages
+
+        def send(backend, messages):
+            expired.append(OutboxEmail.objects.filter(status='sending', next_attempt_at__lte=clock[0]).count())
+            clock[0] += timedelta(minutes=2)
+            return send_messages(backend, messages)
+
+        with mock.patch('users.outbox.timezone') as fake_timezone, \
+                mock.patch.object(EmailBackend, 'send_messages', send):
+            fake_timezone.now.side_effect = lambda: clock[0]
+            self.assertEqual(deliver_pending(), (5, 0))
+        # No row of the batch, sent or not, was ever free for another worker to claim
+        self.assertEqual(expired, [0, 0, 0, 0, 0])
+
+    @override_settings(EMAIL_PORT=1)
+    def test_unreachable_server_requeues_batch(self):
+        email = queue_email('Hello', 'Body', ['ok@example.com'])
+
+        self.assertEqual(deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+
+
+class OutboxViewTests(OutboxTestCase):
+
+    def test_registration_queues_instead_of_sending(self):
+        response = self.client.post('/api/auth/register/tenant/', {
+            'username': 'newtenant', 'email': 'new@example.com', 'password': 'secret123',
+            'first_name': 'New', 'last_name': 'Tenant', 'phone': '0711111111', 'id_number': '123',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.smtp.connections, 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ['new@example.com'])
+        self.assertIn(User.objects.get(username='newtenant').email_verification_token, email.body)
+
+    def test_failed_approval_leaves_no_email(self):
+        admin = User.objects.create_user(username='admin', role='estate_admin', is_staff=True)
+        pending = User.objects.create_user(username='pending', email='p@example.com', approval_status='pending')
+        house = House.objects.create(house_number='A1', house_type='bedsitter', rent_amount=5000)
+        self.client.force_authenticate(admin)
+
+        # Missing contract dates make the tenant profile insert fail
+        response = self.client.post(f'/api/users/{pending.id}/approve/', {'house_id': house.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OutboxEmail.objects.exists())
+        pending.refresh_from_db()
+        self.assertEqual(pending.approval_status, 'pending')
+
+        response = self.client.post(f'/api/users/{pending.id}/approve/', {
+            'house_id': house.id, 'move_in_date': date(2025, 1, 1),
+            'contract_start': date(2025, 1, 1), 'contract_end': date(2026, 1, 1),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OutboxEmail.objects.get().recipients, ['p@example.com'])
+
+
+class NotificationEndpointTests(APITestCase):
+    url = '/api/notifications/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tenant', role='tenant')
+        self.other = User.objects.create_user(username='other', role='tenant')
+        self.client.force_authenticate(self.user)
+
+    def test_unread_count_and_batch_mark_read(self):
+        mine = Notification.objects.bulk_create([Notification(recipient=self.user, message=f'n{i}') for i in range(3)])
+        theirs = Notification.objects.create(recipient=self.other, message='not yours')
+
+        self.assertEqual(self.client.get(f'{self.url}unread_count/').data, {'unread_count': 3})
+
+        response = self.client.post(f'{self.url}mark_read/', {'ids': [mine[0].id, mine[1].id, theirs.id]}, format='json')
+
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.client.get(f'{self.url}unread_count/').data, {'unread_count': 1})
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.is_read)
+        self.assertEqual(self.client.post(f'{self.url}mark_read/', {'ids': 'all'}, format='json').status_code, 400)
+
+        # The per-notification action still works
+        self.assertEqual(self.client.post(f'{self.url}{mine[2].id}/mark_read/').status_code, 200)
+        self.assertEqual(self.client.get(f'{self.url}unread_count/').data, {'unread_count': 0})
+
+
+@override_settings(NOTIFICATION_STREAM_POLL_SECONDS=0.05)
+class NotificationStreamTests(TestCase):
+    url = '/api/notifications/stream/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='tenant', role='tenant')
+        self.other = User.objects.create_user(username='other', role='tenant')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def open_stream(self, **headers):
+        response = await self.async_client.get(self.url, {'ticket': issue_ticket(self.user)}, headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        return stream
+
+    async def test_requires_a_single_use_ticket(self):
+        response = await self.async_client.get(self.url, {'ticket': 'garbage'})
+        self.assertEqual(response.status_code, 401)
+        # Long-lived JWTs stay out of URLs
+        response = await self.async_client.get(self.url, {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.post(
+            '/api/notifications/stream_ticket/', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        ticket = response.json()['ticket']
+        first = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(first.status_code, 200)
+        await first.streaming_content.aclose()
+        self.assertEqual((await self.async_client.get(self.url, {'ticket': ticket})).status_code, 401)
+
+    def test_wsgi_requests_are_turned_away(self):
+        response = self.client.get(self.url, {'ticket': issue_ticket(self.user)})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_rows_committed_out_of_id_order_are_pushed_once(self):
+        stream = await self.open_stream()
+        late = await Notification.objects.acreate(recipient=self.user, message='slow transaction')
+        # A row with a higher id was seen first, as if it committed earlier
+        hub.last_id = late.id + 1
+
+        event = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+        self.assertTrue(event.startswith(f'id: {late.id}\n'))
+
+        following = await Notification.objects.acreate(recipient=self.user, message='next')
+        event = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+        self.assertTrue(event.startswith(f'id: {following.id}\n'))
+        await stream.aclose()
+
+    async def test_pushes_new_notifications_and_replays_missed_ones(self):
+        missed = await Notification.objects.acreate(recipient=self.user, message='while offline')
+        response = await self.async_client.get(
+            self.url, {'ticket': issue_ticket(self.user)}, headers={'Last-Event-ID': '0'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        self.assertIn(f'id: {missed.id}\n'.encode(), await anext(stream))
+
+        await Notification.objects.acreate(recipient=self.other, message='someone else')
+        pushed = await Notification.objects.acreate(recipient=self.user, message='hello')
+        event = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+
+        self.assertTrue(event.startswith(f'id: {pushed.id}\nevent: notification\n'))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['message'], 'hello')
+
+        # A client disconnect cancels the pending read, which unsubscribes the connection
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertNotIn(self.user.id, hub.subscribers)
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS={'default': 90, 'technician': 30})
+class ArchiveNotificationsTests(TestCase):
+    def setUp(self):
+        self.tenant = User.objects.create_user(username='tenant', role='tenant')
+        self.technician = User.objects.create_user(username='tech', role='technician')
+
+    def notify(self, user, days_old, is_read=True):
+        notification = Notification.objects.create(recipient=user, message=f'{days_old} days', is_read=is_read)
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notification
+
+    def test_moves_expired_read_notifications_per_role_in_batches(self):
+        old_tenant = self.notify(self.tenant, 100)
+        self.notify(self.tenant, 100, is_read=False)
+        self.notify(self.tenant, 40)
+        old_tech = [self.notify(self.technician, 40) for _ in range(3)]
+
+        out = StringIO()
+        call_command('archive_notifications', '--dry-run', stdout=out)
+        self.assertIn('4 notifications', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 6)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('archive_notifications', '--batch-size', '3', stdout=StringIO())
+
+        archived = set(ArchivedNotification.objects.values_list('id', flat=True))
+        self.assertEqual(archived, {old_tenant.id, *(n.id for n in old_tech)})
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertFalse(Notification.objects.filter(id__in=archived).exists())
+        self.assertEqual(ArchivedNotification.objects.get(id=old_tenant.id).message, '100 days')
+        self.assertEqual(len([q for q in queries if 'SKIP LOCKED' in q['sql']]), 3)
+
+    def test_purge_deletes_without_archiving(self):
+        self.notify(self.tenant, 100)
+
+        call_command('archive_notifications', '--purge', stdout=StringIO())
+
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(ArchivedNotification.objects.count(), 0)
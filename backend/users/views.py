@@ -3,8 +3,8 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.apps import apps 
 from .serializers import (
     UserSerializer, 
@@ -15,6 +15,9 @@ from .serializers import (
     NotificationSerializer
 )
 from .models import Notification
+from .outbox import queue_email
+from .streams import issue_ticket
+from seams_project.pagination import KeysetPagination
 import secrets # CHANGED FROM RANDOM
 import string
 
@@ -23,6 +26,7 @@ User = get_user_model()
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         if self.action == 'create':
@@ -148,6 +152,11 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
     def pending_approvals(self, request):
         pending_users = User.objects.filter(approval_status='pending').order_by('-registration_date')
+
+        page = self.paginate_queryset(pending_users)
+        if page is not None:
+            return self.get_paginated_response(UserSerializer(page, many=True).data)
+
         serializer = UserSerializer(pending_users, many=True)
         return Response({
             'count': pending_users.count(),
@@ -183,55 +192,47 @@ class UserViewSet(viewsets.ModelViewSet):
         )
         
         if serializer.is_valid():
-            user = serializer.save()
-            
             try:
-                move_in = request.data.get('move_in_date')
-                start_date = request.data.get('contract_start')
-                end_date = request.data.get('contract_end')
-                
-                tenant, created = Tenant.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'house': house,
-                        'move_in_date': move_in,
-                        'contract_start': start_date,
-                        'contract_end': end_date,
-                        'status': 'active'
-                    }
-                )
-                
-                if not created:
-                    tenant.house = house
-                    tenant.move_in_date = move_in
-                    tenant.contract_start = start_date
-                    tenant.contract_end = end_date
-                    tenant.status = 'active'
-                    tenant.save()
+                # Approval, tenant profile (which marks the house occupied) and the email stand or fall together
+                with transaction.atomic():
+                    user = serializer.save()
 
-                house.status = 'occupied'
-                house.save()
-                
-            except Exception as e:
-                user.approval_status = 'pending'
-                user.save()
-                return Response({'error': f'Failed to create tenant profile: {str(e)}'}, status=400)
+                    move_in = request.data.get('move_in_date')
+                    start_date = request.data.get('contract_start')
+                    end_date = request.data.get('contract_end')
+                    
+                    tenant, created = Tenant.objects.get_or_create(
+                        user=user,
+                        defaults={
+                            'house': house,
+                            'move_in_date': move_in,
+                            'contract_start': start_date,
+                            'contract_end': end_date,
+                            'status': 'active'
+                        }
+                    )
+                    
+                    if not created:
+                        tenant.house = house
+                        tenant.move_in_date = move_in
+                        tenant.contract_start = start_date
+                        tenant.contract_end = end_date
+                        tenant.status = 'active'
+                        tenant.save()
 
-            try:
-                if user.is_active:
-                    email_msg = f'Hello {user.first_name},\n\nYour account is approved! You have been assigned House {house.house_number}.\nYou can now log in.'
-                else:
-                    email_msg = f'Hello {user.first_name},\n\nYour account is approved and you have been assigned House {house.house_number}!\n\nPlease verify your email to log in.'
+                    if user.is_active:
+                        email_msg = f'Hello {user.first_name},\n\nYour account is approved! You have been assigned House {house.house_number}.\nYou can now log in.'
+                    else:
+                        email_msg = f'Hello {user.first_name},\n\nYour account is approved and you have been assigned House {house.house_number}!\n\nPlease verify your email to log in.'
 
-                send_mail(
-                    subject='SEAMS Account Approved & House Assigned',
-                    message=email_msg,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
+                    queue_email(
+                        subject='SEAMS Account Approved & House Assigned',
+                        message=email_msg,
+                        recipient_list=[user.email],
+                    )
+                
             except Exception as e:
-                print(f"Failed to send approval email: {e}")
+                return Response({'error': f'Failed to create tenant profile: {str(e)}'}, status=400)
             
             return Response({
                 'message': f'User approved and assigned to House {house.house_number}',
@@ -263,18 +264,13 @@ class UserViewSet(viewsets.ModelViewSet):
         )
         
         if serializer.is_valid():
-            serializer.save()
-            
-            try:
-                send_mail(
+            with transaction.atomic():
+                serializer.save()
+                queue_email(
                     subject='SEAMS Account Registration Update',
                     message=f'Hello {user.first_name},\n\nYour account registration was not approved.\nReason: {rejection_reason}',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[user.email],
-                    fail_silently=False,
                 )
-            except Exception as e:
-                print(f"Failed to send rejection email: {e}")
             
             return Response({
                 'message': 'User rejected',
@@ -289,18 +285,16 @@ def tenant_register(request):
     serializer = TenantRegistrationSerializer(data=request.data)
     
     if serializer.is_valid():
-        user = serializer.save()
-        code = user.email_verification_token
-        
-        print(f"Sending verification code {code} to {user.email}...")
-        send_mail(
-            subject='Verify Your Email - SEAMS',
-            message=f'Hello {user.first_name},\n\nThank you for registering with SEAMS.\n\nYour Email Verification Code is: {code}\n\nPlease enter this code to verify your account.\n\nIf you did not request this, please ignore this email.',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False, 
-        )
-        print("Email sent successfully.")
+        with transaction.atomic():
+            user = serializer.save()
+            code = user.email_verification_token
+            
+            # Queued, not sent: an SMTP outage no longer fails the registration
+            queue_email(
+                subject='Verify Your Email - SEAMS',
+                message=f'Hello {user.first_name},\n\nThank you for registering with SEAMS.\n\nYour Email Verification Code is: {code}\n\nPlease enter this code to verify your account.\n\nIf you did not request this, please ignore this email.',
+                recipient_list=[user.email],
+            )
         
         return Response({
             'message': 'Registration successful! Verification code sent to email.',
@@ -343,17 +337,41 @@ def verify_email(request):
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': self.get_queryset().filter(is_read=False).count()})
+
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
         notification.is_read = True
         notification.save()
         return Response({'status': 'marked as read'})
-        
+
+    @action(detail=False, methods=['post'], url_path='mark_read')
+    def mark_read_many(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(str(i).isdigit() for i in ids):
+            return Response({'error': 'ids must be a list of notification IDs'}, status=status.HTTP_400_BAD_REQUEST)
+        updated = self.get_queryset().filter(id__in=ids, is_read=False).update(is_read=True)
+        return Response({'status': 'marked as read', 'updated': updated})
+
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """
+        Single-use credential for /api/notifications/stream/?ticket=, which
+        EventSource cannot authenticate with a header.
+        """
+        return Response({
+            'ticket': issue_ticket(request.user),
+            'expires_in': settings.NOTIFICATION_STREAM_TICKET_SECONDS,
+        })
+
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         self.get_queryset().update(is_read=True)
@@ -11,6 +11,9 @@ import {
 import { useNavigate, useLocation } from 'react-router-dom';
 
 const drawerWidth = 240;
+const NOTIFICATION_PAGE_SIZE = 20;
+const NOTIFICATION_POLL_MS = 30000;
+const STREAM_RETRY_MS = 60000;
 
 function Layout({ children, onLogout }) {
   const [mobileOpen, setMobileOpen] = useState(false);
@@ -25,37 +28,126 @@ function Layout({ children, onLogout }) {
 
   useEffect(() => {
     fetchNotifications();
-    // Poll every 30 seconds for new notifications
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
+    const token = localStorage.getItem('access_token');
+    if (!token) return;
+
+    // New notifications are pushed over server-sent events. While the stream
+    // is unavailable (API served over WSGI, network drop) the list is polled
+    // instead and the stream is retried now and then.
+    let stream = null;
+    let poll = null;
+    let retry = null;
+    let closed = false;
+
+    const stopPolling = () => {
+      clearInterval(poll);
+      poll = null;
+    };
+
+    const fallBack = () => {
+      if (closed) return;
+      fetchNotifications();
+      if (!poll) poll = setInterval(fetchNotifications, NOTIFICATION_POLL_MS);
+      if (!retry) retry = setTimeout(openStream, STREAM_RETRY_MS);
+    };
+
+    const openStream = async () => {
+      retry = null;
+      let ticket;
+      try {
+        // The stream takes a short-lived single-use ticket, never the JWT itself
+        const response = await fetch('http://localhost:8000/api/notifications/stream_ticket/', {
+          method: 'POST',
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!response.ok) throw new Error(`stream ticket: ${response.status}`);
+        ticket = (await response.json()).ticket;
+      } catch (err) {
+        fallBack();
+        return;
+      }
+      if (closed) return;
+
+      stream = new EventSource(
+        `http://localhost:8000/api/notifications/stream/?ticket=${encodeURIComponent(ticket)}`
+      );
+      stream.onopen = () => {
+        if (poll) {
+          stopPolling();
+          fetchNotifications();
+        }
+      };
+      stream.addEventListener('notification', (event) => {
+        const notif = JSON.parse(event.data);
+        setNotifications(prev => [notif, ...prev.filter(n => n.id !== notif.id)].slice(0, NOTIFICATION_PAGE_SIZE));
+        if (!notif.is_read) setUnreadCount(count => count + 1);
+      });
+      stream.onerror = () => {
+        // The ticket is spent, so EventSource's own reconnect would be refused
+        stream.close();
+        stream = null;
+        fallBack();
+      };
+    };
+
+    openStream();
+    const interval = setInterval(fetchUnreadCount, 60000);
+    return () => {
+      closed = true;
+      if (stream) stream.close();
+      stopPolling();
+      clearTimeout(retry);
+      clearInterval(interval);
+    };
   }, []);
 
+  const fetchUnreadCount = async () => {
+    try {
+      const token = localStorage.getItem('access_token');
+      if (!token) return;
+
+      const response = await fetch('http://localhost:8000/api/notifications/unread_count/', {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setUnreadCount(data.unread_count);
+      }
+    } catch (err) {
+      console.error("Failed to fetch unread count");
+    }
+  };
+
   const fetchNotifications = async () => {
     try {
       const token = localStorage.getItem('access_token');
       if (!token) return;
       
-      const response = await fetch('http://localhost:8000/api/notifications/', {
+      const response = await fetch(`http://localhost:8000/api/notifications/?page_size=${NOTIFICATION_PAGE_SIZE}`, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (response.ok) {
         const data = await response.json();
-        setNotifications(data);
-        setUnreadCount(data.filter(n => !n.is_read).length);
+        setNotifications(data.results);
       }
+      fetchUnreadCount();
     } catch (err) {
       console.error("Failed to fetch notifications");
     }
   };
 
   const handleMarkAsRead = async (id) => {
+    const notif = notifications.find(n => n.id === id);
+    if (!notif || notif.is_read) return;
     try {
       const token = localStorage.getItem('access_token');
-      await fetch(`http://localhost:8000/api/notifications/${id}/mark_read/`, {
+      await fetch('http://localhost:8000/api/notifications/mark_read/', {
         method: 'POST',
-        headers: { 'Authorization': `Bearer ${token}` }
+        headers: { 'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ids: [id] })
       });
-      fetchNotifications();
+      setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n));
+      setUnreadCount(count => Math.max(count - 1, 0));
     } catch (err) {
       console.error(err);
     }
@@ -80,9 +172,10 @@ function Layout({ children, onLogout }) {
   };
 
   const getProfileImageUrl = () => {
-    if (!user.profile_picture) return undefined;
-    if (user.profile_picture.startsWith('http')) return user.profile_picture;
-    return `http://localhost:8000${user.profile_picture}`;
+    const picture = user.profile_picture_thumbnail || user.profile_picture;
+    if (!picture) return undefined;
+    if (picture.startsWith('http')) return picture;
+    return `http://localhost:8000${picture}`;
   };
 
   const getMenuItems = () => {
@@ -543,11 +543,11 @@ function MaintenanceRequests() {
                   {currentRequest.images.map((img) => (
                     <ImageListItem key={img.id}>
                       <img
-                        src={getImageUrl(img.image)}
+                        src={getImageUrl(img.thumbnail || img.image)}
                         alt="Maintenance Issue"
                         loading="lazy"
                         style={{ height: '100px', objectFit: 'cover', cursor: 'pointer', borderRadius: 4 }}
-                        onClick={() => window.open(getImageUrl(img.image), '_blank')}
+                        onClick={() => window.open(getImageUrl(img.web || img.image), '_blank')}
                       />
                     </ImageListItem>
                   ))}